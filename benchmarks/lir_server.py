@@ -0,0 +1,270 @@
+"""Local stand-in for the LIR API, for load-testing the write path.
+
+Usage:
+    python -m benchmarks.lir_server [--port 8080] [--latency-ms 150] ...
+
+Implements the create and list endpoints the migration tool uses
+(/api/now/ir/{user,team,service,shift,escalation_policy}) and the Batch API
+(/api/now/v1/batch). Created objects are stored in memory and get sequential
+sysIds. Latency, 429 and 5xx responses and the number of requests served at
+once are configurable, so the tool can be run against it end to end:
+
+    python -m cli.cli --apiurl http://127.0.0.1:8080 ...
+"""
+from argparse import ArgumentParser
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import base64
+import gzip
+import json
+import random
+import threading
+import time
+
+KINDS = ("user", "team", "service", "shift", "escalation_policy")
+CREATE_PREFIX = "/api/now/ir/"
+BATCH_PATH = "/api/now/v1/batch"
+
+
+class Behavior:
+    def __init__(
+        self,
+        latency=0.0,
+        distribution="fixed",
+        rate_limited=0.0,
+        server_errors=0.0,
+        server_error_statuses=(503,),
+        retry_after=1,
+        seed=None,
+    ):
+        """How the stand-in server answers requests.
+
+        Args:
+            latency (float): Mean latency of a request, in seconds
+            distribution (str): "fixed", "uniform" (0 to twice the mean),
+                "exponential" or "lognormal" (sigma 1, for a long tail)
+            rate_limited (float): Fraction of requests answered with 429
+            server_errors (float): Fraction of requests answered with a 5xx
+            server_error_statuses (tuple): Statuses of those responses, drawn
+                uniformly at random
+            retry_after (int): Retry-After of 429 responses, in seconds
+            seed (int): Seed of the random generator, for repeatable runs
+        """
+        self.latency = latency
+        self.distribution = distribution
+        self.rate_limited = rate_limited
+        self.server_errors = server_errors
+        self.server_error_statuses = tuple(server_error_statuses)
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        """Latency of the next request, in seconds."""
+        with self.lock:
+            if not self.latency or self.distribution == "fixed":
+                return self.latency
+            if self.distribution == "uniform":
+                return self.random.uniform(0, 2 * self.latency)
+            if self.distribution == "exponential":
+                return self.random.expovariate(1 / self.latency)
+            # lognormvariate(0, 1) has a mean of e ** 0.5 (about 1.6487)
+            return self.random.lognormvariate(0, 1) * self.latency / 1.6487
+
+    def failure(self):
+        """Status to fail the next request with, or None to serve it."""
+        with self.lock:
+            draw = self.random.random()
+            status = self.random.choice(self.server_error_statuses)
+        if draw < self.rate_limited:
+            return 429
+        if draw < self.rate_limited + self.server_errors:
+            return status
+        return None
+
+
+class LIRServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, behavior=None, max_concurrency=None):
+        """Threaded HTTP server standing in for LIR.
+
+        Args:
+            address (tuple): (host, port) to listen on; port 0 picks a free one
+            behavior (Behavior): Latency and error injection
+            max_concurrency (int): Maximum number of requests served at once;
+                further requests wait for a slot, like on a saturated server
+        """
+        super().__init__(address, LIRHandler)
+        self.behavior = behavior or Behavior()
+        self.slots = threading.BoundedSemaphore(max_concurrency or 1 << 30)
+        self.lock = threading.Lock()
+        self.objects = {kind: [] for kind in KINDS}
+        self.statuses = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def create(self, kind, obj):
+        """Store an object and give it a sysId.
+
+        Args:
+            kind (str): Kind of object
+            obj (dict): Object as posted
+
+        Returns:
+            dict: Response body
+        """
+        with self.lock:
+            obj["sysId"] = f"{kind}{len(self.objects[kind]):08d}"
+            self.objects[kind].append(obj)
+        return {"sysId": obj["sysId"]}
+
+    def dispatch(self, method, path, query, body):
+        """Answer a request, without latency or error injection.
+
+        Returns:
+            tuple: (status, response body)
+        """
+        if method == "POST" and path == BATCH_PATH:
+            return 200, self.batch(json.loads(body))
+        kind = path[len(CREATE_PREFIX) :] if path.startswith(CREATE_PREFIX) else None
+        if kind not in KINDS:
+            return 404, {"error": True, "message": f"No such endpoint {path}"}
+        if method == "GET":
+            limit = int(query.get("sysparm_limit", ["1000"])[0])
+            offset = int(query.get("sysparm_offset", ["0"])[0])
+            with self.lock:
+                return 200, {"result": self.objects[kind][offset : offset + limit]}
+        try:
+            obj = json.loads(body)
+        except ValueError:
+            return 400, {"error": True, "message": "Invalid JSON body"}
+        return 200, self.create(kind, obj)
+
+    def batch(self, request):
+        """Answer the sub-requests of a Batch API request."""
+        serviced = []
+        for sub in request["rest_requests"]:
+            status, body = self.dispatch(
+                sub["method"], sub["url"], {}, base64.b64decode(sub["body"])
+            )
+            serviced.append(
+                {
+                    "id": sub["id"],
+                    "status_code": status,
+                    "body": base64.b64encode(json.dumps(body).encode()).decode(),
+                }
+            )
+        return {
+            "batch_request_id": request["batch_request_id"],
+            "serviced_requests": serviced,
+            "unserviced_requests": [],
+        }
+
+
+class LIRHandler(BaseHTTPRequestHandler):
+    # Keep connections alive between requests, like the real API
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def handle_request(self, method):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        server = self.server
+        with server.slots:
+            with server.lock:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            try:
+                time.sleep(server.behavior.delay())
+                status = server.behavior.failure()
+                headers = {}
+                if status == 429:
+                    headers["Retry-After"] = str(server.behavior.retry_after)
+                    response = {"error": True, "message": "Too many requests"}
+                elif status:
+                    response = {"error": True, "message": "Service unavailable"}
+                else:
+                    url = urlparse(self.path)
+                    status, response = server.dispatch(
+                        method, url.path, parse_qs(url.query), body
+                    )
+            finally:
+                with server.lock:
+                    server.in_flight -= 1
+        with server.lock:
+            server.statuses[status] += 1
+        self.reply(status, response, headers)
+
+    def reply(self, status, response, headers):
+        data = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument(
+        "--distribution",
+        default="lognormal",
+        choices=["fixed", "uniform", "exponential", "lognormal"],
+    )
+    parser.add_argument("--rate-limited", type=float, default=0.0)
+    parser.add_argument("--server-errors", type=float, default=0.0)
+    parser.add_argument(
+        "--server-error-status",
+        type=int,
+        nargs="+",
+        default=[503],
+        help="Statuses of the injected server errors, drawn at random",
+    )
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(args)
+    behavior = Behavior(
+        latency=args.latency_ms / 1000,
+        distribution=args.distribution,
+        rate_limited=args.rate_limited,
+        server_errors=args.server_errors,
+        server_error_statuses=args.server_error_status,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = LIRServer((args.host, args.port), behavior, args.max_concurrency)
+    print(f"Serving a stand-in LIR API on {server.url}; press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    created = ", ".join(f"{len(v)} {k}" for k, v in server.objects.items())
+    print(f"Created {created}")
+    print(f"Responses by status: {dict(server.statuses)}")
+    print(f"Maximum requests in flight: {server.max_in_flight}")
+
+
+if __name__ == "__main__":
+    main()
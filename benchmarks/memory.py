@@ -0,0 +1,76 @@
+"""Memory retained by extracted PagerDuty objects, raw versus projected.
+
+Usage:
+    python -m benchmarks.memory [--users N] [--schedules N] ...
+
+Builds the raw API objects of a synthetic account, projects them with the
+record functions used by cli.pagerduty, and reports the deep size of both.
+"""
+from argparse import ArgumentParser
+from cli import pagerduty
+from .synthetic import raw_org
+import sys
+
+MIB = 1024 * 1024
+
+PROJECTIONS = {
+    "users": pagerduty.user_record,
+    "teams": pagerduty.team_record,
+    "services": pagerduty.service_record,
+    "schedules": pagerduty.schedule_record,
+    "schedule_details": pagerduty.schedule_details_record,
+    "escalation_policies": pagerduty.escalation_record,
+}
+
+
+def deep_size(obj, seen=None):
+    """Size of an object and everything it references, counting each object once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("--users", type=int, default=60000)
+    parser.add_argument("--teams", type=int, default=2000)
+    parser.add_argument("--services", type=int, default=4000)
+    parser.add_argument("--schedules", type=int, default=1800)
+    parser.add_argument("--policies", type=int, default=1800)
+    args = parser.parse_args(args)
+    org = raw_org(
+        users=args.users,
+        teams=args.teams,
+        services=args.services,
+        schedules=args.schedules,
+        policies=args.policies,
+    )
+    print(f"{'category':<22}{'raw MiB':>10}{'projected MiB':>16}{'saved':>8}")
+    total_raw = total_projected = 0
+    for category, project in PROJECTIONS.items():
+        raw = org[category]
+        if isinstance(raw, dict):
+            raw = list(raw.values())
+        raw_size = deep_size(raw)
+        projected_size = deep_size([project(item) for item in raw])
+        total_raw += raw_size
+        total_projected += projected_size
+        print(
+            f"{category:<22}{raw_size / MIB:>10.1f}{projected_size / MIB:>16.1f}"
+            f"{1 - projected_size / raw_size:>8.0%}"
+        )
+    print(
+        f"{'total':<22}{total_raw / MIB:>10.1f}{total_projected / MIB:>16.1f}"
+        f"{1 - total_projected / total_raw:>8.0%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Time of each mapping phase on growing synthetic accounts.
+
+Usage:
+    python -m benchmarks.phases [--users N] [--scales 1 2 4] ...
+
+Projects the raw API objects of a synthetic account the way cli.pagerduty
+does, then runs every Mapper phase in noop mode, so nothing is sent to LIR.
+Each phase should take the same time per object at every scale; a time per
+object that grows with the account points at a lookup that scans a list.
+"""
+from argparse import ArgumentParser
+from cli import pagerduty
+from cli.mapper import Mapper
+from .synthetic import raw_org
+import logging
+import time
+
+PHASES = {
+    "users": ("users", ["map_and_create_users"]),
+    "teams": ("teams", ["map_team_members", "map_teams"]),
+    "services": ("services", ["map_services"]),
+    "schedules": ("schedules", ["map_schedules"]),
+    "escalations": ("escalations", ["map_escalations"]),
+}
+
+
+def extracted_org(raw):
+    """Project a raw synthetic account into the objects PagerDuty extraction returns."""
+    teams = []
+    for team in raw["teams"]:
+        roster = raw["team_members"][team["id"]]
+        members = [member["user"]["id"] for member in roster]
+        managers = [
+            member["user"]["id"] for member in roster if member["role"] == "manager"
+        ]
+        record = pagerduty.team_record(team)
+        record["members"] = members
+        record["manager"] = managers[0] if managers else members[0]
+        teams.append(record)
+    return {
+        "users": [pagerduty.user_record(user) for user in raw["users"]],
+        "teams": teams,
+        "services": [pagerduty.service_record(s) for s in raw["services"]],
+        "schedules": [
+            pagerduty.schedule_record(schedule)
+            | pagerduty.schedule_details_record(raw["schedule_details"][schedule["id"]])
+            for schedule in raw["schedules"]
+        ],
+        "escalations": [
+            pagerduty.escalation_record(escal) for escal in raw["escalation_policies"]
+        ],
+    }
+
+
+def run_phases(org):
+    """Run every phase on a fresh noop Mapper.
+
+    Returns:
+        dict: Seconds taken by each phase
+    """
+    mapper = Mapper("lirtoken", "http://127.0.0.1", "pdtoken", noop=True)
+    for category, objects in org.items():
+        setattr(mapper.pd, category, objects)
+    timings = {}
+    for phase, (_, methods) in PHASES.items():
+        start = time.perf_counter()
+        for method in methods:
+            getattr(mapper, method)()
+        timings[phase] = time.perf_counter() - start
+    return timings
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--services", type=int, default=400)
+    parser.add_argument("--schedules", type=int, default=180)
+    parser.add_argument("--policies", type=int, default=180)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(args)
+    logging.disable(logging.WARNING)
+    print(f"{'phase':<14}{'scale':>6}{'objects':>9}{'seconds':>10}{'us/object':>11}")
+    results = {}
+    for scale in args.scales:
+        org = extracted_org(
+            raw_org(
+                users=args.users * scale,
+                teams=args.teams * scale,
+                services=args.services * scale,
+                schedules=args.schedules * scale,
+                policies=args.policies * scale,
+            )
+        )
+        counts = {phase: len(org[category]) for phase, (category, _) in PHASES.items()}
+        results[scale] = (counts, run_phases(org))
+    for phase in PHASES:
+        for scale, (counts, timings) in results.items():
+            print(
+                f"{phase:<14}{scale:>6}{counts[phase]:>9}{timings[phase]:>10.3f}"
+                f"{timings[phase] / counts[phase] * 1e6:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Schedule layer conversion, current engine versus the previous inline code.
+
+Usage:
+    python -m benchmarks.schedules [--copies N] [--teams N]
+
+Converts the schedule fixtures of tests/fixture_data.py, plus variants of them
+with weekly and daily restrictions, into LIR shifts with cli.shifts and with a
+copy of the conversion previously inlined in Mapper.map_schedule. Both must
+produce the same shifts; the script reports the time each one takes.
+"""
+from argparse import ArgumentParser
+from cli.shifts import bind_team, layer_templates, parse_timestamp, restriction_window
+from dateutil.parser import parse
+from dateutil.relativedelta import relativedelta
+from tests import fixture_data as fd
+import copy
+import time
+
+ROTATION = {604800: "weekly", 86400: "daily"}
+
+RESTRICTIONS = [
+    [],
+    [
+        {
+            "type": "weekly_restriction",
+            "start_time_of_day": "09:00:00",
+            "duration_seconds": 32400,
+            "start_day_of_week": 1,
+        }
+    ],
+    [
+        {
+            "type": "daily_restriction",
+            "start_time_of_day": "08:30:00",
+            "duration_seconds": 86400,
+        },
+        {
+            "type": "weekly_restriction",
+            "start_time_of_day": "18:00:00",
+            "duration_seconds": 216000,
+            "start_day_of_week": 5,
+        },
+    ],
+]
+
+
+def legacy_shifts(sched, users, teams, rotation):
+    """Conversion previously inlined in Mapper.map_schedule."""
+    shifts = []
+    for team in sched["teams"]:
+        members = set(teams.get(team["id"], {}).get("members", []))
+        for layer in sched["schedule_layers"]:
+            sched_index = 0
+            if layer.get("restrictions"):
+                restrictions = []
+                for restr in layer["restrictions"]:
+                    if restr["type"] == "weekly_restriction":
+                        restrictions.append(
+                            {
+                                "days": "".join(
+                                    [
+                                        str(i)
+                                        for i in range(
+                                            restr["start_day_of_week"] + 1,
+                                            restr["start_day_of_week"]
+                                            + 1
+                                            + round((restr["duration_seconds"] / 86400))
+                                            + 1,
+                                        )
+                                    ]
+                                ),
+                                "start_times": {
+                                    "startTime": ":".join(
+                                        restr["start_time_of_day"].split(":")[0:2]
+                                    ),
+                                    "endTime": (
+                                        parse(restr["start_time_of_day"])
+                                        + relativedelta(
+                                            seconds=restr["duration_seconds"]
+                                        )
+                                    ).strftime("%H:%M"),
+                                },
+                            }
+                        )
+
+                    elif restr["type"] == "daily_restriction":
+                        restrictions.append(
+                            {
+                                "days": "1234567",
+                                "start_times": {
+                                    "startTime": ":".join(
+                                        restr["start_time_of_day"].split(":")[0:2]
+                                    ),
+                                    "endTime": (
+                                        parse(restr["start_time_of_day"])
+                                        + relativedelta(
+                                            seconds=(
+                                                restr["duration_seconds"] - 60
+                                                if restr["duration_seconds"] == 86400
+                                                else restr["duration_seconds"]
+                                            )
+                                        )
+                                    ).strftime("%H:%M"),
+                                },
+                            }
+                        )
+                for restr in restrictions:
+                    primaryMembers = []
+                    for user in layer.get("users", []):
+                        userId = users.get(user["user"]["id"])
+                        if userId in members:
+                            primaryMembers.append(userId)
+                    schedule = {
+                        "name": f"{sched['name']} ({teams.get(team['id'], {}).get('name', '')}) - layer {sched_index}",
+                        "team": teams.get(team["id"], {}).get("sysId", team),
+                        "startTime": restr["start_times"]["startTime"],
+                        "startDate": parse(layer["rotation_virtual_start"]).strftime(
+                            "%Y-%m-%d"
+                        ),
+                        "endTime": restr["start_times"]["endTime"],
+                        "repeatUntil": parse(layer["rotation_virtual_start"]).strftime(
+                            "%Y-%m-%d"
+                        )
+                        if layer["end"]
+                        else (
+                            parse(layer["rotation_virtual_start"])
+                            + relativedelta(years=5)
+                        ).strftime("%Y-%m-%d"),
+                        "rotationType": rotation.get(
+                            layer["rotation_turn_length_seconds"], "weekly"
+                        ),
+                        "days": restr["days"],
+                        "timeZone": sched["timeZone"],
+                        "primaryMembers": primaryMembers,
+                        # We can't fill this in, but the API requires it
+                        "backupMembers": [],
+                    }
+                    sched_index += 1
+                    shifts.append(schedule)
+            else:
+                primaryMembers = []
+                for user in layer.get("users", []):
+                    userId = users.get(user["user"]["id"])
+                    if userId in members:
+                        primaryMembers.append(userId)
+                schedule = {
+                    "name": f"{sched['name']} ({teams.get(team['id'], {}).get('name', '')}) - layer {sched_index}",
+                    "team": teams.get(team["id"], {}).get("sysId", team),
+                    "startTime": parse(layer["start"]).strftime("%H:%M"),
+                    "startDate": parse(layer["start"]).strftime("%Y-%m-%d"),
+                    "endTime": parse(layer["start"]).strftime("%H:%M")
+                    if layer["end"]
+                    else (parse(layer["start"]) + relativedelta(hours=12)).strftime(
+                        "%H:%M"
+                    ),
+                    "repeatUntil": parse(layer["start"]).strftime("%Y-%m-%d")
+                    if layer["end"]
+                    else (parse(layer["start"]) + relativedelta(years=5)).strftime(
+                        "%Y-%m-%d"
+                    ),
+                    "rotationType": rotation.get(
+                        layer["rotation_turn_length_seconds"], "weekly"
+                    ),
+                    "timeZone": sched["timeZone"],
+                    "primaryMembers": primaryMembers,
+                    # We can't fill this in, but the API requires it
+                    "backupMembers": [],
+                }
+                sched_index += 1
+                shifts.append(schedule)
+    return shifts
+
+
+def engine_shifts(sched, users, teams, rotation):
+    """Conversion of Mapper.map_schedule, with the team member sets it uses."""
+    layers = [
+        (
+            layer_templates(layer, rotation),
+            [users.get(user["user"]["id"]) for user in layer.get("users", [])],
+        )
+        for layer in sched["schedule_layers"]
+    ]
+    shifts = []
+    for team in sched["teams"]:
+        mapped = teams.get(team["id"], {})
+        shifts += bind_team(
+            sched,
+            layers,
+            mapped.get("name", ""),
+            mapped.get("sysId", team),
+            set(mapped.get("members", [])),
+        )
+    return shifts
+
+
+def fixture_schedules(copies, team_count):
+    """Copies of the fixture schedules, bound to several teams, with restrictions."""
+    schedules = []
+    for i in range(copies):
+        for n, fixture in enumerate(fd.schedules):
+            sched = copy.deepcopy(fixture)
+            sched["id"] = f"{fixture['id']}-{i}-{n}"
+            sched["teams"] = [{"id": f"team{t}"} for t in range(team_count)]
+            layers = []
+            for restrictions in RESTRICTIONS:
+                for layer in fixture["schedule_layers"]:
+                    layer = copy.deepcopy(layer)
+                    layer["rotation_virtual_start"] = layer["start"]
+                    layer["restrictions"] = copy.deepcopy(restrictions)
+                    layers.append(layer)
+            sched["schedule_layers"] = layers
+            schedules.append(sched)
+    return schedules
+
+
+def timed(convert, schedules, users, teams):
+    start = time.perf_counter()
+    shifts = [convert(sched, users, teams, ROTATION) for sched in schedules]
+    return time.perf_counter() - start, shifts
+
+
+def main(args=None):
+    parser = ArgumentParser()
+    parser.add_argument("--copies", type=int, default=500)
+    parser.add_argument("--teams", type=int, default=3)
+    args = parser.parse_args(args)
+    schedules = fixture_schedules(args.copies, args.teams)
+    users = {user["id"]: f"sys{user['id']}" for user in fd.users}
+    teams = {
+        f"team{t}": {
+            "name": f"team {t}",
+            "sysId": f"systeam{t}",
+            "members": list(users.values())[: t + 1],
+        }
+        for t in range(args.teams)
+    }
+    legacy_seconds, legacy = timed(legacy_shifts, schedules, users, teams)
+    parse_timestamp.cache_clear()
+    restriction_window.cache_clear()
+    engine_seconds, engine = timed(engine_shifts, schedules, users, teams)
+    if engine != legacy:
+        raise SystemExit(
+            "The engine and the legacy conversion produce different shifts"
+        )
+    count = sum(len(shifts) for shifts in engine)
+    print(f"{len(schedules)} schedules, {count} shifts")
+    print(f"{'legacy':<8}{legacy_seconds:>8.3f}s")
+    print(
+        f"{'engine':<8}{engine_seconds:>8.3f}s ({legacy_seconds / engine_seconds:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Synthetic PagerDuty accounts for benchmarks.
+
+The objects follow the shapes returned by the PagerDuty REST API, including the
+reference objects and rendered schedule entries that the migration tool does
+not use, so benchmarks see realistic payload sizes.
+"""
+import random
+
+API_URL = "https://api.pagerduty.com"
+WEB_URL = "https://example.pagerduty.com"
+
+
+def reference(kind, id, summary):
+    return {
+        "id": id,
+        "type": f"{kind}_reference",
+        "summary": summary,
+        "self": f"{API_URL}/{kind}s/{id}",
+        "html_url": f"{WEB_URL}/{kind}s/{id}",
+    }
+
+
+def user(i):
+    id = f"PU{i:06d}"
+    return {
+        "id": id,
+        "type": "user",
+        "summary": f"User {i}",
+        "self": f"{API_URL}/users/{id}",
+        "html_url": f"{WEB_URL}/users/{id}",
+        "name": f"User Number {i}",
+        "email": f"user{i}@example.com",
+        "time_zone": "America/New_York",
+        "color": "green",
+        "role": "admin" if i % 50 == 0 else "user",
+        "avatar_url": f"https://secure.gravatar.com/avatar/{i:032x}.png",
+        "description": f"Engineer {i}",
+        "invitation_sent": False,
+        "job_title": "Engineer",
+        "teams": [reference("team", f"PT{i % 97:05d}", f"Team {i % 97}")],
+        "contact_methods": [
+            reference("email_contact_method", f"PC{i:06d}", "Default"),
+            reference("phone_contact_method", f"PP{i:06d}", "Mobile"),
+        ],
+        "notification_rules": [
+            reference("assignment_notification_rule", f"PN{i:06d}{n}", "Rule")
+            for n in range(3)
+        ],
+    }
+
+
+def team(i):
+    id = f"PT{i:05d}"
+    return {
+        "id": id,
+        "type": "team",
+        "summary": f"Team {i}",
+        "self": f"{API_URL}/teams/{id}",
+        "html_url": f"{WEB_URL}/teams/{id}",
+        "name": f"Team {i}",
+        "description": f"Team number {i}",
+        "default_role": "manager",
+        "parent": None,
+    }
+
+
+def members(team_index, user_count, size, rng):
+    return [
+        {
+            "user": reference("user", f"PU{rng.randrange(user_count):06d}", "User"),
+            "role": "manager" if n == 0 else "responder",
+        }
+        for n in range(size)
+    ]
+
+
+def rules(i, user_count, schedule_count, rng):
+    return [
+        {
+            "id": f"PR{i:05d}{level}",
+            "escalation_delay_in_minutes": 30,
+            "targets": [
+                reference("user", f"PU{rng.randrange(user_count):06d}", "User"),
+                reference(
+                    "schedule", f"PS{rng.randrange(schedule_count):05d}", "Schedule"
+                ),
+            ],
+        }
+        for level in range(3)
+    ]
+
+
+def policy(i, team_count, user_count, schedule_count, rng):
+    id = f"PE{i:05d}"
+    return {
+        "id": id,
+        "type": "escalation_policy",
+        "summary": f"Policy {i}",
+        "self": f"{API_URL}/escalation_policies/{id}",
+        "html_url": f"{WEB_URL}/escalation_policies/{id}",
+        "name": f"Policy {i}",
+        "description": "",
+        "num_loops": 0,
+        "on_call_handoff_notifications": "if_has_services",
+        "escalation_rules": rules(i, user_count, schedule_count, rng),
+        "services": [],
+        # Teams are sideloaded with include[]=teams
+        "teams": [team(i % team_count)] if i % 3 else [],
+    }
+
+
+def service(i, team_count, policy_count, user_count, schedule_count, rng):
+    id = f"PV{i:05d}"
+    return {
+        "id": id,
+        "type": "service",
+        "summary": f"Service {i}",
+        "self": f"{API_URL}/services/{id}",
+        "html_url": f"{WEB_URL}/services/{id}",
+        "name": f"Service {i}",
+        "description": f"Service number {i}",
+        "auto_resolve_timeout": 14400,
+        "acknowledgement_timeout": 600,
+        "status": "active",
+        "alert_creation": "create_alerts_and_incidents",
+        # Policies and teams are sideloaded with include[]
+        "escalation_policy": policy(
+            i % policy_count, team_count, user_count, schedule_count, rng
+        ),
+        "teams": [team(i % team_count)] if i % 4 else [],
+        "integrations": [
+            reference("generic_events_api_inbound_integration", f"PI{i:05d}", "API")
+        ],
+    }
+
+
+def layer(i, n, user_count, rng):
+    layer_users = [
+        reference("user", f"PU{rng.randrange(user_count):06d}", "User")
+        for _ in range(6)
+    ]
+    return {
+        "id": f"PL{i:05d}{n}",
+        "name": f"Layer {n + 1}",
+        "start": "2021-11-06T21:00:00-05:00",
+        "end": None,
+        "rotation_virtual_start": "2021-11-06T21:00:00-05:00",
+        "rotation_turn_length_seconds": 604800 if n % 2 else 86400,
+        "restrictions": [
+            {
+                "type": "weekly_restriction",
+                "start_time_of_day": "09:00:00",
+                "duration_seconds": 32400,
+                "start_day_of_week": 1,
+            }
+        ]
+        if n == 1
+        else [],
+        "users": [{"user": user} for user in layer_users],
+        "rendered_schedule_entries": [
+            {
+                "start": f"2022-01-{day:02d}T09:00:00-05:00",
+                "end": f"2022-01-{day:02d}T18:00:00-05:00",
+                "user": layer_users[day % len(layer_users)],
+            }
+            for day in range(1, 29)
+        ],
+        "rendered_coverage_percentage": 100.0,
+    }
+
+
+def schedule_details(i, team_count, user_count, rng):
+    id = f"PS{i:05d}"
+    layers = [layer(i, n, user_count, rng) for n in range(3)]
+    return {
+        "id": id,
+        "type": "schedule",
+        "summary": f"Schedule {i}",
+        "self": f"{API_URL}/schedules/{id}",
+        "html_url": f"{WEB_URL}/schedules/{id}",
+        "name": f"Schedule {i}",
+        "time_zone": "America/New_York",
+        "description": "",
+        "schedule_layers": layers,
+        "final_schedule": {
+            "name": "Final Schedule",
+            "rendered_schedule_entries": layers[0]["rendered_schedule_entries"],
+        },
+        "overrides_subschedule": {"name": "Overrides", "rendered_schedule_entries": []},
+        "teams": [reference("team", f"PT{i % team_count:05d}", "Team")]
+        if i % 5
+        else [],
+        "users": [user["user"] for user in layers[0]["users"]],
+        "escalation_policies": [],
+    }
+
+
+def schedule(details):
+    return {
+        key: details[key]
+        for key in ("id", "type", "summary", "self", "html_url", "name", "time_zone")
+    } | {"users": details["users"], "escalation_policies": []}
+
+
+def raw_org(
+    users=60000, teams=2000, services=4000, schedules=1800, policies=1800, seed=0
+):
+    """Build the raw API responses of a synthetic PagerDuty account.
+
+    Returns:
+        dict: Index responses per category, plus schedule details and team
+        rosters keyed by ID
+    """
+    rng = random.Random(seed)
+    details = [schedule_details(i, teams, users, rng) for i in range(schedules)]
+    return {
+        "users": [user(i) for i in range(users)],
+        "teams": [team(i) for i in range(teams)],
+        "services": [
+            service(i, teams, policies, users, schedules, rng) for i in range(services)
+        ],
+        "schedules": [schedule(d) for d in details],
+        "escalation_policies": [
+            policy(i, teams, users, schedules, rng) for i in range(policies)
+        ],
+        "schedule_details": {d["id"]: d for d in details},
+        "team_members": {
+            f"PT{i:05d}": members(i, users, 1 + i % 60, rng) for i in range(teams)
+        },
+    }
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+
+class TransportError(Exception):
+    """Raised by asyncio transports when a request cannot be completed."""
+
+
+class ConnectError(TransportError):
+    """Raised when no connection could be made, so the request was never sent."""
+
+
+class TransportResponse:
+    def __init__(self, status_code, headers, body):
+        """Response returned by an asyncio transport.
+
+        Args:
+            status_code (int): HTTP status code
+            headers (Mapping): Response headers
+            body (bytes): Raw response body
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else {}
+
+
+def encode_params(params):
+    """Flatten query parameters with list values, such as include[].
+
+    Args:
+        params (dict): Query parameters
+
+    Returns:
+        list: List of (name, value) tuples
+    """
+    pairs = []
+    for name, value in (params or {}).items():
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            pairs.append((name, str(item)))
+    return pairs
+
+
+class AiohttpTransport:
+    def __init__(self, headers=None, limit=100, timeout=30):
+        """asyncio HTTP transport backed by aiohttp.
+
+        Notes:
+            aiohttp is an optional dependency and is only needed when an
+            asyncio backend is selected. Use the transport as an async context
+            manager; the underlying connection pool lives for its duration.
+
+        Args:
+            headers (dict): Headers sent with every request
+            limit (int): Maximum number of open connections
+            timeout (float): Total timeout for a request, in seconds
+        """
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError(
+                "The asyncio backend requires aiohttp; install it with 'pip install aiohttp'"
+            ) from e
+        self.aiohttp = aiohttp
+        self.headers = headers or {}
+        self.limit = limit
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = self.aiohttp.ClientSession(
+            headers=self.headers,
+            connector=self.aiohttp.TCPConnector(limit=self.limit),
+            timeout=self.aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def request(self, method, url, params=None, data=None, headers=None):
+        """Send a request.
+
+        Args:
+            method (str): HTTP method
+            url (str): Full URL of the request
+            params (dict): Query parameters
+            data (str or bytes): Request body
+            headers (dict): Additional request headers
+
+        Returns:
+            TransportResponse: Response to the request
+        """
+        try:
+            async with self.session.request(
+                method,
+                url,
+                params=encode_params(params),
+                data=data,
+                headers=headers,
+            ) as response:
+                body = await response.read()
+                return TransportResponse(response.status, response.headers, body)
+        except self.aiohttp.ClientConnectorError as e:
+            raise ConnectError(f"{method} {url} failed: {e!r}") from e
+        except (self.aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransportError(f"{method} {url} failed: {e!r}") from e
@@ -0,0 +1,162 @@
+from collections import Counter, OrderedDict
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+lfh = logging.FileHandler("{0}.log".format(__name__))
+logger.addHandler(lfh)
+
+DEFAULT_TTL = 86400
+DEFAULT_MEMO_SIZE = 4096
+
+
+class ResponseCache:
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, offline=False):
+        """On-disk cache of PagerDuty API responses, backed by SQLite.
+
+        Notes:
+            Responses are keyed by endpoint and query parameters. Entries older
+            than the TTL are treated as misses, except in offline mode, where
+            any cached entry is served and misses never reach the network.
+
+        Args:
+            cache_dir (str): Directory holding the cache database
+            ttl (int): Maximum age of a cached response, in seconds
+            offline (bool): Serve only from the cache
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "pagerduty.sqlite3")
+        self.ttl = ttl
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, stored_at REAL NOT NULL, body TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(endpoint, params=None):
+        """Build the cache key for a request.
+
+        Args:
+            endpoint (str): PagerDuty API endpoint
+            params (dict): Query parameters sent with the request
+
+        Returns:
+            str: Cache key
+        """
+        return json.dumps([endpoint.lstrip("/"), params or {}], sort_keys=True)
+
+    def get(self, endpoint, params=None):
+        """Look up a cached response.
+
+        Args:
+            endpoint (str): PagerDuty API endpoint
+            params (dict): Query parameters sent with the request
+
+        Returns:
+            list or dict: Cached response, or None on a miss
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT stored_at, body FROM responses WHERE key = ?",
+                (self.make_key(endpoint, params),),
+            ).fetchone()
+            if row is None or (not self.offline and time.time() - row[0] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def set(self, endpoint, params, value):
+        """Store a response.
+
+        Args:
+            endpoint (str): PagerDuty API endpoint
+            params (dict): Query parameters sent with the request
+            value (list or dict): Response to cache
+        """
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, body) VALUES (?, ?, ?)",
+                (self.make_key(endpoint, params), time.time(), json.dumps(value)),
+            )
+            self.conn.commit()
+
+    def log_stats(self):
+        """Log the cache hit and miss counters."""
+        logger.info(
+            f"[CACHE] {self.hits} hits, {self.misses} misses for PagerDuty responses cached in {self.path}"
+        )
+
+
+class DetailMemo:
+    def __init__(self, maxsize=DEFAULT_MEMO_SIZE):
+        """In-memory LRU memo of PagerDuty detail responses.
+
+        Notes:
+            The memo can be seeded with objects already extracted by list
+            calls, such as escalation policies, so later detail requests for
+            them are answered without a round trip. Hits and misses are counted
+            per endpoint kind (the first path segment, e.g. "services").
+
+        Args:
+            maxsize (int): Maximum number of responses kept
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def kind(endpoint):
+        return endpoint.lstrip("/").split("/")[0]
+
+    def get(self, endpoint):
+        """Look up a memoized response.
+
+        Args:
+            endpoint (str): PagerDuty API endpoint
+
+        Returns:
+            dict: Memoized response, or None on a miss
+        """
+        endpoint = endpoint.lstrip("/")
+        with self.lock:
+            if endpoint in self.entries:
+                self.entries.move_to_end(endpoint)
+                self.hits[self.kind(endpoint)] += 1
+                return self.entries[endpoint]
+            self.misses[self.kind(endpoint)] += 1
+        return None
+
+    def set(self, endpoint, value):
+        """Memoize a response, evicting the least recently used one if full.
+
+        Args:
+            endpoint (str): PagerDuty API endpoint
+            value (dict): Response to memoize
+        """
+        endpoint = endpoint.lstrip("/")
+        with self.lock:
+            self.entries[endpoint] = value
+            self.entries.move_to_end(endpoint)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def log_stats(self):
+        """Log the hit rate of each endpoint kind."""
+        for kind in sorted(set(self.hits) | set(self.misses)):
+            total = self.hits[kind] + self.misses[kind]
+            logger.info(
+                f"[CACHE] {kind} details: {self.hits[kind]}/{total} requests served from memory ({self.hits[kind] / total:.0%})"
+            )
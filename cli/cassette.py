@@ -0,0 +1,225 @@
+from collections import defaultdict, deque
+from datetime import timedelta
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+import gzip
+import hashlib
+import json
+import logging
+import requests
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+lfh = logging.FileHandler("{0}.log".format(__name__))
+logger.addHandler(lfh)
+
+# These describe the encoded body on the wire; the recorded body is decoded
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def request_key(method, url, body, headers=None):
+    """Key matching a replayed request with a recorded one.
+
+    Notes:
+        gzip-encoded bodies are hashed decompressed, since the gzip header
+        holds the time of compression and differs between two runs.
+
+    Args:
+        method (str): HTTP method
+        url (str): Full URL, including the query string
+        body (str or bytes): Request body
+        headers (dict): Request headers
+
+    Returns:
+        tuple: (method, url, digest of the body)
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if body and (headers or {}).get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    digest = hashlib.sha1(body).hexdigest() if body else None
+    return method, url, digest
+
+
+class Recorder:
+    def __init__(self, path):
+        """Records HTTP traffic to a cassette.
+
+        Notes:
+            A cassette is a gzip-compressed file holding one JSON object per
+            line for every request: its method, URL and body digest, and the
+            status, headers, body and latency of its response.
+
+        Args:
+            path (str): Path of the cassette file
+        """
+        self.path = path
+        self.count = 0
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+
+    def attach(self, session):
+        """Record every request sent through a session.
+
+        Args:
+            session (requests.Session): Session whose adapters are wrapped
+        """
+        for prefix, adapter in list(session.adapters.items()):
+            session.mount(prefix, RecordingAdapter(adapter, self))
+
+    def write(self, request, response):
+        """Append a request and its response to the cassette.
+
+        Args:
+            request (requests.PreparedRequest): Request that was sent
+            response (requests.Response): Response that was received
+        """
+        method, url, digest = request_key(
+            request.method, request.url, request.body, request.headers
+        )
+        entry = {
+            "m": method,
+            "u": url,
+            "b": digest,
+            "s": response.status_code,
+            "h": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in DROPPED_HEADERS
+            },
+            "t": round(response.elapsed.total_seconds(), 4),
+            "r": response.content.decode("utf-8", "replace"),
+        }
+        line = json.dumps(entry, separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        """Close the cassette file."""
+        with self.lock:
+            self.file.close()
+        logger.info(f"[CASSETTE] Recorded {self.count} requests to {self.path}")
+
+
+class RecordingAdapter(BaseAdapter):
+    def __init__(self, adapter, recorder):
+        """Transport adapter that records the responses of another adapter.
+
+        Args:
+            adapter (requests.adapters.BaseAdapter): Adapter sending the requests
+            recorder (Recorder): Cassette recorder
+        """
+        super().__init__()
+        self.adapter = adapter
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        self.recorder.write(request, response)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class Player:
+    def __init__(self, path, latency=None):
+        """Replays HTTP traffic from a cassette.
+
+        Notes:
+            Requests are matched on method, URL and body. Identical requests
+            are answered with their recorded responses in order, and with the
+            last one once those run out. Requests missing from the cassette
+            fail with a ConnectionError, like an unreachable server.
+
+        Args:
+            path (str): Path of the cassette file
+            latency: None to answer immediately, "recorded" to wait as long as
+                the recorded response took, or a number of seconds to wait
+                before every response
+        """
+        self.path = path
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.entries = defaultdict(deque)
+        self.misses = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.entries[(entry["m"], entry["u"], entry["b"])].append(entry)
+
+    def attach(self, session):
+        """Answer every request sent through a session from the cassette.
+
+        Args:
+            session (requests.Session): Session whose adapters are replaced
+        """
+        adapter = ReplayAdapter(self)
+        for prefix in list(session.adapters):
+            session.mount(prefix, adapter)
+
+    def lookup(self, request):
+        """Find the recorded response for a request.
+
+        Args:
+            request (requests.PreparedRequest): Request to answer
+
+        Returns:
+            dict: Recorded entry, or None if the request was not recorded
+        """
+        key = request_key(request.method, request.url, request.body, request.headers)
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                self.misses += 1
+                return None
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def log_stats(self):
+        """Log the number of requests missing from the cassette."""
+        if self.misses:
+            logger.warning(
+                f"[CASSETTE] {self.misses} requests had no recorded response in {self.path}"
+            )
+
+    def delay(self, entry):
+        """Seconds to wait before answering with a recorded entry."""
+        if self.latency == "recorded":
+            return entry["t"]
+        return float(self.latency or 0)
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, player):
+        """Transport adapter answering requests from a cassette.
+
+        Args:
+            player (Player): Cassette player
+        """
+        super().__init__()
+        self.player = player
+
+    def send(self, request, **kwargs):
+        entry = self.player.lookup(request)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(
+                f"No recorded response for {request.method} {request.url}",
+                request=request,
+            )
+        delay = self.player.delay(entry)
+        if delay:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = entry["s"]
+        response.headers = CaseInsensitiveDict(entry["h"])
+        response._content = entry["r"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=entry["t"])
+        return response
+
+    def close(self):
+        pass
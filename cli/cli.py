@@ -1,5 +1,13 @@
 from argparse import ArgumentParser
+from .cache import DEFAULT_TTL, ResponseCache
+from .cassette import Player, Recorder
+from .concurrency import DEFAULT_WORKERS
+from .journal import Journal
+from .lir import DEFAULT_BATCH_WAIT, DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES
 from .mapper import Mapper
+from .pagerduty import DEFAULT_RATE
+from .report import Report
+from .snapshot import Snapshot
 import logging
 import sys
 
@@ -30,13 +38,178 @@ def parse_args(args):
         default=False,
         help="Output noop with pretty print json",
     )
+    parser.add_argument(
+        "--workers",
+        action="store",
+        type=int,
+        default=1,
+        help="Number of concurrent LIR create requests",
+    )
+    parser.add_argument(
+        "--pd-workers",
+        action="store",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of concurrent PagerDuty detail requests",
+    )
+    parser.add_argument(
+        "--pd-backend",
+        action="store",
+        default="sync",
+        choices=["sync", "async"],
+        help="PagerDuty extraction backend; async requires aiohttp",
+    )
+    parser.add_argument(
+        "--pd-rate",
+        action="store",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Maximum number of PagerDuty API requests per second",
+    )
+    parser.add_argument(
+        "--lir-timeout",
+        action="store",
+        type=float,
+        default=DEFAULT_READ_TIMEOUT,
+        help="Read timeout of LIR requests, in seconds",
+    )
+    parser.add_argument(
+        "--lir-retries",
+        action="store",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Maximum number of retries of a failed LIR request",
+    )
+    parser.add_argument(
+        "--lir-batch-size",
+        action="store",
+        type=int,
+        default=0,
+        help="Send LIR creates through the Batch API, with up to this many per request; a batch only holds creates from concurrent workers, so this cannot exceed --workers",
+    )
+    parser.add_argument(
+        "--lir-batch-wait",
+        action="store",
+        type=float,
+        default=DEFAULT_BATCH_WAIT,
+        help="Maximum time a LIR create waits for its batch to fill, in seconds",
+    )
+    parser.add_argument(
+        "--lir-gzip",
+        action="store_true",
+        default=False,
+        help="Compress large LIR request bodies with gzip",
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        default=False,
+        help="Reuse objects that already exist in LIR instead of creating them again",
+    )
+    parser.add_argument(
+        "--report",
+        action="store",
+        default=None,
+        help='Stream the noop output as JSON lines to this file ("-" for stdout); gzip-compressed if it ends in .gz',
+    )
+    parser.add_argument(
+        "--summary-only",
+        action="store_true",
+        default=False,
+        help="Write only per-category counts and warnings to the noop report",
+    )
+    parser.add_argument(
+        "--phased",
+        action="store_true",
+        default=False,
+        help="Migrate all users, then all teams and so on, instead of each object as soon as its dependencies exist",
+    )
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        default=False,
+        help="Disable concurrent requests, for debugging",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        action="store",
+        default=None,
+        help="Directory for an on-disk cache of PagerDuty responses",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        action="store",
+        type=int,
+        default=DEFAULT_TTL,
+        help="Maximum age of cached PagerDuty responses, in seconds",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        default=False,
+        help="Serve PagerDuty data from the cache only, without network access",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store",
+        default=None,
+        help="Snapshot file used to migrate only objects changed since the last run",
+    )
+    parser.add_argument(
+        "--journal",
+        action="store",
+        default=None,
+        help="Journal file recording every object created in LIR",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Reuse the objects recorded in --journal by an interrupted run instead of creating them again",
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        action="store",
+        default=None,
+        help="Record all PagerDuty and LIR traffic to a cassette file",
+    )
+    cassette.add_argument(
+        "--replay",
+        action="store",
+        default=None,
+        help="Answer all PagerDuty and LIR requests from a cassette file",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        action="store",
+        default=None,
+        help='Latency of replayed responses: "recorded", or a number of seconds',
+    )
     parser.add_argument(
         "--level",
         action="store",
         default="INFO",
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
     )
-    return parser.parse_args(args)
+    parsed = parser.parse_args(args)
+    if parsed.offline and not parsed.cache_dir:
+        parser.error("--offline requires --cache-dir")
+    if (parsed.report or parsed.summary_only) and not parsed.noop:
+        parser.error("--report and --summary-only require --noop")
+    workers = 1 if parsed.serial else parsed.workers
+    if parsed.lir_batch_size > workers:
+        parser.error(
+            f"--lir-batch-size {parsed.lir_batch_size} needs at least as many --workers, since only concurrent creates share a batch (got {workers})"
+        )
+    if parsed.resume and not parsed.journal:
+        parser.error("--resume requires --journal")
+    if parsed.replay_latency not in (None, "recorded"):
+        try:
+            parsed.replay_latency = float(parsed.replay_latency)
+        except ValueError:
+            parser.error('--replay-latency must be "recorded" or a number of seconds')
+    return parsed
 
 
 def setup_logger(args):
@@ -61,17 +234,77 @@ def setup_logger(args):
 
 def main(args):
     setup_logger(args)
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl, offline=args.offline)
+    snapshot = Snapshot(args.snapshot) if args.snapshot else None
+    report = None
+    if args.report or args.summary_only:
+        report = Report(args.report, summary_only=args.summary_only)
+    resumed = Journal.replay(args.journal) if args.resume else []
+    journal = Journal(args.journal) if args.journal else None
     mapper = Mapper(
-        args.lirtoken, args.apiurl, args.pd, noop=args.noop, pretty=args.pretty
-    )
-    mapper.map_and_create_users()
-    mapper.map_team_members()
-    mapper.map_teams()
-    mapper.map_services()
-    mapper.map_schedules()
-    mapper.map_escalations()
-    if args.noop:
+        args.lirtoken,
+        args.apiurl,
+        args.pd,
+        noop=args.noop,
+        pretty=args.pretty,
+        pd_workers=args.pd_workers,
+        serial=args.serial,
+        cache=cache,
+        snapshot=snapshot,
+        pd_rate=args.pd_rate,
+        pd_backend=args.pd_backend,
+        lir_timeout=args.lir_timeout,
+        lir_retries=args.lir_retries,
+        workers=args.workers,
+        lir_batch_size=args.lir_batch_size,
+        lir_batch_wait=args.lir_batch_wait,
+        lir_compress=args.lir_gzip,
+        report=report,
+        journal=journal,
+    )
+    recorder = player = None
+    if args.record:
+        recorder = Recorder(args.record)
+        recorder.attach(mapper.pd.session)
+        recorder.attach(mapper.lir.session)
+    elif args.replay:
+        player = Player(args.replay, latency=args.replay_latency)
+        player.attach(mapper.pd.session)
+        player.attach(mapper.lir.session)
+    if args.skip_existing:
+        mapper.lir.load_existing(mapper.workers)
+    if snapshot:
+        mapper.apply_snapshot()
+    if args.resume:
+        mapper.resume(resumed)
+    try:
+        if args.phased:
+            mapper.map_and_create_users()
+            mapper.map_team_members()
+            mapper.map_teams()
+            mapper.map_services()
+            mapper.map_schedules()
+            mapper.map_escalations()
+        else:
+            mapper.migrate()
+    finally:
+        # Keep what was created when the run is interrupted
+        if journal:
+            journal.close()
+    if report:
+        report.close()
+    elif args.noop:
         mapper.noop_output()
+    elif snapshot:
+        snapshot.save(mapper)
+    mapper.pd.log_stats()
+    mapper.lir.log_stats()
+    if recorder:
+        recorder.close()
+    if player:
+        player.log_stats()
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+def map_ordered(func, items, workers=DEFAULT_WORKERS):
+    """Apply func to every item using a bounded pool of worker threads.
+
+    Notes:
+        Results are returned in the same order as the input items, regardless
+        of the order in which the workers finish. With one worker (or fewer),
+        items are processed serially in the calling thread, which keeps
+        tracebacks and debug logs readable.
+
+    Args:
+        func (callable): Function to call with each item
+        items (iterable): Items to process
+        workers (int): Maximum number of concurrent workers
+
+    Returns:
+        list: Results of func for each item, in input order
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    logger.debug(f"Processing {len(items)} items with {workers} workers.")
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(func, items))
@@ -0,0 +1,173 @@
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+lfh = logging.FileHandler("{0}.log".format(__name__))
+logger.addHandler(lfh)
+
+
+class Graph:
+    def __init__(self):
+        """Dependency graph of migration steps, run as soon as their inputs exist.
+
+        Notes:
+            Each node is a callable migrating one PagerDuty object, keyed by a
+            string such as "team:PABC123". A node runs once every node it
+            depends on has finished; dependencies on keys that are not in the
+            graph are ignored. A node that fails is logged and still releases
+            its dependents, which then migrate with whatever sysIds exist, as
+            they would after a failed create in a phased run.
+        """
+        self.nodes = {}
+        self.deps = {}
+        self.durations = {}
+        self.elapsed = 0.0
+
+    def add(self, key, func, deps=()):
+        """Add a node to the graph.
+
+        Args:
+            key (str): Unique key of the node
+            func (callable): Function called without arguments to run the node
+            deps (iterable): Keys of the nodes that must finish first
+
+        Raises:
+            ValueError: If the graph already has a node with this key
+        """
+        if key in self.nodes:
+            raise ValueError(f"Duplicate migration step {key}")
+        self.nodes[key] = func
+        self.deps[key] = list(deps)
+
+    def resolved_deps(self):
+        return {
+            key: {dep for dep in deps if dep in self.nodes and dep != key}
+            for key, deps in self.deps.items()
+        }
+
+    def order(self):
+        """Topological order of the nodes, following insertion where possible.
+
+        Returns:
+            list: Node keys, each after all of its dependencies
+
+        Raises:
+            ValueError: If the dependencies form a cycle
+        """
+        deps = self.resolved_deps()
+        dependents = defaultdict(list)
+        for key, key_deps in deps.items():
+            for dep in key_deps:
+                dependents[dep].append(key)
+        waiting = {key: len(key_deps) for key, key_deps in deps.items()}
+        # Always take the earliest added ready node, so nodes added after
+        # their dependencies run exactly in the order they were added
+        index = {key: i for i, key in enumerate(self.nodes)}
+        ready = [index[key] for key in self.nodes if not waiting[key]]
+        keys = list(self.nodes)
+        order = []
+        while ready:
+            key = keys[heapq.heappop(ready)]
+            order.append(key)
+            for dependent in dependents[key]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    heapq.heappush(ready, index[dependent])
+        if len(order) < len(self.nodes):
+            cycle = sorted(key for key in self.nodes if waiting[key])
+            raise ValueError(f"Dependency cycle between {', '.join(cycle)}")
+        return order
+
+    def execute(self, key):
+        start = time.monotonic()
+        try:
+            self.nodes[key]()
+        except Exception:
+            logger.exception(f"[DAG] Failed to migrate {key}")
+        self.durations[key] = time.monotonic() - start
+
+    def run(self, workers=1):
+        """Run every node, each as soon as its dependencies have finished.
+
+        Notes:
+            With one worker (or fewer), nodes run serially in the calling
+            thread in topological order, which is the order they were added
+            in if every node was added after its dependencies.
+
+        Args:
+            workers (int): Maximum number of nodes running at once
+
+        Raises:
+            ValueError: If the dependencies form a cycle
+        """
+        order = self.order()
+        start = time.monotonic()
+        if workers <= 1 or len(order) <= 1:
+            for key in order:
+                self.execute(key)
+        else:
+            self.run_concurrent(workers)
+        self.elapsed = time.monotonic() - start
+
+    def run_concurrent(self, workers):
+        deps = self.resolved_deps()
+        dependents = defaultdict(list)
+        for key, key_deps in deps.items():
+            for dep in key_deps:
+                dependents[dep].append(key)
+        waiting = {key: len(key_deps) for key, key_deps in deps.items()}
+        ready = deque(key for key in self.nodes if not waiting[key])
+        logger.debug(
+            f"Running {len(self.nodes)} migration steps with {workers} workers."
+        )
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while ready or running:
+                while ready:
+                    key = ready.popleft()
+                    running[pool.submit(self.execute, key)] = key
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for dependent in dependents[running.pop(future)]:
+                        waiting[dependent] -= 1
+                        if not waiting[dependent]:
+                            ready.append(dependent)
+
+    def critical_path(self):
+        """Longest chain of dependent nodes, weighted by how long each one ran.
+
+        Notes:
+            No number of workers can finish the run faster than its critical
+            path, which makes it the bound to compare the wall time against.
+
+        Returns:
+            tuple: (list of node keys along the path, total seconds)
+        """
+        deps = self.resolved_deps()
+        finish = {}
+        previous = {}
+        for key in self.order():
+            slowest = max(deps[key], key=finish.get, default=None)
+            previous[key] = slowest
+            finish[key] = self.durations.get(key, 0.0) + finish.get(slowest, 0.0)
+        if not finish:
+            return [], 0.0
+        key = max(finish, key=finish.get)
+        seconds = finish[key]
+        path = []
+        while key is not None:
+            path.append(key)
+            key = previous[key]
+        return path[::-1], seconds
+
+    def log_stats(self):
+        """Log the wall time of the run and the length of its critical path."""
+        path, seconds = self.critical_path()
+        logger.info(
+            f"[DAG] Migrated {len(self.durations)} objects in {self.elapsed:.2f}s; critical path of {len(path)} objects takes {seconds:.2f}s"
+        )
+        if path:
+            logger.debug(f"[DAG] Critical path: {' -> '.join(path)}")
@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+
+class MigrationIndex:
+    def __init__(self, services, escalations):
+        """Reverse lookups between extracted PagerDuty objects.
+
+        Notes:
+            The index is built once after extraction, so the mapping phases
+            resolve references with dict lookups instead of scanning the
+            extracted lists for every object. Policies of services extracted
+            without a sideloaded policy are added with bind_policy once they
+            are resolved. Member sets of mapped LIR teams are built on first
+            use, once their members' users exist.
+
+        Args:
+            services (list): Extracted PagerDuty services
+            escalations (list): Extracted PagerDuty escalation policies
+        """
+        self.policies = {}
+        self.schedules_by_policy = {}
+        for escal in escalations:
+            self.policies.setdefault(escal["id"], escal)
+            self.schedules_by_policy.setdefault(
+                escal["id"],
+                list(
+                    dict.fromkeys(
+                        target["id"]
+                        for rule in escal.get("rules", [])
+                        for target in rule["targets"]
+                        if target["type"] == "schedule_reference"
+                    )
+                ),
+            )
+        self.services_by_policy = defaultdict(dict)
+        for service in services:
+            self.bind_policy(service, service.get("escalation_policy"))
+        self.member_sets = {}
+
+    def bind_policy(self, service, policy):
+        """Record the escalation policy of a service.
+
+        Args:
+            service (dict): PagerDuty service
+            policy (dict): Escalation policy of the service, or None
+        """
+        policy_id = (policy or {}).get("id")
+        if policy_id:
+            self.services_by_policy[policy_id][service["id"]] = service
+
+    def policy(self, policy_id):
+        """Escalation policy by PagerDuty ID, or None if it was not extracted."""
+        return self.policies.get(policy_id)
+
+    def services_for_policy(self, policy_id):
+        """Services escalating through a policy."""
+        return list(self.services_by_policy.get(policy_id, {}).values())
+
+    def schedules_for_policy(self, policy_id):
+        """IDs of the schedules targeted by a policy, in the order of its rules."""
+        return self.schedules_by_policy.get(policy_id, [])
+
+    def team_members(self, team_id, team):
+        """Set of the LIR sysIds of a mapped team's members.
+
+        Args:
+            team_id (str): Key of the team in Mapper.teams
+            team (dict): Mapped LIR team
+
+        Returns:
+            set: sysIds of the team members
+        """
+        members = team.get("members", [])
+        cached = self.member_sets.get(team_id)
+        # Rebuilt if the team was replaced since its set was built
+        if cached is None or cached[0] is not members:
+            cached = (members, set(members))
+            self.member_sets[team_id] = cached
+        return cached[1]
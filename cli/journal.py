@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+lfh = logging.FileHandler("{0}.log".format(__name__))
+logger.addHandler(lfh)
+
+DEFAULT_SYNC_EVERY = 256
+DEFAULT_SYNC_INTERVAL = 1.0
+
+
+class Journal:
+    def __init__(
+        self,
+        path,
+        sync_every=DEFAULT_SYNC_EVERY,
+        sync_interval=DEFAULT_SYNC_INTERVAL,
+    ):
+        """Append-only journal of the objects created in LIR.
+
+        Notes:
+            Every successful create is appended as one JSON line holding the
+            kind of object, the key of the PagerDuty object it was mapped
+            from and its LIR sysId. Writes are flushed and fsynced in batches,
+            every sync_every entries or sync_interval seconds, whichever comes
+            first, and when the journal is closed; a crash loses at most the
+            last unsynced batch, whose objects are created again on resume.
+            An existing journal is cut back to its last complete line before
+            anything is appended, so a line torn by a crash is dropped instead
+            of being glued to the next entry.
+
+        Args:
+            path (str): Path of the journal file; appended to if it exists
+            sync_every (int): Maximum number of entries between two fsyncs
+            sync_interval (float): Maximum time between two fsyncs, in seconds
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.pending = 0
+        self.count = 0
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()
+        self.file = open(path, "a+b")
+        self.truncate_torn_line()
+
+    def truncate_torn_line(self):
+        end = self.file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            self.file.seek(start)
+            newline = self.file.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            logger.warning(
+                f"[JOURNAL] Dropping incomplete last entry of {self.path} ({end - position} bytes)"
+            )
+            self.file.truncate(position)
+            self.sync_locked()
+
+    def append(self, kind, key, sys_id):
+        """Record a successful create.
+
+        Args:
+            kind (str): Kind of object, e.g. "user"
+            key (str): Key of the PagerDuty object it was mapped from
+            sys_id (str): sysId of the LIR object
+        """
+        entry = {"k": kind, "id": key, "s": sys_id}
+        line = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            self.file.write(line + b"\n")
+            self.pending += 1
+            self.count += 1
+            if (
+                self.pending >= self.sync_every
+                or time.monotonic() - self.last_sync >= self.sync_interval
+            ):
+                self.sync_locked()
+
+    def sync_locked(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        """Flush and fsync the entries written so far."""
+        with self.lock:
+            self.sync_locked()
+
+    def close(self):
+        """Sync and close the journal."""
+        with self.lock:
+            if self.file.closed:
+                return
+            self.sync_locked()
+            self.file.close()
+        logger.info(f"[JOURNAL] Recorded {self.count} creates to {self.path}")
+
+    @staticmethod
+    def replay(path):
+        """Read the entries of a journal.
+
+        Notes:
+            A last line cut short by a crash is skipped.
+
+        Args:
+            path (str): Path of the journal file
+
+        Returns:
+            list: Entries as dicts with keys "k" (kind), "id" (key) and "s"
+            (sysId); empty if the journal does not exist
+        """
+        if not os.path.exists(path):
+            logger.info(f"[JOURNAL] No journal found at {path}, nothing to resume")
+            return []
+        with open(path, "rb") as f:
+            lines = f.read().splitlines()
+        try:
+            # One parse of the whole journal is several times faster than one
+            # per line; lines are only parsed one by one to skip a broken entry
+            return json.loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            pass
+        entries = []
+        for number, line in enumerate(lines, 1):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if number < len(lines):
+                    raise
+                logger.warning(
+                    f"[JOURNAL] Skipping incomplete last entry of {path}, line {number}"
+                )
+        return entries
@@ -1,32 +1,452 @@
+from collections import Counter
+from .aio import AiohttpTransport, ConnectError, TransportError
+from .concurrency import map_ordered
+from concurrent.futures import Future
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import base64
+import gzip
+import hashlib
 import requests
 import json
 import logging
+import random
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
 logger = logging.getLogger(__name__)
 lfh = logging.FileHandler("{0}.log".format(__name__))
 logger.addHandler(lfh)
 
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+DEFAULT_BATCH_WAIT = 0.05
+DEFAULT_IN_FLIGHT = 100
+BATCH_PATH = "/api/now/v1/batch"
+PAGE_SIZE = 1000
+KINDS = ("user", "team", "service", "shift", "escalation_policy")
+# Bodies smaller than this gain too little from compression to be worth it
+COMPRESS_MIN_BYTES = 1024
+
+
+def json_serializer(obj):
+    """Serialize a payload with the standard library json module."""
+    return json.dumps(obj).encode("utf-8")
+
+
+def orjson_serializer(obj):
+    """Serialize a payload with orjson."""
+    return orjson.dumps(obj)
+
+
+# orjson is an optional dependency; it is used when installed
+DEFAULT_SERIALIZER = orjson_serializer if orjson else json_serializer
+
+
+def encode_body(payload, compress=False):
+    """Prepare a request body for sending.
+
+    Args:
+        payload (bytes): Serialized payload
+        compress (bool): gzip the body, when it is large enough to benefit
+
+    Returns:
+        tuple: (body, extra request headers)
+    """
+    if compress and len(payload) >= COMPRESS_MIN_BYTES:
+        # No timestamp in the gzip header, so equal payloads give equal bodies
+        return gzip.compress(payload, mtime=0), {"Content-Encoding": "gzip"}
+    return payload, {}
+
+
+class WireStats:
+    def __init__(self):
+        """Per-endpoint counters of request body sizes, before and after compression."""
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.serialized = Counter()
+        self.sent = Counter()
+
+    def add(self, endpoint, serialized, sent):
+        """Count a request body.
+
+        Args:
+            endpoint (str): Path of the endpoint
+            serialized (int): Size of the serialized payload, in bytes
+            sent (int): Size of the body sent on the wire, in bytes
+        """
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.serialized[endpoint] += serialized
+            self.sent[endpoint] += sent
+
+    def log_stats(self):
+        """Log the body sizes of each endpoint."""
+        for endpoint in sorted(self.requests):
+            serialized, sent = self.serialized[endpoint], self.sent[endpoint]
+            logger.info(
+                f"[BYTES] {endpoint}: {self.requests[endpoint]} requests, {serialized} bytes serialized, {sent} bytes sent ({1 - sent / max(serialized, 1):.0%} saved)"
+            )
+
+
+def reference(value):
+    """sysId of a reference field, which LIR may return as a link object."""
+    return value.get("value") if isinstance(value, dict) else value
+
+
+def canonical(value):
+    """Normalize an LIR field for comparison between a payload and a listed object.
+
+    Notes:
+        Link objects are replaced by the sysId they point to, and lists of
+        sysIds are sorted, since the mapper builds audiences from sets.
+    """
+    if isinstance(value, dict):
+        if "value" in value and set(value) <= {"link", "value"}:
+            return value["value"]
+        return {key: canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [canonical(item) for item in value]
+        if all(isinstance(item, str) for item in items):
+            return sorted(items)
+        return items
+    return value
+
+
+def natural_key(kind, obj):
+    """Key identifying an LIR object independently of its sysId.
+
+    Notes:
+        Escalation policies carry no name, so they are keyed by their team
+        and a digest of their steps, which tells apart several policies of
+        the same team.
+
+    Args:
+        kind (str): Kind of object, as in its API path (e.g. "escalation_policy")
+        obj (dict): Object as created or as returned by LIR
+
+    Returns:
+        The natural key of the object; falsy when it has none
+    """
+    if kind == "user":
+        return (obj.get("emailAddress") or "").lower()
+    if kind in ("team", "service"):
+        return obj.get("name")
+    if kind == "shift":
+        return (reference(obj.get("team")), obj.get("name"))
+    steps = json.dumps(canonical(obj.get("steps") or []), sort_keys=True)
+    return (
+        reference(obj.get("team")),
+        hashlib.sha1(steps.encode("utf-8")).hexdigest(),
+    )
+
+
+def find_existing(existing, kind, payload):
+    """sysId of the existing LIR object matching a create payload.
+
+    Args:
+        existing (dict): Index built by LIR.load_existing
+        kind (str): Kind of object, as in its API path (e.g. "user")
+        payload (dict): Payload of the create
+
+    Returns:
+        str: sysId of the existing object, or None
+    """
+    sys_id = existing[kind].get(natural_key(kind, payload))
+    if sys_id:
+        logger.info(
+            f"[EXISTING] Reusing existing {kind} {natural_key(kind, payload)} with sysId {sys_id}"
+        )
+    return sys_id
+
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Statuses that guarantee a request was not processed, so that even a POST
+# can be sent again without creating a duplicate object.
+UNPROCESSED_STATUSES = frozenset([429, 503])
+
+
+class CountingRetry(Retry):
+    def __init__(self, *args, counters=None, lock=None, **kwargs):
+        """Retry policy for LIR requests that counts every retry it allows.
+
+        Notes:
+            Backoff is exponential with jitter, so that concurrent requests
+            failing together do not retry together. Retry-After is honoured
+            when sent. Requests that are not idempotent (POST) are only retried
+            on connection errors and on statuses that guarantee the request was
+            not processed; their read errors are never retried, since the object
+            may have been created before the connection dropped. Idempotent
+            requests (GET) are also retried on read errors.
+
+        Args:
+            counters (Counter): Retry counters shared by every copy of the policy
+            lock (threading.Lock): Lock guarding the counters
+        """
+        self.counters = Counter() if counters is None else counters
+        self.lock = threading.Lock() if lock is None else lock
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kwargs):
+        kwargs.setdefault("counters", self.counters)
+        kwargs.setdefault("lock", self.lock)
+        return super().new(**kwargs)
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() not in Retry.DEFAULT_ALLOWED_METHODS and (
+            status_code not in UNPROCESSED_STATUSES
+        ):
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def increment(self, method=None, url=None, response=None, error=None, **kwargs):
+        if (
+            error is not None
+            and self._is_read_error(error)
+            and (method or "").upper() not in Retry.DEFAULT_ALLOWED_METHODS
+        ):
+            raise error
+        retry = super().increment(method, url, response, error, **kwargs)
+        reason = response.status if response is not None else type(error).__name__
+        with self.lock:
+            self.counters[reason] += 1
+        return retry
+
+
+def log_retries(counters):
+    """Log the number of retried LIR requests, by status code or error.
+
+    Args:
+        counters (Counter): Retries by status code or error name
+    """
+    if not counters:
+        return
+    counts = ", ".join(
+        f"{count} after {reason}"
+        for reason, count in sorted(counters.items(), key=lambda item: str(item[0]))
+    )
+    logger.info(f"[RETRY] Retried LIR requests: {counts}")
+
+
+class BatchTransport:
+    def __init__(self, lir, size, wait=DEFAULT_BATCH_WAIT):
+        """Sends LIR requests through the ServiceNow Batch API.
+
+        Notes:
+            Requests are queued and a background thread sends them as
+            sub-requests of a single POST to /api/now/v1/batch, as soon as
+            `size` requests are queued or the oldest one has waited `wait`
+            seconds. Each caller blocks until the sub-response for its own
+            request is back, so batches only fill up when several workers
+            submit requests concurrently.
+
+        Args:
+            lir (LIR): Client whose session sends the batch requests
+            size (int): Maximum number of sub-requests per batch request
+            wait (float): Maximum time a request waits for its batch, in seconds
+        """
+        self.lir = lir
+        self.size = size
+        self.wait = wait
+        self.pending = []
+        self.batches = 0
+        self.requests = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, url, payload):
+        """Queue a POST request.
+
+        Args:
+            url (str): Full URL of the endpoint
+            payload (bytes): Serialized json payload for the endpoint
+
+        Returns:
+            Future: Future resolving to (status code, response json)
+        """
+        future = Future()
+        with self.condition:
+            self.pending.append((url, payload, future, time.monotonic()))
+            self.condition.notify()
+        return future
+
+    def close(self):
+        """Send the queued requests and stop the background thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                deadline = self.pending[0][3] + self.wait
+                while len(self.pending) < self.size and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.pending[: self.size]
+                self.pending = self.pending[self.size :]
+            try:
+                self.send(batch)
+            except Exception as e:
+                # Never leave a caller waiting on a batch that went wrong
+                logger.error(f"Encountered error sending batch request: {e!r}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_result((599, {"error": True, "message": e}))
+
+    def send(self, batch):
+        """Send one batch request and resolve the futures of its sub-requests.
+
+        Args:
+            batch (list): Queued (url, payload, future, queued_at) tuples
+        """
+        self.batches += 1
+        self.requests += len(batch)
+        body = {
+            "batch_request_id": str(self.batches),
+            "rest_requests": [
+                {
+                    "id": str(index),
+                    "method": "POST",
+                    "url": url[len(self.lir.url) :],
+                    "headers": [
+                        {"name": "Content-Type", "value": "application/json"},
+                        {"name": "Accept", "value": "application/json"},
+                    ],
+                    "body": base64.b64encode(payload).decode("ascii"),
+                }
+                for index, (url, payload, _, _) in enumerate(batch)
+            ],
+        }
+        status, response = self.lir.send_request(
+            f"{self.lir.url}{BATCH_PATH}", self.lir.serialize(body)
+        )
+        serviced = {sub["id"]: sub for sub in response.get("serviced_requests", [])}
+        for index, (url, _, future, _) in enumerate(batch):
+            if "error" in response:
+                future.set_result((status, response))
+            elif str(index) in serviced:
+                sub = serviced[str(index)]
+                sub_body = base64.b64decode(sub.get("body") or "")
+                future.set_result(
+                    (sub["status_code"], json.loads(sub_body) if sub_body else {})
+                )
+            else:
+                message = f"Batch sub-request to url {url} was not serviced"
+                logger.error(message)
+                future.set_result((599, {"error": True, "message": message}))
+
 
 class LIR:
-    def __init__(self, lirtoken, url):
+    def __init__(
+        self,
+        lirtoken,
+        url,
+        workers=1,
+        timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        batch_size=0,
+        batch_wait=DEFAULT_BATCH_WAIT,
+        serializer=DEFAULT_SERIALIZER,
+        compress=False,
+    ):
         """Class for creating resources in LIR.
 
         Args:
             lirtoken (str): LIR authentication token
             url (str): Base URL of LIR instance
+            workers (int): Number of concurrent requests; sizes the connection pool
+            timeout (tuple): Connect and read timeouts, in seconds
+            retries (int): Maximum number of retries of a request
+            backoff (float): Backoff factor between retries, in seconds
+            batch_size (int): Send creates through the Batch API, with at most
+                this many per batch request; 0 sends every create on its own
+            batch_wait (float): Maximum time a create waits for its batch
+            serializer (callable): Function serializing a payload to bytes;
+                uses orjson when installed, otherwise json
+            compress (bool): gzip request bodies (Content-Encoding: gzip)
         """
 
         self.url = url
         self.lirtoken = lirtoken
+        self.timeout = timeout
+        self.serialize = serializer
+        self.compress = compress
+        self.wire = WireStats()
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"IRToken {self.lirtoken}",
         }
+        self.retry = CountingRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+            raise_on_status=False,
+        )
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(workers, 10), max_retries=self.retry
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.existing = {kind: {} for kind in KINDS}
+        self.batch = None
+        if batch_size:
+            # A batch cannot hold more requests than there are workers waiting
+            self.batch = BatchTransport(self, min(batch_size, workers), batch_wait)
+
+    def log_stats(self):
+        """Log request body sizes and the number of batched and retried requests."""
+        self.wire.log_stats()
+        if self.batch:
+            logger.info(
+                f"[BATCH] Sent {self.batch.requests} LIR requests in {self.batch.batches} batch requests"
+            )
+        log_retries(self.retry.counters)
 
     def post_request(self, url, payload):
-        """Invokes a post request to LIR.
+        """Invokes a post request to LIR, through the Batch API if enabled.
+
+        Args:
+            url (str): API path for desired endpoint
+            payload (bytes): Serialized json payload for API endpoint
+
+        Returns:
+            tuple: (status code, response json)
+        """
+        if self.batch:
+            return self.batch.submit(url, payload).result()
+        return self.send_request(url, payload)
+
+    def send_request(self, url, payload):
+        """Sends a post request to LIR.
 
         Notes:
             When any kind of exception is returned, we log the error
@@ -36,19 +456,126 @@ class LIR:
 
         Args:
             url (str): API path for desired endpoint
-            payload (str): json payload for API endpoint
+            payload (bytes): Serialized json payload for API endpoint
 
         Returns:
             tuple: (status code, response json)
         """
         try:
             logger.debug(f"Sending POST request to {url} with payload: {payload}")
-            response = self.session.post(url, data=payload)
+            data, headers = payload, {}
+            if isinstance(payload, bytes):
+                data, headers = encode_body(payload, self.compress)
+                self.wire.add(url[len(self.url) :], len(payload), len(data))
+            response = self.session.post(
+                url, data=data, headers=headers, timeout=self.timeout
+            )
             logger.debug(f"POST request to {url} returned code {response.status_code}")
             return response.status_code, response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"Encountered request error to url {url}: {e}")
             return (599, {"error": True, "message": e})
+        except ValueError as e:
+            logger.error(f"Encountered invalid response from url {url}: {e}")
+            return (599, {"error": True, "message": e})
+
+    def get_request(self, url, params=None):
+        """Invokes a get request to LIR.
+
+        Notes:
+            Errors are swallowed like in send_request.
+
+        Args:
+            url (str): API path for desired endpoint
+            params (dict): Query parameters
+
+        Returns:
+            tuple: (status code, response json)
+        """
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            logger.debug(f"GET request to {url} returned code {response.status_code}")
+            return response.status_code, response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Encountered request error to url {url}: {e}")
+            return (599, {"error": True, "message": e})
+        except ValueError as e:
+            logger.error(f"Encountered invalid response from url {url}: {e}")
+            return (599, {"error": True, "message": e})
+
+    def get_all(self, kind, page_size=PAGE_SIZE):
+        """Page through all existing LIR objects of a kind.
+
+        Args:
+            kind (str): Kind of object, as in its API path (e.g. "user")
+            page_size (int): Number of objects per request
+
+        Returns:
+            list: Existing objects; may be partial if a request failed
+        """
+        objects = []
+        while True:
+            code, json = self.get_request(
+                f"{self.url}/api/now/ir/{kind}",
+                {"sysparm_limit": page_size, "sysparm_offset": len(objects)},
+            )
+            if "error" in json:
+                logger.error(
+                    f'[EXISTING] Could not list existing {kind} objects; received response code {code} and error "{json["message"]}". Objects past the first {len(objects)} may be created again'
+                )
+                return objects
+            page = json.get("result", [])
+            objects += page
+            if len(page) < page_size:
+                return objects
+
+    def load_existing(self, workers=1, page_size=PAGE_SIZE):
+        """Index the objects that already exist in LIR by their natural key.
+
+        Notes:
+            Creates of objects found in the index are skipped and answered with
+            the sysId of the existing object, so that re-running a migration
+            does not create duplicates. Users are keyed by email address, teams
+            and services by name, shifts by team and name, and escalation
+            policies by team and steps. When several existing objects share a
+            key, the first one listed is reused and a warning is logged.
+
+        Args:
+            workers (int): Number of kinds listed concurrently
+            page_size (int): Number of objects per request
+        """
+        listed = map_ordered(lambda kind: self.get_all(kind, page_size), KINDS, workers)
+        for kind, objects in zip(KINDS, listed):
+            for obj in objects:
+                key = natural_key(kind, obj)
+                if not key or not obj.get("sysId"):
+                    continue
+                if key in self.existing[kind]:
+                    logger.warning(
+                        f"[EXISTING] Existing {kind} objects {self.existing[kind][key]} and {obj['sysId']} share the key {key}; reusing {self.existing[kind][key]}"
+                    )
+                    continue
+                self.existing[kind][key] = obj["sysId"]
+            logger.info(
+                f"[EXISTING] Found {len(self.existing[kind])} existing {kind} objects in LIR"
+            )
+
+    def create(self, kind, payload):
+        """Create an object, unless it already exists in LIR.
+
+        Args:
+            kind (str): Kind of object, as in its API path (e.g. "user")
+            payload (dict): Payload for API endpoint
+
+        Returns:
+            tuple: (status code, response json)
+        """
+        sys_id = find_existing(self.existing, kind, payload)
+        if sys_id:
+            return 200, {"sysId": sys_id}
+        return self.post_request(
+            f"{self.url}/api/now/ir/{kind}", self.serialize(payload)
+        )
 
     def create_user(self, payload):
         """Convenience method for creating a user.
@@ -59,7 +586,7 @@ class LIR:
         Returns:
             tuple: (status code, response json)
         """
-        return self.post_request(f"{self.url}/api/now/ir/user", json.dumps(payload))
+        return self.create("user", payload)
 
     def create_team(self, payload):
         """Convenience method for creating a team.
@@ -70,7 +597,7 @@ class LIR:
         Returns:
             tuple: (status code, response json)
         """
-        return self.post_request(f"{self.url}/api/now/ir/team", json.dumps(payload))
+        return self.create("team", payload)
 
     def create_service(self, payload):
         """Convenience method for creating a service.
@@ -81,7 +608,7 @@ class LIR:
         Returns:
             tuple: (status code, response json)
         """
-        return self.post_request(f"{self.url}/api/now/ir/service", json.dumps(payload))
+        return self.create("service", payload)
 
     def create_shift(self, payload):
         """Convenience method for creating a shift.
@@ -92,7 +619,7 @@ class LIR:
         Returns:
             tuple: (status code, response json)
         """
-        return self.post_request(f"{self.url}/api/now/ir/shift", json.dumps(payload))
+        return self.create("shift", payload)
 
     def create_escalation(self, payload):
         """Convenience method for creating an escalation policy.
@@ -103,6 +630,177 @@ class LIR:
         Returns:
             tuple: (status code, response json)
         """
-        return self.post_request(
-            f"{self.url}/api/now/ir/escalation_policy", json.dumps(payload)
+        return self.create("escalation_policy", payload)
+
+
+class AsyncLIR:
+    def __init__(
+        self,
+        lirtoken,
+        url,
+        limit=DEFAULT_IN_FLIGHT,
+        timeout=DEFAULT_READ_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        transport=None,
+        serializer=DEFAULT_SERIALIZER,
+        compress=False,
+        existing=None,
+    ):
+        """asyncio counterpart of LIR, for sending many creates from one thread.
+
+        Notes:
+            Use the client as an async context manager; the transport (an
+            AiohttpTransport by default) stays open for its duration. At most
+            ``limit`` requests are in flight at once. The create coroutines keep
+            the (status code, response json) contract of LIR, including the 599
+            fallback, and are retried like LIR creates: on connection errors
+            and on 429 and 503, with jittered exponential backoff or
+            Retry-After. Other transport errors, after which the object may
+            have been created, are not retried. Pass the existing index of a
+            LIR client that ran load_existing to skip objects that already
+            exist.
+
+        Args:
+            lirtoken (str): LIR authentication token
+            url (str): Base URL of LIR instance
+            limit (int): Maximum number of requests in flight
+            timeout (float): Total timeout of a request, in seconds
+            retries (int): Maximum number of retries of a request
+            backoff (float): Backoff factor between retries, in seconds
+            transport: asyncio transport; defaults to an AiohttpTransport
+            serializer (callable): Function serializing a payload to bytes
+            compress (bool): gzip request bodies (Content-Encoding: gzip)
+            existing (dict): sysIds of existing LIR objects by kind and natural
+                key, as in LIR.existing; shared, not copied
+        """
+        self.url = url
+        self.lirtoken = lirtoken
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"IRToken {self.lirtoken}",
+        }
+        self.limit = limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self.serialize = serializer
+        self.compress = compress
+        self.wire = WireStats()
+        self.existing = {kind: {} for kind in KINDS} if existing is None else existing
+        self.counters = Counter()
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self.active = self.transport or AiohttpTransport(
+            self.headers, limit=self.limit, timeout=self.timeout
         )
+        await self.active.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.active.__aexit__(*exc_info)
+
+    def log_stats(self):
+        """Log request body sizes and the number of retried requests."""
+        self.wire.log_stats()
+        log_retries(self.counters)
+
+    def retry_delay(self, response, attempt):
+        """Seconds to wait before retrying a request.
+
+        Args:
+            response (TransportResponse): Response asking for a retry, or None
+                after a connection error
+            attempt (int): Number of the attempt that failed, from 1
+
+        Returns:
+            float: Retry-After when sent, otherwise a jittered exponential backoff
+        """
+        retry_after = response.headers.get("Retry-After") if response else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        backoff = self.backoff * 2 ** (attempt - 1)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    async def post_request(self, url, payload):
+        """Invokes a post request to LIR.
+
+        Notes:
+            Like LIR.send_request, errors are logged and swallowed, and
+            returned as a 599 with the error flag set.
+
+        Args:
+            url (str): API path for desired endpoint
+            payload (bytes): Serialized json payload for API endpoint
+
+        Returns:
+            tuple: (status code, response json)
+        """
+        data, headers = encode_body(payload, self.compress)
+        self.wire.add(url[len(self.url) :], len(payload), len(data))
+        async with self.semaphore:
+            for attempt in range(1, self.retries + 2):
+                try:
+                    logger.debug(
+                        f"Sending POST request to {url} with payload: {payload}"
+                    )
+                    response = await self.active.request(
+                        "POST", url, data=data, headers=headers
+                    )
+                except ConnectError as e:
+                    if attempt > self.retries:
+                        logger.error(f"Encountered request error to url {url}: {e}")
+                        return (599, {"error": True, "message": e})
+                    self.counters[type(e).__name__] += 1
+                    await asyncio.sleep(self.retry_delay(None, attempt))
+                    continue
+                except TransportError as e:
+                    logger.error(f"Encountered request error to url {url}: {e}")
+                    return (599, {"error": True, "message": e})
+                if (
+                    response.status_code not in UNPROCESSED_STATUSES
+                    or attempt > self.retries
+                ):
+                    break
+                self.counters[response.status_code] += 1
+                await asyncio.sleep(self.retry_delay(response, attempt))
+        logger.debug(f"POST request to {url} returned code {response.status_code}")
+        try:
+            return response.status_code, response.json()
+        except ValueError as e:
+            logger.error(f"Encountered invalid response from url {url}: {e}")
+            return (599, {"error": True, "message": e})
+
+    async def create(self, kind, payload):
+        """Create an object, unless it already exists in LIR.
+
+        Args:
+            kind (str): Kind of object, as in its API path (e.g. "user")
+            payload (dict): Payload for API endpoint
+
+        Returns:
+            tuple: (status code, response json)
+        """
+        sys_id = find_existing(self.existing, kind, payload)
+        if sys_id:
+            return 200, {"sysId": sys_id}
+        return await self.post_request(
+            f"{self.url}/api/now/ir/{kind}", self.serialize(payload)
+        )
+
+    async def create_user(self, payload):
+        return await self.create("user", payload)
+
+    async def create_team(self, payload):
+        return await self.create("team", payload)
+
+    async def create_service(self, payload):
+        return await self.create("service", payload)
+
+    async def create_shift(self, payload):
+        return await self.create("shift", payload)
+
+    async def create_escalation(self, payload):
+        return await self.create("escalation_policy", payload)
@@ -1,9 +1,21 @@
-from .lir import LIR
-from .pagerduty import PagerDuty
-from dateutil.parser import parse
-from dateutil.relativedelta import relativedelta
+from .concurrency import DEFAULT_WORKERS, map_ordered
+from .dag import Graph
+from .index import MigrationIndex
+from .lir import (
+    DEFAULT_BATCH_WAIT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRIES,
+    LIR,
+)
+from .pagerduty import DEFAULT_RATE, AsyncPagerDuty, PagerDuty
+from .shifts import bind_team, layer_templates
+from .snapshot import MAPPED, digest
+from collections import Counter, defaultdict
+from functools import cached_property
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 lfh = logging.FileHandler("{0}.log".format(__name__))
@@ -11,7 +23,28 @@ logger.addHandler(lfh)
 
 
 class Mapper:
-    def __init__(self, lirtoken, url, api_token, noop=False, pretty=False):
+    def __init__(
+        self,
+        lirtoken,
+        url,
+        api_token,
+        noop=False,
+        pretty=False,
+        pd_workers=DEFAULT_WORKERS,
+        serial=False,
+        cache=None,
+        snapshot=None,
+        pd_rate=DEFAULT_RATE,
+        pd_backend="sync",
+        lir_timeout=DEFAULT_READ_TIMEOUT,
+        lir_retries=DEFAULT_RETRIES,
+        workers=1,
+        lir_batch_size=0,
+        lir_batch_wait=DEFAULT_BATCH_WAIT,
+        lir_compress=False,
+        report=None,
+        journal=None,
+    ):
         self.users = {}
         self.mapped_pd_users = []
         self.team_members = {}
@@ -21,10 +54,173 @@ class Mapper:
         self.escalations = {}
         self.noop = noop
         self.pretty = pretty
-        self.lir = LIR(lirtoken, url)
-        self.pd = PagerDuty(api_token)
+        self.workers = 1 if serial else workers
+        # Guards the maps above, which are filled by concurrent workers
+        self.lock = threading.Lock()
+        self.lir = LIR(
+            lirtoken,
+            url,
+            workers=self.workers,
+            timeout=(DEFAULT_CONNECT_TIMEOUT, lir_timeout),
+            retries=lir_retries,
+            batch_size=lir_batch_size,
+            batch_wait=lir_batch_wait,
+            compress=lir_compress,
+        )
+        backend = AsyncPagerDuty if pd_backend == "async" else PagerDuty
+        self.pd = backend(
+            api_token, workers=pd_workers, serial=serial, cache=cache, rate=pd_rate
+        )
+        self.pd_workers = 1 if serial else pd_workers
+        self.snapshot = snapshot
+        self.report = report
+        self.journal = journal
+        # sysIds of objects created by an interrupted run, by kind and key
+        self.resumed = defaultdict(dict)
+        self.resumed_shifts = Counter()
+        # PagerDuty IDs whose create failed, by map name, so that a snapshot
+        # does not record them as migrated
+        self.failed = defaultdict(set)
         self.rotation = {604800: "weekly", 86400: "daily"}
 
+    @cached_property
+    def index(self):
+        """Reverse lookups between the extracted PagerDuty objects.
+
+        Returns:
+            MigrationIndex: Index of the extracted objects
+        """
+        return MigrationIndex(self.pd.services, self.pd.escalations)
+
+    def apply_snapshot(self):
+        """Restrict the run to PagerDuty objects added or changed since the last run.
+
+        Notes:
+            An object that references a changed object (for example a team with
+            a changed member, or a policy targeting a changed schedule) is treated
+            as changed too, because the LIR objects it points to are recreated.
+            LIR objects mapped for everything else are restored from the snapshot
+            so that the remaining objects can still resolve their sysIds.
+        """
+        users = self.snapshot.diff("users", self.pd.users)
+        changed_users = {user["id"] for user in users}
+        teams = self.snapshot.diff(
+            "teams",
+            self.pd.teams,
+            force={
+                team["id"]
+                for team in self.pd.teams
+                if changed_users.intersection(team["members"])
+            },
+        )
+        changed_teams = {team["id"] for team in teams}
+        schedules = self.snapshot.diff(
+            "schedules",
+            self.pd.schedules,
+            force={
+                sched["id"]
+                for sched in self.pd.schedules
+                if any(team["id"] in changed_teams for team in sched["teams"])
+                or any(
+                    user["user"]["id"] in changed_users
+                    for layer in sched["schedule_layers"]
+                    for user in layer.get("users", [])
+                )
+            },
+        )
+        changed_targets = changed_users | {sched["id"] for sched in schedules}
+        escalations = self.snapshot.diff(
+            "escalations",
+            self.pd.escalations,
+            force={
+                escal["id"]
+                for escal in self.pd.escalations
+                if any(team["id"] in changed_teams for team in escal["teams"])
+                or any(
+                    target["id"] in changed_targets
+                    for rule in escal["rules"]
+                    for target in rule["targets"]
+                )
+            },
+        )
+        changed_escalations = {escal["id"] for escal in escalations}
+        services = self.snapshot.diff(
+            "services",
+            self.pd.services,
+            force={
+                service["id"]
+                for service in self.pd.services
+                if any(team["id"] in changed_teams for team in service["teams"])
+                or (service.get("escalation_policy") or {}).get("id")
+                in changed_escalations
+            },
+        )
+        for name in MAPPED:
+            getattr(self, name).update(self.snapshot.mapped(name))
+        self.pd.users = users
+        self.pd.teams = teams
+        self.pd.services = services
+        self.pd.schedules = schedules
+        self.pd.escalations = escalations
+        # Rebuilt from the restricted lists on next use
+        self.__dict__.pop("index", None)
+
+    def resume(self, entries):
+        """Reuse the objects created by an interrupted run.
+
+        Notes:
+            Users are restored into the users map right away. Every other
+            object is mapped again as usual, since its payload depends on the
+            maps, but reuses the sysId from the journal instead of being
+            created again. Shifts are matched on a digest of their payload.
+
+        Args:
+            entries (list): Entries of the journal of the interrupted run
+        """
+        for entry in entries:
+            if entry["k"] == "shift":
+                self.resumed_shifts[entry["id"]] += 1
+            else:
+                self.resumed[entry["k"]][entry["id"]] = entry["s"]
+        self.users.update(self.resumed["user"])
+        logger.info(
+            f"[JOURNAL] Resuming from {len(entries)} objects created by an earlier run"
+        )
+
+    def record(self, kind, key, sys_id):
+        """Journal a successful create, if a journal is kept.
+
+        Args:
+            kind (str): Kind of object, e.g. "user"
+            key (str): Key of the PagerDuty object it was mapped from
+            sys_id (str): sysId of the LIR object
+        """
+        if self.journal:
+            self.journal.append(kind, key, sys_id)
+
+    def fail(self, name, pd_id):
+        """Remember a failed create, so that the next snapshot run retries it.
+
+        Args:
+            name (str): Name of the Mapper map, such as "users" or "shifts"
+            pd_id (str): ID of the PagerDuty object that failed to migrate
+        """
+        with self.lock:
+            self.failed[name].add(pd_id)
+
+    def plan(self, kind, pd_id, payload):
+        """Stream an object that a noop run would create to the report, if any.
+
+        Args:
+            kind (str): Kind of object, e.g. "team"
+            pd_id (str): ID of the PagerDuty object it is mapped from
+            payload (dict): LIR payload, without its mock sysId
+        """
+        if self.report:
+            self.report.write(
+                kind, pd_id, {k: v for k, v in payload.items() if k != "sysId"}
+            )
+
     def __set_manager_users(self, pd_users, pd_teams):
         """
         Some of the users are selected as managers while configuring PD team.
@@ -39,68 +235,105 @@ class Mapper:
         for team_manager in team_managers:
             if team_manager in user_map:
                 user_map[team_manager]["role"] = "manager"
-                print(
+                logger.info(
                     f'[USER] Assigning manager role to user "{user_map[team_manager]["emailAddress"]}"'
                 )
-        mapped_pd_users = []
-        for user in user_map.values():
-            mapped_pd_users.append(user)
-        return mapped_pd_users
+        return list(user_map.values())
 
     def map_and_create_users(self):
         """Create a user from PagerDuty in LIR, or a mock user if in noop mode."""
         self.mapped_pd_users = self.__set_manager_users(self.pd.users, self.pd.teams)
-        for user in self.mapped_pd_users:
-            pd_id = user.pop("id")
-            if self.noop:
-                self.users[pd_id] = f"noop - pd user {user['emailAddress']}"
-            else:
-                code, json = self.lir.create_user(user)
-                if "error" in json:
-                    logger.error(
-                        f'[USER] Attempted to create user "{user["emailAddress"]}"; received response code {code} and error "{json["message"]}"'
-                    )
-                    continue
-                logger.info(
-                    f'[USER] Created user for "{user["firstName"]} {user["lastName"]} ({user["emailAddress"]})"; sysId "{json["sysId"]}"'
+        map_ordered(self.migrate_user, self.mapped_pd_users, self.workers)
+
+    def migrate_user(self, user):
+        """Create a single user in LIR, or a mock user if in noop mode.
+
+        Args:
+            user (dict): PagerDuty user with its manager role set
+        """
+        pd_id = user.pop("id")
+        if self.noop:
+            sys_id = f"noop - pd user {user['emailAddress']}"
+            self.plan("user", pd_id, user)
+        elif pd_id in self.resumed["user"]:
+            sys_id = self.resumed["user"][pd_id]
+        else:
+            code, json = self.lir.create_user(user)
+            if "error" in json:
+                logger.error(
+                    f'[USER] Attempted to create user "{user["emailAddress"]}"; received response code {code} and error "{json["message"]}"'
                 )
-                self.users[pd_id] = json["sysId"]
+                self.fail("users", pd_id)
+                return
+            logger.info(
+                f'[USER] Created user for "{user["firstName"]} {user["lastName"]} ({user["emailAddress"]})"; sysId "{json["sysId"]}"'
+            )
+            sys_id = json["sysId"]
+            self.record("user", pd_id, sys_id)
+        with self.lock:
+            self.users[pd_id] = sys_id
 
     def map_team_members(self):
         """Associate users with their teams."""
         for team in self.pd.teams:
-            pd_id = team.get("id")
-            self.team_members[pd_id] = {}
-            self.team_members[pd_id]["members"] = []
-            self.team_members[pd_id]["manager"] = self.users.get(team["manager"])
-            for member in team["members"]:
-                if member in self.users:
-                    self.team_members[pd_id]["members"].append(self.users.get(member))
+            self.map_team_member(team)
+
+    def map_team_member(self, team):
+        """Associate the users of a single team with it.
+
+        Args:
+            team (dict): PagerDuty team
+        """
+        members = {
+            "members": [
+                self.users.get(member)
+                for member in team["members"]
+                if member in self.users
+            ],
+            "manager": self.users.get(team["manager"]),
+        }
+        with self.lock:
+            self.team_members[team.get("id")] = members
 
     def map_teams(self):
         """Create a team from PagerDuty in LIR, or a mock team if in noop mode."""
-        for team in self.pd.teams:
-            team_id = team.pop("id")
-            team["members"] = self.team_members.get(team_id, {}).get("members", [])
-            team["manager"] = self.team_members.get(team_id, {}).get("manager", "")
-            team["teamState"] = "complete"
-            if self.noop:
-                team["name"] = f"noop - {team['name']}"
-                team["sysId"] = f"noop - pd team {team_id}"
-            else:
-                code, json = self.lir.create_team(team)
-                if "error" in json:
-                    logger.error(
-                        f'[TEAM] Attempted to create team "{team["name"]}"; received response code {code} and error message "{json["message"]}"'
-                    )
-                    continue
-                team["sysId"] = json["sysId"]
-                logger.info(
-                    f'[TEAM] Created team "{team["name"]}" with sysId {json["sysId"]}'
+        map_ordered(self.migrate_team, self.pd.teams, self.workers)
+
+    def migrate_team(self, team):
+        """Create a single team in LIR, or a mock team if in noop mode.
+
+        Args:
+            team (dict): PagerDuty team
+        """
+        team_id = team.pop("id")
+        team["members"] = self.team_members.get(team_id, {}).get("members", [])
+        team["manager"] = self.team_members.get(team_id, {}).get("manager", "")
+        team["teamState"] = "complete"
+        if self.noop:
+            team["name"] = f"noop - {team['name']}"
+            team["sysId"] = f"noop - pd team {team_id}"
+            self.plan("team", team_id, team)
+        elif team_id in self.resumed["team"]:
+            team["sysId"] = self.resumed["team"][team_id]
+        else:
+            code, json = self.lir.create_team(team)
+            if "error" in json:
+                logger.error(
+                    f'[TEAM] Attempted to create team "{team["name"]}"; received response code {code} and error message "{json["message"]}"'
                 )
+                self.fail("teams", team_id)
+                return
+            team["sysId"] = json["sysId"]
+            self.record("team", team_id, team["sysId"])
+            logger.info(
+                f'[TEAM] Created team "{team["name"]}" with sysId {json["sysId"]}'
+            )
+        with self.lock:
             self.teams[team_id] = team
 
-    def create_team_from_escal_policy(self, escal_id, name):
+    def create_team_from_escal_policy(
+        self, escal_id, name, escal=None, service_id=None
+    ):
         """Create a team in LIR that is inferred from an escalation policy in PagerDuty.
 
         Notes:
@@ -112,12 +345,17 @@ class Mapper:
         Args:
             escal_id (str): PagerDuty ID for the escalation policy
             name (str): Name of the PagerDuty escalation policy
+            escal (dict): Sideloaded escalation policy; fetched from PagerDuty
+                when missing or when it is only a reference
+            service_id (str): PagerDuty ID of the service the team is inferred
+                for, which is marked as failed if the team cannot be created
 
         Returns:
             dict: JSON response from LIR after creating the team
         """
         members = []
-        escal = self.pd.get_details(f"escalation_policies/{escal_id}")
+        if not escal or "escalation_rules" not in escal:
+            escal = self.pd.get_details(f"escalation_policies/{escal_id}")
         for rule in escal["escalation_rules"]:
             for target in rule["targets"]:
                 t_user_id = target["id"]
@@ -138,84 +376,173 @@ class Mapper:
         }
         if self.noop:
             payload["sysId"] = f"noop - {escal_id} {name}"
-            self.teams[f"{escal_id} {name}"] = payload
+            self.plan("team", escal_id, payload)
+            with self.lock:
+                self.teams[f"{escal_id} {name}"] = payload
+        elif f"{escal_id} {name}" in self.resumed["team"]:
+            payload["sysId"] = self.resumed["team"][f"{escal_id} {name}"]
+            with self.lock:
+                self.teams[payload["sysId"]] = payload
+            return {"sysId": payload["sysId"], "name": team_name}
         else:
             code, json = self.lir.create_team(payload)
             if "error" in json:
                 logger.error(
                     f'[TEAM] Attempted to create team for service "{name}"; received response code {code} and error message "{json["message"]}"'
                 )
+                if service_id:
+                    self.fail("services", service_id)
                 return None
             logger.info(
                 f'[TEAM] Created team "{team_name}" from escalation policy "{escal["name"]}" with sysId {json["sysId"]}'
             )
 
             payload["sysId"] = json["sysId"]
-            self.teams[json["sysId"]] = payload
+            self.record("team", f"{escal_id} {name}", json["sysId"])
+            with self.lock:
+                self.teams[json["sysId"]] = payload
             json["name"] = team_name
             return json
 
+    def resolve_service_policy(self, service):
+        """Resolve the escalation policy of a service, with its escalation rules.
+
+        Notes:
+            The policy is normally sideloaded with the service list; services
+            extracted without it need a detail request. A policy that is only
+            a reference is taken from the extracted escalation policies, and
+            only needs its own detail request when it was not extracted.
+
+        Args:
+            service (dict): PagerDuty service
+
+        Returns:
+            dict: Escalation policy of the service; empty if it has none
+        """
+        policy = service.get("escalation_policy")
+        if policy is None:
+            policy = self.pd.get_details(f"services/{service['id']}").get(
+                "escalation_policy", {}
+            )
+        if policy.get("id") and "escalation_rules" not in policy:
+            extracted = self.index.policy(policy["id"])
+            if extracted is not None and "rules" in extracted:
+                return {
+                    "id": extracted["id"],
+                    "name": extracted.get("name", policy.get("name")),
+                    "escalation_rules": extracted["rules"],
+                }
+            policy = (
+                self.pd.get_details(f"escalation_policies/{policy['id']}") or policy
+            )
+        return policy
+
+    def prefetch_service_policies(self, services):
+        """Resolve the escalation policies of all team-less services concurrently.
+
+        Notes:
+            Only services without a team need their escalation policy, to infer
+            a team from it. Fetching those up front keeps the network latency
+            out of the mapping loop. Policies that are only referenced are
+            taken from the extracted escalation policies when possible.
+
+        Args:
+            services (list): PagerDuty services
+
+        Returns:
+            dict: Escalation policy of each team-less service, by service ID
+        """
+        teamless = [service for service in services if not service["teams"]]
+        # Built before the workers start, from the extracted policies
+        self.index
+        policies = map_ordered(self.resolve_service_policy, teamless, self.pd_workers)
+        for service, policy in zip(teamless, policies):
+            self.index.bind_policy(service, policy)
+        return {service["id"]: policy for service, policy in zip(teamless, policies)}
+
     def map_services(self):
         """Create a service from PagerDuty in LIR, or a mock service if in noop mode."""
-        for service in self.pd.services:
-            service_teams = service.pop("teams")
-            try:
-                if not service_teams:
-                    service_details = self.pd.get_details(f"services/{service['id']}")
-                    if service_details.get("escalation_policy", {}).get("id"):
-                        resp = self.create_team_from_escal_policy(
-                            service_details["escalation_policy"]["id"], service["name"]
-                        )
-                        if resp:
-                            for escal in self.pd.escalations:
-                                if (
-                                    escal["id"]
-                                    == service_details["escalation_policy"]["id"]
-                                ):
-                                    escal["teams"].append(
-                                        {"id": resp["sysId"], "name": resp["name"]}
-                                    )
-                            self.escalations[
-                                service_details["escalation_policy"]["id"]
-                            ] = resp["sysId"]
-                            self.services[service["id"]] = {
-                                "name": f"{service['name']}",
-                                "description": service["description"],
-                                "team": resp["sysId"],
-                            }
-                    else:
-                        logger.info(
-                            f'[SERVICE] There is no escalation policy associated with service "{service["name"]}" - cannot infer team members. Creating service without team.'
-                        )
-                        self.services[service["id"]] = {
-                            "name": f"{service['name']} (No Team Assigned)",
+        policies = self.prefetch_service_policies(self.pd.services)
+        map_ordered(
+            lambda service: self.migrate_service(service, policies.get(service["id"])),
+            self.pd.services,
+            self.workers,
+        )
+
+    def migrate_service(self, service, policy=None):
+        """Create a single service in LIR, or a mock service if in noop mode.
+
+        Args:
+            service (dict): PagerDuty service
+            policy (dict): Escalation policy of the service, as resolved by
+                prefetch_service_policies; only used when it has no team
+        """
+        service_teams = service.pop("teams")
+        try:
+            record = None
+            if not service_teams:
+                if policy is None:
+                    policy = self.resolve_service_policy(service)
+                if policy.get("id"):
+                    resp = self.create_team_from_escal_policy(
+                        policy["id"], service["name"], policy, service["id"]
+                    )
+                    if resp:
+                        escal = self.index.policy(policy["id"])
+                        with self.lock:
+                            if escal is not None:
+                                escal["teams"].append(
+                                    {"id": resp["sysId"], "name": resp["name"]}
+                                )
+                            self.escalations[policy["id"]] = resp["sysId"]
+                        record = {
+                            "name": f"{service['name']}",
                             "description": service["description"],
+                            "team": resp["sysId"],
                         }
-                for team in service_teams:
-                    self.services[service["id"]] = {
-                        "name": f"{service['name']} ({self.teams.get(team['id'], {}).get('name', '')})",
-                        "team": self.teams.get(team["id"], {}).get("sysId", ""),
+                else:
+                    logger.info(
+                        f'[SERVICE] There is no escalation policy associated with service "{service["name"]}" - cannot infer team members. Creating service without team.'
+                    )
+                    record = {
+                        "name": f"{service['name']} (No Team Assigned)",
                         "description": service["description"],
                     }
-                if service["id"] not in self.services:
-                    self.services[service["id"]] = {
+            for team in service_teams:
+                record = {
+                    "name": f"{service['name']} ({self.teams.get(team['id'], {}).get('name', '')})",
+                    "team": self.teams.get(team["id"], {}).get("sysId", ""),
+                    "description": service["description"],
+                }
+            with self.lock:
+                if record is not None:
+                    self.services[service["id"]] = record
+                record = self.services.setdefault(
+                    service["id"],
+                    {
                         "name": f"{service['name']}",
                         "description": service["description"],
-                    }
-                if not self.noop:
-                    code, json = self.lir.create_service(self.services[service["id"]])
-                    if "error" in json:
-                        logger.error(
-                            f'[SERVICE] Attempted to create service "{service["name"]}"; received response code {code} and error message "{json["message"]}"'
-                        )
-                        continue
-                    logger.info(
-                        f'[SERVICE] Created service "{service["name"]}" with sysId {json["sysId"]}"'
+                    },
+                )
+            if self.noop:
+                self.plan("service", service["id"], record)
+            elif service["id"] not in self.resumed["service"]:
+                code, json = self.lir.create_service(record)
+                if "error" in json:
+                    logger.error(
+                        f'[SERVICE] Attempted to create service "{service["name"]}"; received response code {code} and error message "{json["message"]}"'
                     )
-            except Exception:
-                logger.error(
-                    f'[SERVICE] Exception occured while creating services "{service["name"]}"'
+                    self.fail("services", service["id"])
+                    return
+                logger.info(
+                    f'[SERVICE] Created service "{service["name"]}" with sysId {json["sysId"]}"'
                 )
+                self.record("service", service["id"], json["sysId"])
+        except Exception:
+            logger.error(
+                f'[SERVICE] Exception occured while creating services "{service["name"]}"'
+            )
+            self.fail("services", service["id"])
 
     def create_team_from_schedule(self, schedule):
         if "primaryMembers" in schedule and schedule["primaryMembers"]:
@@ -230,7 +557,14 @@ class Mapper:
             }
             if self.noop:
                 payload["sysId"] = f"noop - {schedule['id']} {schedule['name']}"
-                self.teams[f"noop - {schedule['id']} {schedule['name']}"] = payload
+                self.plan("team", schedule["id"], payload)
+                with self.lock:
+                    self.teams[f"noop - {schedule['id']} {schedule['name']}"] = payload
+                return payload["sysId"]
+            elif f"schedule {schedule['id']}" in self.resumed["team"]:
+                payload["sysId"] = self.resumed["team"][f"schedule {schedule['id']}"]
+                with self.lock:
+                    self.teams[payload["sysId"]] = payload
                 return payload["sysId"]
             else:
                 code, json = self.lir.create_team(payload)
@@ -238,9 +572,12 @@ class Mapper:
                     logger.error(
                         f'[TEAM] Attempted to create team from schedule "{schedule["name"]}"; received response code {code} and error message "{json["message"]}"'
                     )
+                    self.fail("shifts", schedule["id"])
                     return None
                 payload["sysId"] = json["sysId"]
-                self.teams[json["sysId"]] = payload
+                self.record("team", f"schedule {schedule['id']}", json["sysId"])
+                with self.lock:
+                    self.teams[json["sysId"]] = payload
                 logger.info(
                     f'[TEAM] Created team "{team_name}" from schedule "{schedule["name"]}" with sysId {json["sysId"]}'
                 )
@@ -248,242 +585,286 @@ class Mapper:
 
     def map_schedules(self):
         """Create a schedule from PagerDuty in LIR, or a mock schedule if in noop mode."""
-        schedules = []
-        for sched in self.pd.schedules:
-            if not sched["teams"]:
-                team = self.create_team_from_schedule(sched)
-                if team:
-                    sched["teams"].append({"id": team})
-                else:
-                    logger.warning(
-                        f'[TEAM] Could not infer team from users in schedule, will not create schedule "{sched["name"]}"'
-                    )
-                    continue
-
-            self.shifts[sched["id"]] = []
-            has_restrictions = False
-            for team in sched["teams"]:
-                for layer in sched["schedule_layers"]:
-                    sched_index = 0
-                    if layer.get("restrictions"):
-                        has_restrictions = True
-                        restrictions = []
-                        for restr in layer["restrictions"]:
-                            if restr["type"] == "weekly_restriction":
-                                restrictions.append(
-                                    {
-                                        "days": "".join(
-                                            [
-                                                str(i)
-                                                for i in range(
-                                                    restr["start_day_of_week"] + 1,
-                                                    restr["start_day_of_week"]
-                                                    + 1
-                                                    + round(
-                                                        (
-                                                            restr["duration_seconds"]
-                                                            / 86400
-                                                        )
-                                                    )
-                                                    + 1,
-                                                )
-                                            ]
-                                        ),
-                                        "start_times": {
-                                            "startTime": ":".join(
-                                                restr["start_time_of_day"].split(":")[
-                                                    0:2
-                                                ]
-                                            ),
-                                            "endTime": (
-                                                parse(restr["start_time_of_day"])
-                                                + relativedelta(
-                                                    seconds=restr["duration_seconds"]
-                                                )
-                                            ).strftime("%H:%M"),
-                                        },
-                                    }
-                                )
+        shifts = map_ordered(self.map_schedule, self.pd.schedules, self.workers)
+        if not self.noop:
+            map_ordered(
+                lambda item: self.create_shift(*item),
+                [
+                    (shift, sched["id"])
+                    for sched, group in zip(self.pd.schedules, shifts)
+                    for shift in group
+                ],
+                self.workers,
+            )
 
-                            elif restr["type"] == "daily_restriction":
-                                restrictions.append(
-                                    {
-                                        "days": "1234567",
-                                        "start_times": {
-                                            "startTime": ":".join(
-                                                restr["start_time_of_day"].split(":")[
-                                                    0:2
-                                                ]
-                                            ),
-                                            "endTime": (
-                                                parse(restr["start_time_of_day"])
-                                                + relativedelta(
-                                                    seconds=(
-                                                        restr["duration_seconds"] - 60
-                                                        if restr["duration_seconds"]
-                                                        == 86400
-                                                        else restr["duration_seconds"]
-                                                    )
-                                                )
-                                            ).strftime("%H:%M"),
-                                        },
-                                    }
-                                )
-                        for restr in restrictions:
-                            primaryMembers = []
-                            for user in layer.get("users", []):
-                                userId = self.users.get(user["user"]["id"])
-                                if userId in self.teams.get(team["id"], {}).get(
-                                    "members", []
-                                ):
-                                    primaryMembers.append(userId)
-                            schedule = {
-                                "name": f"{sched['name']} ({self.teams.get(team['id'], {}).get('name', '')}) - layer {sched_index}",
-                                "team": self.teams.get(team["id"], {}).get(
-                                    "sysId", team
-                                ),
-                                "startTime": restr["start_times"]["startTime"],
-                                "startDate": parse(
-                                    layer["rotation_virtual_start"]
-                                ).strftime("%Y-%m-%d"),
-                                "endTime": restr["start_times"]["endTime"],
-                                "repeatUntil": parse(
-                                    layer["rotation_virtual_start"]
-                                ).strftime("%Y-%m-%d")
-                                if layer["end"]
-                                else (
-                                    parse(layer["rotation_virtual_start"])
-                                    + relativedelta(years=5)
-                                ).strftime("%Y-%m-%d"),
-                                "rotationType": self.rotation.get(
-                                    layer["rotation_turn_length_seconds"], "weekly"
-                                ),
-                                "days": restr["days"],
-                                "timeZone": sched["timeZone"],
-                                "primaryMembers": primaryMembers,
-                                # We can't fill this in, but the API requires it
-                                "backupMembers": [],
-                            }
-                            sched_index += 1
-                            self.shifts[sched["id"]].append(schedule)
-                            schedules.append(schedule)
-                    else:
-                        primaryMembers = []
-                        for user in layer.get("users", []):
-                            userId = self.users.get(user["user"]["id"])
-                            if userId in self.teams.get(team["id"], {}).get(
-                                "members", []
-                            ):
-                                primaryMembers.append(userId)
-                        schedule = {
-                            "name": f"{sched['name']} ({self.teams.get(team['id'], {}).get('name', '')}) - layer {sched_index}",
-                            "team": self.teams.get(team["id"], {}).get("sysId", team),
-                            "startTime": parse(layer["start"]).strftime("%H:%M"),
-                            "startDate": parse(layer["start"]).strftime("%Y-%m-%d"),
-                            "endTime": parse(layer["start"]).strftime("%H:%M")
-                            if layer["end"]
-                            else (
-                                parse(layer["start"]) + relativedelta(hours=12)
-                            ).strftime("%H:%M"),
-                            "repeatUntil": parse(layer["start"]).strftime("%Y-%m-%d")
-                            if layer["end"]
-                            else (
-                                parse(layer["start"]) + relativedelta(years=5)
-                            ).strftime("%Y-%m-%d"),
-                            "rotationType": self.rotation.get(
-                                layer["rotation_turn_length_seconds"], "weekly"
-                            ),
-                            "timeZone": sched["timeZone"],
-                            "primaryMembers": primaryMembers,
-                            # We can't fill this in, but the API requires it
-                            "backupMembers": [],
-                        }
-                        sched_index += 1
-                        self.shifts[sched["id"]].append(schedule)
-                        schedules.append(schedule)
-            if has_restrictions:
+    def map_schedule(self, sched):
+        """Build the LIR shifts of a single PagerDuty schedule.
+
+        Notes:
+            A team is inferred (and created in LIR) from the members of
+            schedules that do not belong to a team. Each layer is converted
+            once, then bound to every team of the schedule.
+
+        Args:
+            sched (dict): PagerDuty schedule with its layers
+
+        Returns:
+            list: Shift payloads for the schedule; empty if it cannot be migrated
+        """
+        if not sched["teams"]:
+            team = self.create_team_from_schedule(sched)
+            if team:
+                sched["teams"].append({"id": team})
+            else:
                 logger.warning(
-                    f'[SHIFT] Shift "{sched["name"]}" has restrictions; please evaluate the schedule for accuracy, manual reconciliation may be required.'
-                )
-        if not self.noop:
-            for sched in schedules:
-                code, json = self.lir.create_shift(sched)
-                if "error" in json:
-                    logger.error(
-                        f'[SHIFT] Attempted to create shift "{sched["name"]}"; received response code {code} and error "{json["message"]}"'
-                    )
-                    continue
-                logger.info(
-                    f'[SHIFT] Created shift "{sched["name"]}" with sysId "{json["sysId"]}"'
+                    f'[TEAM] Could not infer team from users in schedule, will not create schedule "{sched["name"]}"'
                 )
+                return []
+
+        layers = [
+            (
+                layer_templates(layer, self.rotation),
+                [self.users.get(user["user"]["id"]) for user in layer.get("users", [])],
+            )
+            for layer in sched["schedule_layers"]
+        ]
+        shifts = []
+        for team in sched["teams"]:
+            mapped = self.teams.get(team["id"], {})
+            shifts += bind_team(
+                sched,
+                layers,
+                mapped.get("name", ""),
+                mapped.get("sysId", team),
+                self.index.team_members(team["id"], mapped),
+            )
+        if any(layer.get("restrictions") for layer in sched["schedule_layers"]):
+            logger.warning(
+                f'[SHIFT] Shift "{sched["name"]}" has restrictions; please evaluate the schedule for accuracy, manual reconciliation may be required.'
+            )
+        with self.lock:
+            self.shifts[sched["id"]] = shifts
+        if self.noop:
+            for shift in shifts:
+                self.plan("shift", sched["id"], shift)
+        return shifts
+
+    def create_shift(self, shift, sched_id=None):
+        """Create a single shift in LIR.
+
+        Args:
+            shift (dict): Shift payload built by map_schedule
+            sched_id (str): ID of the PagerDuty schedule the shift belongs to
+        """
+        key = digest(shift) if self.journal or self.resumed_shifts else None
+        with self.lock:
+            if self.resumed_shifts[key] > 0:
+                self.resumed_shifts[key] -= 1
+                return
+        code, json = self.lir.create_shift(shift)
+        if "error" in json:
+            logger.error(
+                f'[SHIFT] Attempted to create shift "{shift["name"]}"; received response code {code} and error "{json["message"]}"'
+            )
+            self.fail("shifts", sched_id)
+            return
+        logger.info(
+            f'[SHIFT] Created shift "{shift["name"]}" with sysId "{json["sysId"]}"'
+        )
+        self.record("shift", key, json["sysId"])
 
     def map_escalations(self):
         """Create an escalation policy from PagerDuty in LIR, or a mock policy if in noop mode."""
-        for escal in self.pd.escalations:
-            if not escal["teams"]:
-                logger.warning(
-                    f'[ESCALATION] Escalation policy "{escal["name"]}" is not associated with a team and cannot be migrated'
-                )
-                continue
-            # TODO: Send escalation name in the payload
-            for team in escal["teams"]:
-                escalation = {}
-                steps = []
-                escalation["team"] = self.teams.get(team["id"], {}).get("sysId", "")
-                rule_index = 0
-                for rule in escal["rules"]:
-                    step = {}
-                    audience = []
-                    if rule["escalation_delay_in_minutes"]:
-                        step["timeToNextStepInMins"] = rule[
-                            "escalation_delay_in_minutes"
-                        ]
-                    for target in rule["targets"]:
-                        members = []
-                        if target["type"] == "user_reference":
-                            members.append(self.users.get(target["id"]))
-
-                        elif target["type"] == "schedule_reference":
-
-                            schedule = self.shifts.get(target["id"])
-                            for layer in schedule:
-                                members += layer["primaryMembers"]
-                        else:
-                            logger.warning(
-                                f'[ESCALATION] Cannot migrate target type "{target["type"]}" for step {rule_index} in escalation "{escal["name"]}"'
-                            )
-                            continue
-                        audience.append({"type": "users", "users": list(set(members))})
-                    if audience:
-                        step["audience"] = audience
-                        steps.append(step)
-                        escalation["steps"] = steps
+        map_ordered(self.migrate_escalation, self.pd.escalations, self.workers)
+
+    def migrate_escalation(self, escal):
+        """Create a single escalation policy in LIR, or a mock policy if in noop mode.
+
+        Args:
+            escal (dict): PagerDuty escalation policy
+        """
+        if not escal["teams"]:
+            logger.warning(
+                f'[ESCALATION] Escalation policy "{escal["name"]}" is not associated with a team and cannot be migrated'
+            )
+            return
+        # TODO: Send escalation name in the payload
+        for team in escal["teams"]:
+            escalation = {}
+            steps = []
+            escalation["team"] = self.teams.get(team["id"], {}).get("sysId", "")
+            rule_index = 0
+            for rule in escal["rules"]:
+                step = {}
+                audience = []
+                if rule["escalation_delay_in_minutes"]:
+                    step["timeToNextStepInMins"] = rule["escalation_delay_in_minutes"]
+                for target in rule["targets"]:
+                    members = []
+                    if target["type"] == "user_reference":
+                        members.append(self.users.get(target["id"]))
+
+                    elif target["type"] == "schedule_reference":
+
+                        schedule = self.shifts.get(target["id"])
+                        for layer in schedule:
+                            members += layer["primaryMembers"]
                     else:
                         logger.warning(
-                            f'[ESCALATION] No audience for rule {rule_index} in escalation "{escal["name"]}" - skipping layer.'
+                            f'[ESCALATION] Cannot migrate target type "{target["type"]}" for step {rule_index} in escalation "{escal["name"]}"'
                         )
-                    rule_index += 1
-            if "steps" in escalation:
-                escalation["priorities"] = [
-                    i for i in range(1, len(escalation["steps"]) + 1)
-                ]
+                        continue
+                    audience.append({"type": "users", "users": list(set(members))})
+                if audience:
+                    step["audience"] = audience
+                    steps.append(step)
+                    escalation["steps"] = steps
+                else:
+                    logger.warning(
+                        f'[ESCALATION] No audience for rule {rule_index} in escalation "{escal["name"]}" - skipping layer.'
+                    )
+                rule_index += 1
+        if "steps" in escalation:
+            escalation["priorities"] = [
+                i for i in range(1, len(escalation["steps"]) + 1)
+            ]
+            with self.lock:
                 self.escalations[escal["id"]] = escalation
-            else:
-                logger.warning(
-                    f'[ESCALATION] No steps found or no audience found for escalation "{escal["name"]}" - cannot migrate.'
+        else:
+            logger.warning(
+                f'[ESCALATION] No steps found or no audience found for escalation "{escal["name"]}" - cannot migrate.'
+            )
+            return
+        if self.noop:
+            self.plan("escalation", escal["id"], escalation)
+        elif escal["id"] not in self.resumed["escalation"]:
+            code, json = self.lir.create_escalation(escalation)
+            if "error" in json:
+                logger.error(
+                    f'[ESCALATION] Attempted to create escalation "{escal["name"]}"; received response code {code} and error "{json["message"]}"'
                 )
-                continue
-            if not self.noop:
-                code, json = self.lir.create_escalation(escalation)
-                if "error" in json:
-                    logger.error(
-                        f'[ESCALATION] Attempted to create escalation "{escal["name"]}"; received response code {code} and error "{json["message"]}"'
-                    )
-                    continue
-                logger.info(
-                    f'[ESCALATION] Created escalation "{escal["name"]}" with sysId {json["sysId"]}'
+                self.fail("escalations", escal["id"])
+                return
+            logger.info(
+                f'[ESCALATION] Created escalation "{escal["name"]}" with sysId {json["sysId"]}'
+            )
+            self.record("escalation", escal["id"], json["sysId"])
+
+    def build_graph(self):
+        """Build the dependency graph migrating every PagerDuty object.
+
+        Notes:
+            Each object is a node that depends on the objects whose LIR sysIds
+            it needs: a team on its members' users, a service on its team (or,
+            without one, on the users its escalation policy targets), a
+            schedule on its teams and layer users, its shifts on the schedule,
+            and an escalation policy on its teams, targets, referenced
+            schedules and the team-less services that infer a team for it.
+            Nodes are added in the order of the phased run, so running the
+            graph with a single worker migrates objects in that same order.
+
+        Returns:
+            Graph: Graph of migration steps
+        """
+        graph = Graph()
+        self.mapped_pd_users = self.__set_manager_users(self.pd.users, self.pd.teams)
+        for user in self.mapped_pd_users:
+            graph.add(f"user:{user['id']}", lambda user=user: self.migrate_user(user))
+
+        def migrate_team(team):
+            self.map_team_member(team)
+            self.migrate_team(team)
+
+        for team in self.pd.teams:
+            graph.add(
+                f"team:{team['id']}",
+                lambda team=team: migrate_team(team),
+                [f"user:{user}" for user in team["members"] + [team["manager"]]],
+            )
+
+        policies = self.prefetch_service_policies(self.pd.services)
+        for service in self.pd.services:
+            policy = policies.get(service["id"])
+            deps = [f"team:{team['id']}" for team in service["teams"]]
+            if policy:
+                deps += [
+                    f"user:{target['id']}"
+                    for rule in policy.get("escalation_rules", [])
+                    for target in rule["targets"]
+                    if target["type"] == "user_reference"
+                ]
+            graph.add(
+                f"service:{service['id']}",
+                lambda service=service, policy=policy: self.migrate_service(
+                    service, policy
+                ),
+                deps,
+            )
+
+        for sched in self.pd.schedules:
+            graph.add(
+                f"schedule:{sched['id']}",
+                lambda sched=sched: self.map_schedule(sched),
+                [f"team:{team['id']}" for team in sched["teams"]]
+                + [
+                    f"user:{user['user']['id']}"
+                    for layer in sched["schedule_layers"]
+                    for user in layer.get("users", [])
+                ],
+            )
+
+        def create_shifts(sched_id):
+            for shift in self.shifts.get(sched_id, []):
+                self.create_shift(shift, sched_id)
+
+        if not self.noop:
+            for sched in self.pd.schedules:
+                graph.add(
+                    f"shifts:{sched['id']}",
+                    lambda sched_id=sched["id"]: create_shifts(sched_id),
+                    [f"schedule:{sched['id']}"],
                 )
 
+        for escal in self.pd.escalations:
+            deps = [f"team:{team['id']}" for team in escal["teams"]]
+            deps += [
+                f"service:{service['id']}"
+                for service in self.index.services_for_policy(escal["id"])
+                if service["id"] in policies
+            ]
+            deps += [
+                f"user:{target['id']}"
+                for rule in escal["rules"]
+                for target in rule["targets"]
+                if target["type"] == "user_reference"
+            ]
+            deps += [
+                f"schedule:{sched_id}"
+                for sched_id in self.index.schedules_for_policy(escal["id"])
+            ]
+            graph.add(
+                f"escalation:{escal['id']}",
+                lambda escal=escal: self.migrate_escalation(escal),
+                deps,
+            )
+        return graph
+
+    def migrate(self):
+        """Migrate every PagerDuty object as soon as the objects it needs exist.
+
+        Notes:
+            Unlike the phased run, where every user is created before any
+            team and so on, one slow object only holds up the objects that
+            depend on it. The length of the critical path is logged at the end.
+
+        Returns:
+            Graph: Graph of migration steps that was run
+        """
+        graph = self.build_graph()
+        graph.run(self.workers)
+        graph.log_stats()
+        return graph
+
     def noop_output(self):
         """Print a noop report to console."""
         print("\nWould create the following users:\n----------")
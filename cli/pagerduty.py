@@ -1,5 +1,13 @@
-from pdpyras import APISession, PDClientError
+from pdpyras import ITERATION_LIMIT, APISession, PDClientError, object_type
+from requests.adapters import HTTPAdapter
+from .aio import AiohttpTransport, TransportError
+from .cache import DEFAULT_MEMO_SIZE, DetailMemo, ResponseCache
+from .concurrency import DEFAULT_WORKERS, map_ordered
+from functools import cached_property
+import asyncio
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 lfh = logging.FileHandler("{0}.log".format(__name__))
@@ -12,36 +20,379 @@ def get_lir_role(pd_role):
     return "responder"
 
 
+# PagerDuty allows 960 REST API requests per minute for each API key.
+DEFAULT_RATE = 16
+PAGERDUTY_URL = "https://api.pagerduty.com"
+PAGE_SIZE = 100
+SERVICE_INCLUDES = {"include[]": ["escalation_policies", "teams"]}
+ESCALATION_INCLUDES = {"include[]": ["teams"]}
+LAYER_FIELDS = (
+    "start",
+    "end",
+    "rotation_virtual_start",
+    "rotation_turn_length_seconds",
+    "restrictions",
+)
+
+
+# The *_record functions below project raw API objects down to the fields that
+# Mapper reads. They run on each object as it is received, so the nested
+# payloads of the API (reference objects, rendered schedule entries, sideloaded
+# teams, ...) are never held for the whole account.
+
+
+def references(refs):
+    """Reduce a list of reference objects to their IDs."""
+    return [{"id": ref["id"]} for ref in refs]
+
+
+def rules_record(rules):
+    """Keep the delay and the targets of escalation rules."""
+    return [
+        {
+            "id": rule.get("id"),
+            "escalation_delay_in_minutes": rule["escalation_delay_in_minutes"],
+            "targets": [
+                {"id": target["id"], "type": target["type"]}
+                for target in rule["targets"]
+            ],
+        }
+        for rule in rules
+    ]
+
+
+def policy_record(policy):
+    """Project an escalation policy sideloaded on a service."""
+    if not policy:
+        return policy
+    if "escalation_rules" not in policy:
+        return {"id": policy["id"]}
+    return {
+        "id": policy["id"],
+        "name": policy["name"],
+        "escalation_rules": rules_record(policy["escalation_rules"]),
+    }
+
+
+def layer_record(layer):
+    """Project a schedule layer, dropping its rendered entries."""
+    record = {field: layer[field] for field in LAYER_FIELDS if field in layer}
+    record["users"] = [
+        {"user": {"id": user["user"]["id"]}} for user in layer.get("users", [])
+    ]
+    return record
+
+
+def user_record(user):
+    name = user["name"].split()
+    return {
+        "id": user["id"],
+        "firstName": name[0],
+        # It's possible to enter a single name in PagerDuty. If there is only
+        # one name, use it as the last name too. name[1:] accounts for names
+        # with multiple words, like "van winkle".
+        "lastName": " ".join(name[1:]) if len(name) > 1 else name[0],
+        "emailAddress": user["email"],
+        "role": user["role"],
+        "bio": user["description"],
+    }
+
+
+def team_record(team):
+    return {
+        "id": team["id"],
+        "name": team["name"],
+        "description": team["description"],
+    }
+
+
+def service_record(service):
+    return {
+        "id": service["id"],
+        "description": service["description"],
+        "teams": references(service["teams"]),
+        "name": service["name"],
+        "escalation_policy": policy_record(service.get("escalation_policy")),
+    }
+
+
+def schedule_record(schedule):
+    return {
+        "name": schedule["name"],
+        "id": schedule["id"],
+        "timeZone": schedule["time_zone"],
+        "primaryMembers": [user["id"] for user in schedule["users"]],
+    }
+
+
+def schedule_details_record(details):
+    if not details:
+        return details
+    return {
+        "schedule_layers": [
+            layer_record(layer) for layer in details["schedule_layers"]
+        ],
+        "teams": references(details["teams"]),
+    }
+
+
+def escalation_record(escalation):
+    return {
+        "id": escalation["id"],
+        "rules": rules_record(escalation["escalation_rules"]),
+        "teams": references(escalation["teams"]),
+        "name": escalation["name"],
+    }
+
+
+class TokenBucket:
+    def __init__(self, rate=DEFAULT_RATE, capacity=None, min_rate=0.5):
+        """Token bucket shared by every request sent to PagerDuty.
+
+        Notes:
+            The refill rate adapts to the API: it is halved on every 429
+            response (and paused for Retry-After, when sent), follows the
+            ratelimit-remaining/ratelimit-reset headers when present, and
+            otherwise creeps back up towards the configured rate.
+
+        Args:
+            rate (float): Maximum number of requests per second
+            capacity (float): Maximum burst size; defaults to one second of rate
+            min_rate (float): Lower bound for the adapted rate
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent.
+
+        Returns:
+            float: Number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            delay = self.reserve(waited)
+            if delay is None:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a request may be sent.
+
+        Returns:
+            float: Number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            delay = self.reserve(waited)
+            if delay is None:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def reserve(self, waited):
+        """Take a token if one is available.
+
+        Args:
+            waited (float): Time the caller has already waited, for the stats
+
+        Returns:
+            float: None if a token was taken, otherwise seconds to wait
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                if waited:
+                    self.throttled_requests += 1
+                    self.throttled_seconds += waited
+                return None
+            return max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+    def observe(self, response):
+        """Adapt the refill rate to a response from PagerDuty.
+
+        Args:
+            response (requests.Response): Response to a throttled request
+        """
+        headers = response.headers
+        with self.lock:
+            if response.status_code == 429:
+                self.rate_limited += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = 0
+                try:
+                    retry_after = float(headers.get("Retry-After", 0))
+                except ValueError:
+                    retry_after = 0
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + retry_after
+                )
+                logger.debug(
+                    f"Rate limited by PagerDuty, reducing request rate to {self.rate:.2f}/s."
+                )
+                return
+            remaining = headers.get("ratelimit-remaining")
+            reset = headers.get("ratelimit-reset")
+            if remaining is not None and reset is not None:
+                try:
+                    rate = float(remaining) / max(float(reset), 1)
+                except ValueError:
+                    return
+                self.rate = min(self.max_rate, max(self.min_rate, rate))
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+    def log_stats(self):
+        """Log how long requests were held back by the bucket."""
+        logger.info(
+            f"[THROTTLE] {self.throttled_requests} PagerDuty requests throttled for {self.throttled_seconds:.1f}s in total; {self.rate_limited} rate limit responses"
+        )
+
+
+class ThrottledAdapter(HTTPAdapter):
+    def __init__(self, bucket, **kwargs):
+        """Transport adapter that sends every request through a token bucket.
+
+        Args:
+            bucket (TokenBucket): Bucket shared by all PagerDuty requests
+        """
+        self.bucket = bucket
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.bucket.acquire()
+        response = super().send(request, **kwargs)
+        self.bucket.observe(response)
+        return response
+
+
 class PagerDuty:
-    def __init__(self, api_token):
+    def __init__(
+        self,
+        api_token,
+        workers=DEFAULT_WORKERS,
+        serial=False,
+        cache=None,
+        rate=DEFAULT_RATE,
+        memo_size=DEFAULT_MEMO_SIZE,
+    ):
         """Class for interacting with PagerDuty.
 
+        Notes:
+            Each category (users, teams, services, schedules, escalations) is
+            extracted the first time it is accessed and memoized afterwards, so
+            a run only pays for the categories it actually reads.
+
         Args:
             api_token (str): PagerDuty API token
+            workers (int): Maximum number of concurrent detail requests
+            serial (bool): Fetch details one at a time, for debugging
+            cache (ResponseCache): Optional on-disk cache of API responses
+            rate (float): Maximum number of API requests per second
+            memo_size (int): Maximum number of detail responses kept in memory
         """
         self.session = APISession(api_token)
-        self.users = self.get_all_users()
-        self.teams = self.get_team_members(self.get_all_teams())
-        self.services = self.get_all_services()
-        self.schedules = self.get_all_schedules()
-        self.escalations = self.get_all_escalations()
+        self.workers = 1 if serial else workers
+        self.cache = cache
+        self.memo = DetailMemo(memo_size)
+        self.bucket = TokenBucket(rate)
+        self.session.mount(
+            "https://",
+            ThrottledAdapter(self.bucket, pool_maxsize=max(self.workers, 10)),
+        )
+
+    def log_stats(self):
+        """Log request statistics collected during the run."""
+        self.bucket.log_stats()
+        self.memo.log_stats()
+        if self.cache:
+            self.cache.log_stats()
+
+    @cached_property
+    def users(self):
+        return self.get_all_users()
+
+    @cached_property
+    def users_by_id(self):
+        return {user["id"]: user for user in self.users}
 
-    def get_data_for_category(self, category):
+    @cached_property
+    def teams(self):
+        return self.get_team_members(self.get_all_teams())
+
+    @cached_property
+    def services(self):
+        return self.get_all_services()
+
+    @cached_property
+    def schedules(self):
+        return self.get_all_schedules()
+
+    @cached_property
+    def escalations(self):
+        return self.get_all_escalations()
+
+    def get_data_for_category(self, category, params=None, project=None, strict=False):
         """Gather all data for resources of a particular type.
 
+        Notes:
+            When a projection is given, it is applied to each object as it is
+            received, so raw objects are dropped page by page. The cache, when
+            enabled, stores the raw objects.
+
         Args:
             category (str): Category to retrieve data for.
+            params (dict): Additional query parameters, such as include[].
+            project (callable): Function applied to each object.
+            strict (bool): Raise API errors instead of returning an empty list.
 
         Returns:
             list: List of dict objects for the given category.
+
+        Raises:
+            PDClientError: If strict and a request fails.
         """
         logger.debug(f"Getting data for category {category}.")
+        if self.cache:
+            cached = self.cache.get(category, params)
+            if cached is not None:
+                return [project(data) for data in cached] if project else cached
+            if self.cache.offline:
+                logger.warning(
+                    f"No cached data for category {category} in offline mode."
+                )
+                return []
         try:
-            response = [data for data in self.session.iter_all(category)]
+            if params:
+                items = self.session.iter_all(category, params=params)
+            else:
+                items = self.session.iter_all(category)
+            if project and not self.cache:
+                return [project(data) for data in items]
+            response = [data for data in items]
         except PDClientError as e:
+            if strict:
+                raise
             logger.error(f"Error from PagerDuty API: {e}")
             return []
-        return response
+        if self.cache:
+            self.cache.set(category, params, response)
+        return [project(data) for data in response] if project else response
 
     def get_all_users(self):
         """Gather all users in the target PagerDuty account.
@@ -49,22 +400,7 @@ class PagerDuty:
         Returns:
             list: A list containing dicts of user information
         """
-        users = []
-        for user in self.get_data_for_category("users"):
-            name = user["name"].split()
-            users.append(
-                {
-                    "id": user["id"],
-                    "firstName": name[0],
-                    # It's possible to enter a single name in PagerDuty. If there is only
-                    # one name, use it as the last name too. name[1:] accounts for names
-                    # with multiple words, like "van winkle".
-                    "lastName": " ".join(name[1:]) if len(name) > 1 else name[0],
-                    "emailAddress": user["email"],
-                    "role": user["role"],
-                    "bio": user["description"],
-                }
-            )
+        users = self.get_data_for_category("users", project=user_record)
         logger.debug(f"Gathered the following users: {users}")
         return users
 
@@ -74,15 +410,7 @@ class PagerDuty:
         Returns:
             list: List of dicts representing all teams
         """
-        teams = []
-        for team in self.get_data_for_category("teams"):
-            teams.append(
-                {
-                    "id": team["id"],
-                    "name": team["name"],
-                    "description": team["description"],
-                }
-            )
+        teams = self.get_data_for_category("teams", project=team_record)
         logger.debug(f"Gathered the following teams: {teams}")
         return teams
 
@@ -92,33 +420,69 @@ class PagerDuty:
         Returns:
             list: List of dicts representing all services
         """
-        services = []
-        for service in self.get_data_for_category("services"):
-            services.append(
-                {
-                    "id": service["id"],
-                    "description": service["description"],
-                    "teams": service["teams"],
-                    "name": service["name"],
-                }
-            )
+        services = self.get_data_for_category(
+            "services", SERVICE_INCLUDES, project=service_record
+        )
+        for service in services:
+            self.seed_policy(service["escalation_policy"])
         logger.debug(f"Gathered the following services: {services}")
         return services
 
-    def get_details(self, endpoint):
+    def seed_policy(self, policy):
+        """Memoize an escalation policy extracted by a list call.
+
+        Args:
+            policy (dict): Escalation policy with its name and escalation_rules
+        """
+        if policy and "escalation_rules" in policy:
+            self.memo.set(f"escalation_policies/{policy['id']}", policy)
+
+    def get_details(self, endpoint, memoize=True):
         """Retrieve details about a specific PagerDuty resource
 
+        Args:
+            endpoint (str): PagerDuty API endpoint specifc resource
+            memoize (bool): Keep the response in memory for later requests;
+                disable for resources that are only requested once
+
+        Returns:
+            dict: resource response from PagerDuty API endpoint
+        """
+        if memoize:
+            memoized = self.memo.get(endpoint)
+            if memoized is not None:
+                return memoized
+        response = self.load_details(endpoint)
+        if memoize and response:
+            self.memo.set(endpoint, response)
+        return response
+
+    def load_details(self, endpoint):
+        """Retrieve details from the response cache or the API.
+
         Args:
             endpoint (str): PagerDuty API endpoint specifc resource
 
         Returns:
             dict: resource response from PagerDuty API endpoint
         """
+        if self.cache:
+            cached = self.cache.get(endpoint)
+            if cached is not None:
+                return cached
+            if self.cache.offline:
+                logger.warning(
+                    f"No cached data for endpoint {endpoint} in offline mode."
+                )
+                return {}
         try:
-            return self.session.rget(endpoint)
+            response = self.session.rget(endpoint)
         except PDClientError as e:
             logger.error(f"Request to endpont {endpoint} failed: {e}")
             return {}
+        if self.cache:
+            self.cache.set(endpoint, None, response)
+        return response
 
     def get_all_schedules(self):
         """Gather all schedules for a given PagerDuty account
@@ -126,20 +490,23 @@ class PagerDuty:
         Returns:
             list: List of dicts representing all schedules
         """
+        listed = self.get_data_for_category("schedules", project=schedule_record)
+        all_details = map_ordered(
+            lambda schedule: schedule_details_record(
+                self.get_details(f"schedules/{schedule['id']}", memoize=False)
+            ),
+            listed,
+            self.workers,
+        )
         schedules = []
-        for schedule in self.get_data_for_category("schedules"):
-            details = self.session.rget(f"schedules/{schedule['id']}")
-
-            schedules.append(
-                {
-                    "name": schedule["name"],
-                    "id": schedule["id"],
-                    "timeZone": schedule["time_zone"],
-                    "primaryMembers": [user["id"] for user in schedule["users"]],
-                    "schedule_layers": details["schedule_layers"],
-                    "teams": details["teams"],
-                }
-            )
+        for schedule, details in zip(listed, all_details):
+            if not details:
+                logger.error(
+                    f'[SHIFT] Could not retrieve details for schedule "{schedule["name"]}", skipping import'
+                )
+                continue
+            schedule.update(details)
+            schedules.append(schedule)
         return schedules
 
     def get_all_escalations(self):
@@ -148,18 +515,76 @@ class PagerDuty:
         Returns:
             list: List of dicts representing all escalation policies
         """
-        escalations = []
-        for escalation in self.get_data_for_category("escalation_policies"):
-            escalations.append(
+        escalations = self.get_data_for_category(
+            "escalation_policies", ESCALATION_INCLUDES, project=escalation_record
+        )
+        for escal in escalations:
+            self.seed_policy(
                 {
-                    "id": escalation["id"],
-                    "rules": escalation["escalation_rules"],
-                    "teams": escalation["teams"],
-                    "name": escalation["name"],
+                    "id": escal["id"],
+                    "name": escal["name"],
+                    "escalation_rules": escal["rules"],
                 }
             )
         return escalations
 
+    def get_user_email(self, user_id):
+        """Look up the email address of a PagerDuty user.
+
+        Notes:
+            Users are resolved from the already extracted user list. The API is
+            only queried for users missing from that list, such as users that
+            were deactivated after extraction.
+
+        Args:
+            user_id (str): PagerDuty ID of the user
+
+        Returns:
+            str: Email address of the user, or None if it cannot be found
+        """
+        if user_id in self.users_by_id:
+            return self.users_by_id[user_id]["emailAddress"]
+        logger.debug(f"User {user_id} not found in extracted users, querying API.")
+        return self.get_details(f"users/{user_id}").get("email")
+
+    def get_team_roster(self, team_id):
+        """Gather every member of a PagerDuty team, following pagination.
+
+        Args:
+            team_id (str): PagerDuty ID of the team
+
+        Returns:
+            list: List of team membership dicts, or None if the request failed
+        """
+        start = time.perf_counter()
+        try:
+            members = self.get_data_for_category(
+                f"teams/{team_id}/members", strict=True
+            )
+        except PDClientError as e:
+            logger.error(
+                f"[TEAM] Could not retrieve the members of team {team_id}: {e}"
+            )
+            return None
+        logger.debug(
+            f"Fetched {len(members)} members for team {team_id} in {time.perf_counter() - start:.3f}s."
+        )
+        return members
+
+    def iter_team_rosters(self, teams):
+        """Fetch the complete rosters of the given teams concurrently.
+
+        Args:
+            teams (list): List of dicts representing teams
+
+        Yields:
+            tuple: (team dict, list of team membership dicts), in input order
+        """
+        rosters = map_ordered(
+            lambda team: self.get_team_roster(team["id"]), teams, self.workers
+        )
+        yield from zip(teams, rosters)
+
     def get_team_members(self, teams):
         """Associate members with their assigned teams.
 
@@ -168,20 +593,22 @@ class PagerDuty:
         LIR team manager.
         """
         teams_config = []
-        for config in teams:
+        for config, members in self.iter_team_rosters(teams):
+            if members is None:
+                logger.error(
+                    f"[TEAM] Team '{config['name']}' could not be fetched. Skipping import"
+                )
+                continue
             config["members"] = []
             config["manager"] = ""
             # There may be multiple managers
             managers = []
-            members = self.session.rget(f'teams/{config["id"]}/members')
             for member in members:
                 config["members"].append(member["user"]["id"])
                 if member["role"] == "manager":
                     managers.append(
                         {
-                            "user": self.session.rget(f'/users/{member["user"]["id"]}')[
-                                "email"
-                            ],
+                            "user": self.get_user_email(member["user"]["id"]),
                             "id": member["user"]["id"],
                         }
                     )
@@ -203,3 +630,363 @@ class PagerDuty:
                 config["manager"] = managers[0]["id"]
             teams_config.append(config)
         return teams_config
+
+
+class AsyncPagerDuty(PagerDuty):
+    def __init__(
+        self,
+        api_token,
+        workers=DEFAULT_WORKERS,
+        serial=False,
+        cache=None,
+        rate=DEFAULT_RATE,
+        transport=None,
+        max_attempts=5,
+    ):
+        """asyncio backend for extracting data from PagerDuty.
+
+        Notes:
+            When a category is first accessed, its raw API responses (including
+            per-item details such as schedule layers and team rosters) are
+            fetched concurrently on an event loop, with at most ``workers``
+            requests in flight. Index endpoints ask for the total on the first
+            page and then fetch the remaining pages concurrently. The responses
+            are handed to the normalization methods of PagerDuty, so extracted
+            objects have the same shapes as with the synchronous backend.
+
+        Args:
+            api_token (str): PagerDuty API token
+            workers (int): Maximum number of requests in flight
+            serial (bool): Send one request at a time, for debugging
+            cache (ResponseCache): Optional on-disk cache of API responses
+            rate (float): Maximum number of API requests per second
+            transport: asyncio transport; defaults to an AiohttpTransport
+            max_attempts (int): Attempts per request on 429, 5xx and network errors
+        """
+        super().__init__(
+            api_token, workers=workers, serial=serial, cache=cache, rate=rate
+        )
+        self.headers = {
+            "Authorization": f"Token token={api_token}",
+            "Accept": "application/vnd.pagerduty+json;version=2",
+        }
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.responses = {}
+
+    def run(self, coroutine_function, *args):
+        """Run a prefetch coroutine on a fresh event loop.
+
+        Args:
+            coroutine_function (callable): Coroutine function taking the
+                transport as its first argument
+            *args: Additional arguments for the coroutine function
+        """
+
+        async def main():
+            self.semaphore = asyncio.Semaphore(self.workers)
+            transport = self.transport or AiohttpTransport(
+                self.headers, limit=self.workers
+            )
+            async with transport:
+                return await coroutine_function(transport, *args)
+
+        return asyncio.run(main())
+
+    async def request(self, transport, endpoint, params=None):
+        """GET a PagerDuty endpoint within the rate and concurrency limits.
+
+        Args:
+            transport: Open asyncio transport
+            endpoint (str): PagerDuty API endpoint
+            params (dict): Query parameters
+
+        Returns:
+            dict: Decoded response body
+        """
+        url = f"{PAGERDUTY_URL}/{endpoint.lstrip('/')}"
+        async with self.semaphore:
+            for attempt in range(1, self.max_attempts + 1):
+                await self.bucket.acquire_async()
+                try:
+                    response = await transport.request("GET", url, params=params)
+                except TransportError as e:
+                    if attempt == self.max_attempts:
+                        raise
+                    logger.debug(f"Retrying request to {endpoint}: {e}")
+                    continue
+                self.bucket.observe(response)
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+                logger.debug(
+                    f"Request to {endpoint} returned {response.status_code}, attempt {attempt}."
+                )
+        if response.status_code >= 400:
+            raise TransportError(
+                f"Request to {endpoint} returned status {response.status_code}"
+            )
+        return response.json()
+
+    async def fetch_all(
+        self, transport, category, params=None, project=None, strict=False
+    ):
+        """Asynchronous counterpart of get_data_for_category.
+
+        Notes:
+            As with get_data_for_category, a projection is applied to each page
+            as it arrives, and only the cache, when enabled, gets raw objects.
+
+        Args:
+            transport: Open asyncio transport
+            category (str): Category to retrieve data for.
+            params (dict): Additional query parameters, such as include[].
+            project (callable): Function applied to each object.
+            strict (bool): Raise API errors instead of returning an empty list.
+
+        Returns:
+            list: List of dict objects for the given category.
+
+        Raises:
+            TransportError: If strict and a request fails.
+            KeyError: If strict and a response is malformed.
+        """
+        if self.cache:
+            cached = self.cache.get(category, params)
+            if cached is not None:
+                return [project(data) for data in cached] if project else cached
+            if self.cache.offline:
+                logger.warning(
+                    f"No cached data for category {category} in offline mode."
+                )
+                return []
+        resource = category.split("/")[-1]
+        query = dict(params or {}, limit=PAGE_SIZE)
+        keep = project if project and not self.cache else None
+
+        def records(page):
+            return [keep(data) for data in page[resource]] if keep else page[resource]
+
+        async def fetch_page(offset):
+            return records(
+                await self.request(transport, category, dict(query, offset=offset))
+            )
+
+        try:
+            page = await self.request(
+                transport, category, dict(query, offset=0, total="true")
+            )
+            response = list(records(page))
+            if page.get("more") and page.get("total"):
+                pages = await asyncio.gather(
+                    *(
+                        fetch_page(offset)
+                        for offset in range(
+                            PAGE_SIZE, min(page["total"], ITERATION_LIMIT), PAGE_SIZE
+                        )
+                    )
+                )
+                for items in pages:
+                    response.extend(items)
+            else:
+                while page.get("more") and page[resource]:
+                    if len(response) + PAGE_SIZE > ITERATION_LIMIT:
+                        logger.warning(
+                            f"Stopping iteration on {category} at the API offset limit."
+                        )
+                        break
+                    page = await self.request(
+                        transport, category, dict(query, offset=len(response))
+                    )
+                    response.extend(records(page))
+        except (TransportError, KeyError) as e:
+            if strict:
+                raise
+            logger.error(f"Error from PagerDuty API: {e!r}")
+            return []
+        if self.cache:
+            self.cache.set(category, params, response)
+            if project:
+                return [project(data) for data in response]
+        return response
+
+    async def fetch_details(self, transport, endpoint, project=None):
+        """Asynchronous counterpart of get_details.
+
+        Args:
+            transport: Open asyncio transport
+            endpoint (str): PagerDuty API endpoint specifc resource
+            project (callable): Function applied to the resource; the cache,
+                when enabled, stores the raw resource
+
+        Returns:
+            dict: resource response from PagerDuty API endpoint
+        """
+        if self.cache:
+            cached = self.cache.get(endpoint)
+            if cached is not None:
+                return project(cached) if project else cached
+            if self.cache.offline:
+                logger.warning(
+                    f"No cached data for endpoint {endpoint} in offline mode."
+                )
+                return {}
+        try:
+            body = await self.request(transport, endpoint)
+            response = body[object_type(endpoint.rstrip("/").split("/")[-2])]
+        except (TransportError, KeyError) as e:
+            logger.error(f"Request to endpont {endpoint} failed: {e!r}")
+            return {}
+        if self.cache:
+            self.cache.set(endpoint, None, response)
+        return project(response) if project else response
+
+    async def prefetch(
+        self,
+        transport,
+        category,
+        params=None,
+        project=None,
+        details=None,
+        project_details=None,
+    ):
+        """Fetch an index endpoint and, optionally, a detail endpoint per item.
+
+        Notes:
+            Responses are stored already projected, so the raw pages and
+            details of a category are never held together in memory.
+
+        Args:
+            transport: Open asyncio transport
+            category (str): Index endpoint to fetch
+            params (dict): Query parameters for the index endpoint
+            project (callable): Projection applied to each item of the index
+            details (str): Detail endpoint template, formatted with each item
+            project_details (callable): Projection applied to each detail
+
+        Returns:
+            list: Keys of the responses that were stored
+        """
+        items = await self.fetch_all(transport, category, params, project)
+        keys = [ResponseCache.make_key(category, params)]
+        self.responses[keys[0]] = items
+        if details:
+            endpoints = [details.format(**item) for item in items]
+            results = await asyncio.gather(
+                *(
+                    self.fetch_details(transport, endpoint, project_details)
+                    for endpoint in endpoints
+                )
+            )
+            for endpoint, result in zip(endpoints, results):
+                keys.append(ResponseCache.make_key(endpoint))
+                self.responses[keys[-1]] = result
+        return keys
+
+    async def prefetch_rosters(self, transport, teams):
+        """Fetch the rosters of the given teams.
+
+        Notes:
+            Rosters that fail to fetch are not stored, so get_team_roster
+            requests them again and reports the team if that fails too.
+
+        Args:
+            transport: Open asyncio transport
+            teams (list): List of dicts representing teams
+
+        Returns:
+            list: Keys of the responses that were stored
+        """
+        categories = [f"teams/{team['id']}/members" for team in teams]
+        rosters = await asyncio.gather(
+            *(
+                self.fetch_all(transport, category, strict=True)
+                for category in categories
+            ),
+            return_exceptions=True,
+        )
+        keys = []
+        for category, roster in zip(categories, rosters):
+            if isinstance(roster, Exception):
+                logger.debug(f"Could not prefetch {category}: {roster!r}")
+                continue
+            keys.append(ResponseCache.make_key(category))
+            self.responses[keys[-1]] = roster
+        return keys
+
+    def extract(self, normalize, coroutine_function, *args):
+        """Prefetch raw responses, then normalize them with the synchronous code.
+
+        Args:
+            normalize (callable): PagerDuty method building the objects
+            coroutine_function (callable): Prefetch coroutine function
+            *args: Arguments for the prefetch coroutine function
+
+        Returns:
+            list: Objects returned by normalize
+        """
+        keys = self.run(coroutine_function, *args)
+        try:
+            return normalize()
+        finally:
+            for key in keys:
+                self.responses.pop(key, None)
+
+    def get_data_for_category(self, category, params=None, project=None, strict=False):
+        key = ResponseCache.make_key(category, params)
+        if key in self.responses:
+            # prefetch already applied the projection
+            return self.responses[key]
+        return super().get_data_for_category(category, params, project, strict)
+
+    def load_details(self, endpoint):
+        key = ResponseCache.make_key(endpoint)
+        if key in self.responses:
+            return self.responses[key]
+        return super().load_details(endpoint)
+
+    def get_all_users(self):
+        return self.extract(
+            super().get_all_users, self.prefetch, "users", None, user_record
+        )
+
+    def get_all_teams(self):
+        return self.extract(
+            super().get_all_teams, self.prefetch, "teams", None, team_record
+        )
+
+    def get_all_services(self):
+        return self.extract(
+            super().get_all_services,
+            self.prefetch,
+            "services",
+            SERVICE_INCLUDES,
+            service_record,
+        )
+
+    def get_all_schedules(self):
+        return self.extract(
+            super().get_all_schedules,
+            self.prefetch,
+            "schedules",
+            None,
+            schedule_record,
+            "schedules/{id}",
+            # Idempotent, so get_all_schedules can apply it again
+            schedule_details_record,
+        )
+
+    def get_all_escalations(self):
+        return self.extract(
+            super().get_all_escalations,
+            self.prefetch,
+            "escalation_policies",
+            ESCALATION_INCLUDES,
+            escalation_record,
+        )
+
+    def get_team_members(self, teams):
+        return self.extract(
+            lambda: super(AsyncPagerDuty, self).get_team_members(teams),
+            self.prefetch_rosters,
+            teams,
+        )
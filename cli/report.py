@@ -0,0 +1,115 @@
+from collections import Counter
+import gzip
+import json
+import logging
+import re
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+lfh = logging.FileHandler("{0}.log".format(__name__))
+logger.addHandler(lfh)
+
+KINDS = ("user", "team", "service", "shift", "escalation")
+# Log messages are tagged with the kind of object they are about, e.g. "[TEAM]"
+TAG = re.compile(r"\[([A-Z]+)\]")
+
+
+class Report:
+    def __init__(self, path=None, summary_only=False):
+        """Streaming NDJSON report of the objects a noop run would create.
+
+        Notes:
+            Every planned object is written as one JSON line as soon as it is
+            mapped, as {"type": kind, "pd_id": ..., "payload": ...}, followed
+            by the warnings logged during the run and a final summary line
+            with per-kind counts. In summary-only mode only the counts are
+            kept and written, so memory use does not grow with the account.
+            Reports whose path ends in ".gz" are gzip-compressed.
+
+        Args:
+            path (str): Report file, or None or "-" to write to stdout
+            summary_only (bool): Write only the summary line
+        """
+        self.path = path if path and path != "-" else None
+        self.summary_only = summary_only
+        self.counts = Counter()
+        self.warnings = Counter()
+        self.lock = threading.Lock()
+        if self.path is None:
+            self.file = sys.stdout
+        elif self.path.endswith(".gz"):
+            self.file = gzip.open(self.path, "wt", encoding="utf-8")
+        else:
+            self.file = open(self.path, "w", encoding="utf-8")
+        self.handler = WarningHandler(self)
+        logging.getLogger("cli").addHandler(self.handler)
+
+    def write_line(self, entry):
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def write(self, kind, pd_id, payload):
+        """Record a planned object.
+
+        Args:
+            kind (str): One of KINDS
+            pd_id (str): ID of the PagerDuty object it is mapped from
+            payload (dict): LIR payload that would be sent
+        """
+        with self.lock:
+            self.counts[kind] += 1
+        if not self.summary_only:
+            self.write_line({"type": kind, "pd_id": pd_id, "payload": payload})
+
+    def warn(self, record):
+        """Record a warning logged during the run.
+
+        Args:
+            record (logging.LogRecord): Warning or error log record
+        """
+        message = record.getMessage()
+        match = TAG.match(message)
+        category = match.group(1).lower() if match else "other"
+        with self.lock:
+            self.warnings[category] += 1
+        if not self.summary_only:
+            self.write_line(
+                {
+                    "type": "warning",
+                    "level": record.levelname,
+                    "category": category,
+                    "message": message,
+                }
+            )
+
+    def close(self):
+        """Write the summary line and close the report."""
+        logging.getLogger("cli").removeHandler(self.handler)
+        counts = {kind: self.counts[kind] for kind in KINDS}
+        self.write_line(
+            {"type": "summary", "counts": counts, "warnings": dict(self.warnings)}
+        )
+        if self.path is None:
+            self.file.flush()
+        else:
+            self.file.close()
+        planned = ", ".join(f"{count} {kind}s" for kind, count in counts.items())
+        logger.info(
+            f"[REPORT] Would create {planned}; {sum(self.warnings.values())} warnings"
+        )
+
+
+class WarningHandler(logging.Handler):
+    def __init__(self, report):
+        """Logging handler feeding warnings and errors to a report.
+
+        Args:
+            report (Report): Report receiving the records
+        """
+        super().__init__(level=logging.WARNING)
+        self.report = report
+
+    def emit(self, record):
+        self.report.warn(record)
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from dateutil.parser import parse
+from dateutil.relativedelta import relativedelta
+from functools import lru_cache
+
+# Schedules share layer start times and restriction specs, so the caches stay
+# small even for large accounts
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_timestamp(value):
+    """Parse a PagerDuty timestamp.
+
+    Notes:
+        PagerDuty returns ISO 8601 timestamps, which datetime.fromisoformat
+        parses much faster than dateutil; anything it rejects, such as a "Z"
+        suffix before Python 3.11, falls back to dateutil.
+
+    Args:
+        value (str): Timestamp, e.g. "2015-11-06T21:00:00-05:00"
+
+    Returns:
+        datetime: Parsed timestamp
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parse(value)
+
+
+def time_of_day(seconds):
+    """Format a number of seconds since midnight as HH:MM, wrapping at midnight."""
+    minutes = int(seconds) % 86400 // 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def restriction_window(kind, start_time_of_day, duration_seconds, start_day_of_week):
+    """Translate a PagerDuty layer restriction to LIR days and times.
+
+    Args:
+        kind (str): "weekly_restriction" or "daily_restriction"
+        start_time_of_day (str): Start of the restriction, as HH:MM:SS
+        duration_seconds (int): Length of the restriction
+        start_day_of_week (int): ISO day of the week the restriction starts
+            on, for weekly restrictions
+
+    Returns:
+        dict: days, startTime and endTime of the shift, or None if the
+        restriction type is not supported
+    """
+    hours, minutes, seconds = (start_time_of_day.split(":") + ["0", "0"])[:3]
+    start = int(hours) * 3600 + int(minutes) * 60 + int(float(seconds))
+    if kind == "weekly_restriction":
+        first = start_day_of_week + 1
+        days = "".join(
+            str(i) for i in range(first, first + round(duration_seconds / 86400) + 1)
+        )
+    elif kind == "daily_restriction":
+        days = "1234567"
+        # A whole day would end when it starts; stop a minute short instead
+        if duration_seconds == 86400:
+            duration_seconds -= 60
+    else:
+        return None
+    return {
+        "days": days,
+        "startTime": ":".join(start_time_of_day.split(":")[0:2]),
+        "endTime": time_of_day(start + duration_seconds),
+    }
+
+
+def date_of(moment):
+    return moment.strftime("%Y-%m-%d")
+
+
+def layer_templates(layer, rotation):
+    """Build the team-independent part of the LIR shifts of a schedule layer.
+
+    Notes:
+        A layer with restrictions becomes one shift per supported restriction;
+        any other layer becomes a single shift. Templates are built once per
+        layer and bound to each team of the schedule with bind_team.
+
+    Args:
+        layer (dict): PagerDuty schedule layer
+        rotation (dict): LIR rotation type by rotation length, in seconds
+
+    Returns:
+        list: Shift templates, in the order of the layer's restrictions
+    """
+    rotation_type = rotation.get(layer["rotation_turn_length_seconds"], "weekly")
+    if layer.get("restrictions"):
+        virtual_start = parse_timestamp(layer["rotation_virtual_start"])
+        start_date = date_of(virtual_start)
+        repeat_until = (
+            start_date
+            if layer["end"]
+            else date_of(virtual_start + relativedelta(years=5))
+        )
+        templates = []
+        for restr in layer["restrictions"]:
+            window = restriction_window(
+                restr["type"],
+                restr["start_time_of_day"],
+                restr["duration_seconds"],
+                restr.get("start_day_of_week"),
+            )
+            if window is None:
+                continue
+            templates.append(
+                {
+                    "startTime": window["startTime"],
+                    "startDate": start_date,
+                    "endTime": window["endTime"],
+                    "repeatUntil": repeat_until,
+                    "rotationType": rotation_type,
+                    "days": window["days"],
+                }
+            )
+        return templates
+    start = parse_timestamp(layer["start"])
+    return [
+        {
+            "startTime": start.strftime("%H:%M"),
+            "startDate": date_of(start),
+            "endTime": start.strftime("%H:%M")
+            if layer["end"]
+            else (start + timedelta(hours=12)).strftime("%H:%M"),
+            "repeatUntil": date_of(start)
+            if layer["end"]
+            else date_of(start + relativedelta(years=5)),
+            "rotationType": rotation_type,
+        }
+    ]
+
+
+def bind_team(sched, layers, team_name, team_ref, members):
+    """Bind the shift templates of a schedule to one of its teams.
+
+    Args:
+        sched (dict): PagerDuty schedule
+        layers (list): (templates, user sysIds) of each layer of the schedule
+        team_name (str): Name of the mapped LIR team
+        team_ref: sysId of the mapped LIR team, or its PagerDuty reference
+        members (set): sysIds of the team members
+
+    Returns:
+        list: LIR shift payloads
+    """
+    shifts = []
+    for templates, layer_users in layers:
+        primary_members = [user for user in layer_users if user in members]
+        for index, template in enumerate(templates):
+            shift = {
+                "name": f"{sched['name']} ({team_name}) - layer {index}",
+                "team": team_ref,
+            }
+            shift.update(template)
+            shift["timeZone"] = sched["timeZone"]
+            shift["primaryMembers"] = list(primary_members)
+            # We can't fill this in, but the API requires it
+            shift["backupMembers"] = []
+            shifts.append(shift)
+    return shifts
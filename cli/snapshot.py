@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+lfh = logging.FileHandler("{0}.log".format(__name__))
+logger.addHandler(lfh)
+
+CATEGORIES = ("users", "teams", "services", "schedules", "escalations")
+MAPPED = ("users", "teams", "services", "shifts", "escalations")
+
+
+def digest(obj):
+    """Fingerprint a normalized PagerDuty object.
+
+    Args:
+        obj (dict): Object as built by the PagerDuty get_all_* methods
+
+    Returns:
+        str: Hex digest of the canonical JSON form of the object
+    """
+    return hashlib.sha1(
+        json.dumps(obj, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class Snapshot:
+    def __init__(self, path):
+        """Snapshot of the PagerDuty objects seen by the previous run.
+
+        Notes:
+            The snapshot keeps a digest of every normalized PagerDuty object
+            and the LIR objects the run mapped them to. Comparing digests with
+            the current extraction tells which objects were added or changed;
+            the mapped LIR objects let unchanged objects keep their sysIds.
+
+        Args:
+            path (str): Path of the snapshot file
+        """
+        self.path = path
+        self.previous = self.load()
+        self.current = {category: {} for category in CATEGORIES}
+        self.stats = {}
+
+    def load(self):
+        """Read the previous snapshot from disk.
+
+        Returns:
+            dict: Previous digests and mapped objects; empty on the first run
+        """
+        if not os.path.exists(self.path):
+            logger.info(f"[SNAPSHOT] No snapshot found at {self.path}, running in full")
+            return {"digests": {}, "mapped": {}}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def diff(self, category, objects, force=()):
+        """Compare objects with the previous snapshot.
+
+        Args:
+            category (str): Category of the objects, such as "users"
+            objects (list): Normalized PagerDuty objects of that category
+            force (set): IDs to treat as changed, e.g. because a dependency
+                changed
+
+        Returns:
+            list: Objects that were added or changed since the previous run
+        """
+        previous = self.previous["digests"].get(category, {})
+        current = {obj["id"]: digest(obj) for obj in objects}
+        self.current[category] = current
+        counts = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+        pending = []
+        for obj in objects:
+            if obj["id"] not in previous:
+                counts["added"] += 1
+            elif previous[obj["id"]] != current[obj["id"]] or obj["id"] in force:
+                counts["changed"] += 1
+            else:
+                counts["unchanged"] += 1
+                continue
+            pending.append(obj)
+        counts["removed"] = len(set(previous) - set(current))
+        self.stats[category] = counts
+        logger.info(
+            f'[SNAPSHOT] {category}: {counts["unchanged"]} unchanged, {counts["changed"]} changed, {counts["added"]} added, {counts["removed"]} removed'
+        )
+        return pending
+
+    def mapped(self, name):
+        """LIR objects mapped by the previous run.
+
+        Args:
+            name (str): Name of the Mapper map, such as "users" or "shifts"
+
+        Returns:
+            dict: Previous contents of the map
+        """
+        return self.previous["mapped"].get(name, {})
+
+    def save(self, mapper):
+        """Write the current digests and mapped objects to disk.
+
+        Notes:
+            Only objects that were migrated get their current digest. An object
+            that is missing from the Mapper maps, or whose create failed, keeps
+            its previous digest, or none if it is new, so the next run sees it
+            as changed or added and retries it.
+
+        Args:
+            mapper (Mapper): Mapper that finished the run
+        """
+        digests = {}
+        for category, name in zip(CATEGORIES, MAPPED):
+            mapped = getattr(mapper, name)
+            failed = mapper.failed.get(name, set())
+            previous = self.previous["digests"].get(category, {})
+            digests[category] = {}
+            for pd_id, current in self.current[category].items():
+                if pd_id in mapped and pd_id not in failed:
+                    digests[category][pd_id] = current
+                elif pd_id in previous:
+                    digests[category][pd_id] = previous[pd_id]
+        snapshot = {
+            "digests": digests,
+            "mapped": {name: getattr(mapper, name) for name in MAPPED},
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(tmp_path, self.path)
+        logger.info(f"[SNAPSHOT] Saved snapshot to {self.path}")
@@ -79,18 +79,58 @@ pd_team_members = {
 mapper_teams = {"abc123": {"sysId": "sysIdabc123"}, "xyz789": {"sysId": "sysIdxyz789"}}
 
 
+sideloaded_policy = {
+    "id": "PABC123",
+    "type": "escalation_policy",
+    "name": "sideloaded policy",
+    "escalation_rules": [
+        {
+            "id": "PGHDV41",
+            "escalation_delay_in_minutes": 30,
+            "targets": [{"id": "abc123", "type": "user_reference"}],
+        }
+    ],
+}
+
 services = [
     {
         "id": "abc123",
         "description": "foobar",
         "teams": [{"id": "abc123", "name": "team1"}],
         "name": "important service",
+        "escalation_policy": sideloaded_policy,
     },
     {
         "id": "xyz789",
         "description": "fizzbuzz",
         "teams": [{"id": "abc123", "name": "team1"}],
         "name": "another important service",
+        "escalation_policy": sideloaded_policy,
+    },
+]
+
+rendered_services = [
+    {
+        "id": "abc123",
+        "description": "foobar",
+        "teams": [{"id": "abc123"}],
+        "name": "important service",
+        "escalation_policy": {
+            "id": "PABC123",
+            "name": "sideloaded policy",
+            "escalation_rules": sideloaded_policy["escalation_rules"],
+        },
+    },
+    {
+        "id": "xyz789",
+        "description": "fizzbuzz",
+        "teams": [{"id": "abc123"}],
+        "name": "another important service",
+        "escalation_policy": {
+            "id": "PABC123",
+            "name": "sideloaded policy",
+            "escalation_rules": sideloaded_policy["escalation_rules"],
+        },
     },
 ]
 
@@ -109,6 +149,16 @@ services_no_teams = [
     },
 ]
 
+services_no_teams_sideloaded = [
+    {
+        "id": "abc123",
+        "description": "foobar",
+        "teams": [],
+        "name": "important service",
+        "escalation_policy": sideloaded_policy,
+    },
+]
+
 schedule_details = {
     "schedule_layers": [
         {
@@ -135,7 +185,7 @@ schedule_details = {
             ],
         }
     ],
-    "teams": teams[0],
+    "teams": [teams[0]],
 }
 
 schedules = [
@@ -184,8 +234,15 @@ rendered_schedule = {
     "id": "abc123",
     "timeZone": "America/New_York",
     "primaryMembers": ["abc123", "xyz789"],
-    "schedule_layers": schedule_details["schedule_layers"],
-    "teams": teams[0],
+    "schedule_layers": [
+        {
+            "start": "2015-11-06T21:00:00-05:00",
+            "end": None,
+            "rotation_turn_length_seconds": 86400,
+            "users": [{"user": {"id": "abc123"}}],
+        }
+    ],
+    "teams": [{"id": "abc123"}],
 }
 
 rendered_shifts = {
@@ -311,10 +368,7 @@ rendered_escalation = [
                 ],
             }
         ],
-        "teams": [
-            {"id": "abc123", "name": "test team 1", "description": "a fabulous team"},
-            {"id": "xyz789", "name": "test team 2", "description": "a decent team"},
-        ],
+        "teams": [{"id": "abc123"}, {"id": "xyz789"}],
         "name": "escalation policy test",
     },
     {
@@ -341,13 +395,13 @@ rendered_escalation = [
                 "targets": [{"id": "abc123", "type": "user_reference"}],
             }
         ],
-        "teams": teams,
+        "teams": [{"id": "abc123"}, {"id": "xyz789"}],
         "name": "escalation policy test no audience",
     },
     {
         "id": "xyz789noaudience",
         "rules": [{"id": "PGHDV41", "escalation_delay_in_minutes": 30, "targets": []}],
-        "teams": teams,
+        "teams": [{"id": "abc123"}, {"id": "xyz789"}],
         "name": "escalation policy test no audience",
     },
 ]
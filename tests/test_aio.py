@@ -0,0 +1,23 @@
+from cli.aio import AiohttpTransport, TransportResponse, encode_params
+from unittest.mock import patch
+import pytest
+
+
+def test_encode_params():
+    assert encode_params({"include[]": ["teams", "services"], "limit": 100}) == [
+        ("include[]", "teams"),
+        ("include[]", "services"),
+        ("limit", "100"),
+    ]
+    assert encode_params(None) == []
+
+
+def test_transport_response_json():
+    assert TransportResponse(200, {}, b'{"foo": "bar"}').json() == {"foo": "bar"}
+    assert TransportResponse(204, {}, b"").json() == {}
+
+
+def test_aiohttp_transport_requires_aiohttp():
+    with patch.dict("sys.modules", {"aiohttp": None}):
+        with pytest.raises(ImportError, match="pip install aiohttp"):
+            AiohttpTransport()
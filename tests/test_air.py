@@ -1,8 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from requests.exceptions import RequestException
 import requests_mock
-from cli.lir import LIR
+from cli.aio import ConnectError, TransportError, TransportResponse
+from cli.lir import (
+    LIR,
+    AsyncLIR,
+    natural_key,
+    CountingRetry,
+    DEFAULT_SERIALIZER,
+    json_serializer,
+    orjson_serializer,
+)
 from unittest.mock import patch
+from urllib3.exceptions import ReadTimeoutError
+import asyncio
+import base64
+import gzip
 import json
+import threading
+import time
+import pytest
 
 
 def test_init():
@@ -41,12 +59,32 @@ def test_post_request_failure(mock_post):
     )
 
 
+def test_post_request_invalid_response(caplog):
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post(
+            "http://example.com/api/now/ir/user",
+            status_code=502,
+            text="<html><body>Bad Gateway</body></html>",
+        )
+        lir = LIR("testtoken", "http://example.com", retries=0)
+        resp = lir.create_user({"name": "john"})
+    assert resp[0] == 599
+    assert resp[1]["error"] == True
+    assert isinstance(resp[1]["message"], ValueError)
+    assert any(
+        message.startswith(
+            "Encountered invalid response from url http://example.com/api/now/ir/user"
+        )
+        for message in caplog.messages
+    )
+
+
 @patch("cli.lir.LIR.post_request")
 def test_create_user(mock_post):
     lir = LIR("testtoken", "http://example.com")
     lir.create_user({"foo": "bar"})
     mock_post.assert_called_with(
-        "http://example.com/api/now/ir/user", json.dumps({"foo": "bar"})
+        "http://example.com/api/now/ir/user", lir.serialize({"foo": "bar"})
     )
 
 
@@ -55,7 +93,7 @@ def test_create_team(mock_post):
     lir = LIR("testtoken", "http://example.com")
     lir.create_team({"foo": "bar"})
     mock_post.assert_called_with(
-        "http://example.com/api/now/ir/team", json.dumps({"foo": "bar"})
+        "http://example.com/api/now/ir/team", lir.serialize({"foo": "bar"})
     )
 
 
@@ -64,7 +102,7 @@ def test_create_service(mock_post):
     lir = LIR("testtoken", "http://example.com")
     lir.create_service({"foo": "bar"})
     mock_post.assert_called_with(
-        "http://example.com/api/now/ir/service", json.dumps({"foo": "bar"})
+        "http://example.com/api/now/ir/service", lir.serialize({"foo": "bar"})
     )
 
 
@@ -73,7 +111,7 @@ def test_create_shift(mock_post):
     lir = LIR("testtoken", "http://example.com")
     lir.create_shift({"foo": "bar"})
     mock_post.assert_called_with(
-        "http://example.com/api/now/ir/shift", json.dumps({"foo": "bar"})
+        "http://example.com/api/now/ir/shift", lir.serialize({"foo": "bar"})
     )
 
 
@@ -82,5 +120,483 @@ def test_create_escalation(mock_post):
     lir = LIR("testtoken", "http://example.com")
     lir.create_escalation({"foo": "bar"})
     mock_post.assert_called_with(
-        "http://example.com/api/now/ir/escalation_policy", json.dumps({"foo": "bar"})
+        "http://example.com/api/now/ir/escalation_policy", lir.serialize({"foo": "bar"})
+    )
+
+
+@pytest.fixture
+def lir_server():
+    """Local HTTP server answering POSTs with a scripted list of statuses."""
+    statuses = []
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            requests_seen.append(self.path)
+            status = statuses.pop(0) if statuses else 200
+            body = json.dumps({"sysId": "abc123"}).encode()
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", statuses, requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_request_retries_unprocessed(lir_server, caplog):
+    caplog.set_level("INFO")
+    url, statuses, requests_seen = lir_server
+    statuses.extend([429, 503])
+    lir = LIR("testtoken", url, backoff=0)
+    assert lir.create_user({"foo": "bar"}) == (200, {"sysId": "abc123"})
+    assert len(requests_seen) == 3
+    assert lir.retry.counters == {429: 1, 503: 1}
+    lir.log_stats()
+    assert "[RETRY] Retried LIR requests: 1 after 429, 1 after 503" in caplog.messages
+
+
+def test_post_request_does_not_retry_ambiguous_errors(lir_server):
+    url, statuses, requests_seen = lir_server
+    statuses.append(502)
+    lir = LIR("testtoken", url, backoff=0)
+    assert lir.create_user({"foo": "bar"})[0] == 502
+    assert len(requests_seen) == 1
+
+
+def test_retry_policy():
+    retry = LIR("testtoken", "http://example.com").retry
+    assert retry.is_retry("POST", 429)
+    assert retry.is_retry("POST", 503)
+    assert not retry.is_retry("POST", 502)
+    assert retry.is_retry("GET", 502)
+    assert not retry.is_retry("GET", 404)
+    assert retry.new().counters is retry.counters
+
+
+def test_read_errors_are_only_retried_for_get():
+    retry = LIR("testtoken", "http://example.com", retries=2).retry
+    error = ReadTimeoutError(None, "/", "Read timed out.")
+    retry = retry.increment("GET", "/", error=error)
+    assert retry.read == 1
+    assert retry.counters == {"ReadTimeoutError": 1}
+    with pytest.raises(ReadTimeoutError):
+        retry.increment("POST", "/", error=error)
+    assert retry.counters == {"ReadTimeoutError": 1}
+
+
+def test_get_request_retries_read_timeouts():
+    attempts = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            attempts.append(self.path)
+            if len(attempts) == 1:
+                time.sleep(0.5)
+            body = json.dumps({"result": []}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        lir = LIR("testtoken", url, timeout=(1, 0.1), backoff=0)
+        assert lir.get_request(f"{url}/api/now/ir/user") == (200, {"result": []})
+        assert len(attempts) == 2
+        assert lir.retry.counters == {"ReadTimeoutError": 1}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@patch("cli.lir.random.uniform", side_effect=lambda low, high: high)
+def test_retry_backoff_is_jittered(uniform):
+    retry = CountingRetry(total=5, backoff_factor=1)
+    retry = retry.increment("GET", "/", error=ConnectionError())
+    retry = retry.increment("GET", "/", error=ConnectionError())
+    assert retry.get_backoff_time() == 2
+    uniform.assert_called_with(0, 1)
+    assert retry.counters == {"ConnectionError": 2}
+
+
+def test_post_request_timeout():
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post("http://example.com", json={"foo": "bar"})
+        lir = LIR("testtoken", "http://example.com", timeout=(1, 2))
+        lir.post_request("http://example.com", {"foo": "bar"})
+        assert mock_post.last_request.timeout == (1, 2)
+
+
+def batch_endpoint(statuses=None, skip=()):
+    """requests_mock callback standing in for the ServiceNow Batch API.
+
+    Sub-requests are answered with their own payload plus a sysId, with the
+    status found in statuses for their URL (200 by default). Sub-requests
+    whose payload name is in skip are reported as unserviced.
+    """
+    statuses = statuses or {}
+
+    def callback(request, context):
+        batch = request.json()
+        serviced, unserviced = [], []
+        for sub in batch["rest_requests"]:
+            payload = json.loads(base64.b64decode(sub["body"]))
+            if payload.get("name") in skip:
+                unserviced.append(sub["id"])
+                continue
+            status = statuses.get(sub["url"], 200)
+            body = (
+                {"sysId": f"sys-{payload['name']}"}
+                if status == 200
+                else {"error": True, "message": "bad request"}
+            )
+            serviced.append(
+                {
+                    "id": sub["id"],
+                    "status_code": status,
+                    "body": base64.b64encode(json.dumps(body).encode()).decode(),
+                }
+            )
+        return {
+            "batch_request_id": batch["batch_request_id"],
+            "serviced_requests": serviced,
+            "unserviced_requests": unserviced,
+        }
+
+    return callback
+
+
+def test_batch_transport(caplog):
+    caplog.set_level("INFO")
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post(
+            "http://example.com/api/now/v1/batch",
+            json=batch_endpoint({"/api/now/ir/team": 400}),
+        )
+        lir = LIR(
+            "testtoken", "http://example.com", workers=4, batch_size=4, batch_wait=5
+        )
+        with ThreadPoolExecutor(4) as pool:
+            responses = list(
+                pool.map(
+                    lambda i: (lir.create_team if i == 3 else lir.create_user)(
+                        {"name": f"obj{i}"}
+                    ),
+                    range(4),
+                )
+            )
+        assert mock_post.call_count == 1
+        assert mock_post.last_request.headers["Authorization"] == "IRToken testtoken"
+        sub = mock_post.last_request.json()["rest_requests"][0]
+        assert sub["method"] == "POST"
+        assert sub["url"].startswith("/api/now/ir/")
+        assert responses[:3] == [(200, {"sysId": f"sys-obj{i}"}) for i in range(3)]
+        assert responses[3] == (400, {"error": True, "message": "bad request"})
+        lir.log_stats()
+        assert "[BATCH] Sent 4 LIR requests in 1 batch requests" in caplog.messages
+
+
+def test_batch_transport_flushes_after_wait():
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post("http://example.com/api/now/v1/batch", json=batch_endpoint())
+        lir = LIR(
+            "testtoken", "http://example.com", workers=8, batch_size=8, batch_wait=0.01
+        )
+        assert lir.create_user({"name": "john"}) == (200, {"sysId": "sys-john"})
+        assert lir.create_user({"name": "jane"}) == (200, {"sysId": "sys-jane"})
+        assert mock_post.call_count == 2
+        lir.batch.close()
+
+
+def test_batch_transport_unserviced():
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post(
+            "http://example.com/api/now/v1/batch", json=batch_endpoint(skip={"john"})
+        )
+        lir = LIR("testtoken", "http://example.com", workers=2, batch_size=2)
+        status, response = lir.create_user({"name": "john"})
+        assert status == 599
+        assert response["error"] == True
+
+
+def test_batch_transport_request_failure():
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post("http://example.com/api/now/v1/batch", exc=RequestException)
+        lir = LIR("testtoken", "http://example.com", workers=2, batch_size=2)
+        status, response = lir.create_user({"name": "john"})
+        assert status == 599
+        assert response["error"] == True
+
+
+def test_load_existing():
+    with requests_mock.Mocker() as mock_get:
+        users = [
+            {"sysId": f"u{i}", "emailAddress": f"User{i}@example.com"} for i in range(3)
+        ]
+        mock_get.get(
+            "http://example.com/api/now/ir/user",
+            [{"json": {"result": users[:2]}}, {"json": {"result": users[2:]}}],
+        )
+        mock_get.get(
+            "http://example.com/api/now/ir/team",
+            json={"result": [{"sysId": "t0", "name": "team 0"}]},
+        )
+        mock_get.get("http://example.com/api/now/ir/service", json={"result": []})
+        mock_get.get(
+            "http://example.com/api/now/ir/shift",
+            json={
+                "result": [{"sysId": "s0", "name": "layer 0", "team": {"value": "t0"}}]
+            },
+        )
+        mock_get.get(
+            "http://example.com/api/now/ir/escalation_policy",
+            status_code=500,
+            json={"error": True, "message": "oops"},
+        )
+        lir = LIR("testtoken", "http://example.com")
+        lir.load_existing(workers=2, page_size=2)
+        user_requests = [
+            request.qs for request in mock_get.request_history if "/user" in request.url
+        ]
+        assert user_requests == [
+            {"sysparm_limit": ["2"], "sysparm_offset": ["0"]},
+            {"sysparm_limit": ["2"], "sysparm_offset": ["2"]},
+        ]
+    assert lir.existing == {
+        "user": {f"user{i}@example.com": f"u{i}" for i in range(3)},
+        "team": {"team 0": "t0"},
+        "service": {},
+        "shift": {("t0", "layer 0"): "s0"},
+        "escalation_policy": {},
+    }
+
+
+def test_create_skips_existing():
+    lir = LIR("testtoken", "http://example.com")
+    lir.existing["user"]["john@example.com"] = "u0"
+    lir.existing["escalation_policy"][
+        natural_key("escalation_policy", {"team": "t0"})
+    ] = "e0"
+    with patch("cli.lir.LIR.post_request") as mock_post:
+        assert lir.create_user({"emailAddress": "John@example.com"}) == (
+            200,
+            {"sysId": "u0"},
+        )
+        assert lir.create_escalation({"team": "t0"}) == (200, {"sysId": "e0"})
+        mock_post.assert_not_called()
+        lir.create_escalation({"team": "t1"})
+        mock_post.assert_called_once()
+
+
+def test_existing_policies_of_one_team(caplog):
+    def steps(*users):
+        return [{"audience": [{"type": "users", "users": list(users)}]}]
+
+    listed = [
+        {"sysId": "e0", "team": {"link": "...", "value": "t0"}, "steps": steps("u0")},
+        {"sysId": "e1", "team": {"link": "...", "value": "t0"}, "steps": steps("u1")},
+        {"sysId": "e2", "team": "t0", "steps": steps("u1")},
+    ]
+    with requests_mock.Mocker() as mock_get:
+        for kind in ("user", "team", "service", "shift"):
+            mock_get.get(f"http://example.com/api/now/ir/{kind}", json={"result": []})
+        mock_get.get(
+            "http://example.com/api/now/ir/escalation_policy", json={"result": listed}
+        )
+        lir = LIR("testtoken", "http://example.com")
+        lir.load_existing()
+    assert any(
+        message.startswith("[EXISTING] Existing escalation_policy objects e1 and e2")
+        for message in caplog.messages
+    )
+    with patch("cli.lir.LIR.post_request") as mock_post:
+        second = {"team": "t0", "steps": steps("u1"), "priorities": [1]}
+        first = {"team": "t0", "steps": steps("u0"), "priorities": [1]}
+        assert lir.create_escalation(second) == (200, {"sysId": "e1"})
+        assert lir.create_escalation(first) == (200, {"sysId": "e0"})
+        mock_post.assert_not_called()
+        lir.create_escalation({"team": "t0", "steps": steps("u0", "u1")})
+        mock_post.assert_called_once()
+
+
+class FakeLIRTransport:
+    def __init__(self, statuses=None, error=None, failures=None):
+        """In-memory stand-in for AiohttpTransport, answering LIR creates.
+
+        Answers with the scripted statuses first, then with 200 and a sysId
+        derived from the payload name, and tracks the requests in flight.
+        The error, if any, is raised by the first `failures` requests, or by
+        every request if failures is None.
+        """
+        self.statuses = list(statuses or [])
+        self.error = error
+        self.failures = failures
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def request(self, method, url, params=None, data=None, headers=None):
+        if self.error and self.failures != 0:
+            if self.failures:
+                self.failures -= 1
+            raise self.error
+        self.requests.append((method, url))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = {"sysId": f"sys-{json.loads(data)['name']}"}
+        return TransportResponse(
+            status, {"Retry-After": "0"}, json.dumps(body).encode()
+        )
+
+
+def run_async_lir(transport, coroutine_function, **kwargs):
+    async def main():
+        async with AsyncLIR(
+            "testtoken", "http://example.com", transport=transport, **kwargs
+        ) as lir:
+            return await coroutine_function(lir)
+
+    return asyncio.run(main())
+
+
+def test_async_lir_creates():
+    transport = FakeLIRTransport()
+
+    async def create_all(lir):
+        return await asyncio.gather(
+            *(lir.create_user({"name": f"user{i}"}) for i in range(20))
+        )
+
+    responses = run_async_lir(transport, create_all, limit=4)
+    assert responses == [(200, {"sysId": f"sys-user{i}"}) for i in range(20)]
+    assert transport.max_in_flight == 4
+    assert transport.requests[0] == ("POST", "http://example.com/api/now/ir/user")
+
+
+def test_async_lir_retries_unprocessed(caplog):
+    caplog.set_level("INFO")
+    transport = FakeLIRTransport(statuses=[429, 503, 200, 502])
+
+    async def create(lir):
+        responses = [
+            await lir.create_team({"name": "team"}),
+            await lir.create_escalation({"name": "policy"}),
+        ]
+        lir.log_stats()
+        return responses
+
+    responses = run_async_lir(transport, create, backoff=0)
+    assert responses[0] == (200, {"sysId": "sys-team"})
+    assert responses[1][0] == 502
+    assert len(transport.requests) == 4
+    assert "[RETRY] Retried LIR requests: 1 after 429, 1 after 503" in caplog.messages
+
+
+def test_async_lir_failure():
+    transport = FakeLIRTransport(error=TransportError("connection reset"))
+
+    async def create(lir):
+        lir.existing["service"]["existing service"] = "sys-existing"
+        return [
+            await lir.create_service({"name": "existing service"}),
+            await lir.create_service({"name": "new service"}),
+        ]
+
+    responses = run_async_lir(transport, create)
+    assert responses[0] == (200, {"sysId": "sys-existing"})
+    assert responses[1][0] == 599
+    assert responses[1][1]["error"] == True
+
+
+def test_async_lir_retries_connection_errors(caplog):
+    caplog.set_level("INFO")
+    transport = FakeLIRTransport(error=ConnectError("refused"), failures=2)
+
+    async def create(lir):
+        response = await lir.create_team({"name": "team"})
+        lir.log_stats()
+        return response
+
+    assert run_async_lir(transport, create, backoff=0) == (200, {"sysId": "sys-team"})
+    assert len(transport.requests) == 1
+    assert "[RETRY] Retried LIR requests: 2 after ConnectError" in caplog.messages
+    transport = FakeLIRTransport(error=ConnectError("refused"))
+    response = run_async_lir(
+        transport, lambda lir: lir.create_team({"name": "team"}), retries=1, backoff=0
+    )
+    assert response[0] == 599
+
+
+def test_async_lir_shares_existing():
+    lir = LIR("testtoken", "http://example.com")
+    lir.existing["user"]["john@example.com"] = "sys-john"
+    transport = FakeLIRTransport()
+    response = run_async_lir(
+        transport,
+        lambda async_lir: async_lir.create_user({"emailAddress": "john@example.com"}),
+        existing=lir.existing,
+    )
+    assert response == (200, {"sysId": "sys-john"})
+    assert transport.requests == []
+
+
+def test_serializers():
+    payload = {"name": "team", "members": ["abc123", "xyz789"]}
+    assert json.loads(json_serializer(payload)) == payload
+    assert isinstance(json_serializer(payload), bytes)
+    orjson = pytest.importorskip("orjson")
+    assert json.loads(orjson_serializer(payload)) == payload
+    assert DEFAULT_SERIALIZER is orjson_serializer
+
+
+def test_post_request_compression(caplog):
+    caplog.set_level("INFO")
+    members = [f"sysId{i:05}" for i in range(500)]
+    with requests_mock.Mocker() as mock_post:
+        mock_post.post("http://example.com/api/now/ir/team", json={"sysId": "abc123"})
+        mock_post.post("http://example.com/api/now/ir/user", json={"sysId": "abc123"})
+        lir = LIR("testtoken", "http://example.com", compress=True)
+        lir.create_team({"name": "big team", "members": members})
+        request = mock_post.last_request
+        assert request.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(request.body))["members"] == members
+        lir.create_user({"name": "john"})
+        assert "Content-Encoding" not in mock_post.last_request.headers
+    serialized = len(lir.serialize({"name": "big team", "members": members}))
+    assert lir.wire.serialized["/api/now/ir/team"] == serialized
+    assert lir.wire.sent["/api/now/ir/team"] < serialized / 2
+    assert lir.wire.sent["/api/now/ir/user"] == lir.wire.serialized["/api/now/ir/user"]
+    lir.log_stats()
+    assert any(
+        message.startswith("[BYTES] /api/now/ir/team: 1 requests")
+        for message in caplog.messages
     )
@@ -0,0 +1,57 @@
+from cli.cache import DetailMemo, ResponseCache
+from unittest.mock import patch
+
+
+def test_set_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get("users") is None
+    cache.set("users", None, [{"id": "abc123"}])
+    assert cache.get("users") == [{"id": "abc123"}]
+    assert cache.get("/users") == [{"id": "abc123"}]
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_params_are_part_of_key(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("services", {"include[]": ["teams"]}, [{"id": "abc123"}])
+    assert cache.get("services") is None
+    assert cache.get("services", {"include[]": ["teams"]}) == [{"id": "abc123"}]
+
+
+def test_persists_between_instances(tmp_path):
+    ResponseCache(str(tmp_path)).set("schedules/abc123", None, {"id": "abc123"})
+    assert ResponseCache(str(tmp_path)).get("schedules/abc123") == {"id": "abc123"}
+
+
+@patch("cli.cache.time.time")
+def test_ttl(mock_time, tmp_path):
+    mock_time.return_value = 1000
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.set("users", None, [])
+    mock_time.return_value = 1059
+    assert cache.get("users") == []
+    mock_time.return_value = 1061
+    assert cache.get("users") is None
+    offline = ResponseCache(str(tmp_path), ttl=60, offline=True)
+    assert offline.get("users") == []
+
+
+def test_log_stats(tmp_path, caplog):
+    caplog.set_level("INFO")
+    cache = ResponseCache(str(tmp_path))
+    cache.get("users")
+    cache.log_stats()
+    assert any("0 hits, 1 misses" in message for message in caplog.messages)
+
+
+def test_detail_memo_evicts_least_recently_used():
+    memo = DetailMemo(maxsize=2)
+    memo.set("services/a", {"id": "a"})
+    memo.set("services/b", {"id": "b"})
+    assert memo.get("services/a") == {"id": "a"}
+    memo.set("services/c", {"id": "c"})
+    assert memo.get("services/b") is None
+    assert memo.get("/services/a") == {"id": "a"}
+    assert memo.hits["services"] == 2
+    assert memo.misses["services"] == 1
@@ -0,0 +1,93 @@
+from cli.cassette import Player, Recorder
+from cli.lir import encode_body
+from unittest.mock import patch
+import gzip
+import pytest
+import requests
+import requests_mock
+
+
+def recorded_session(path):
+    session = requests.Session()
+    adapter = requests_mock.Adapter()
+    adapter.register_uri(
+        "GET", "https://api.example.com/users?offset=0", json={"users": ["abc123"]}
+    )
+    adapter.register_uri(
+        "POST",
+        "https://lir.example.com/api/now/ir/user",
+        [{"json": {"sysId": "first"}}, {"json": {"sysId": "second"}}],
+    )
+    session.mount("https://", adapter)
+    recorder = Recorder(path)
+    recorder.attach(session)
+    return session, recorder
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "cassette.ndjson.gz")
+    session, recorder = recorded_session(path)
+    session.get("https://api.example.com/users", params={"offset": 0})
+    session.post("https://lir.example.com/api/now/ir/user", data=b'{"name": "a"}')
+    session.post("https://lir.example.com/api/now/ir/user", data=b'{"name": "a"}')
+    recorder.close()
+    assert recorder.count == 3
+
+    replayed = requests.Session()
+    player = Player(path)
+    player.attach(replayed)
+    response = replayed.get("https://api.example.com/users", params={"offset": 0})
+    assert response.status_code == 200
+    assert response.json() == {"users": ["abc123"]}
+    url = "https://lir.example.com/api/now/ir/user"
+    assert replayed.post(url, data=b'{"name": "a"}').json() == {"sysId": "first"}
+    assert replayed.post(url, data=b'{"name": "a"}').json() == {"sysId": "second"}
+    assert replayed.post(url, data=b'{"name": "a"}').json() == {"sysId": "second"}
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replayed.post(url, data=b'{"name": "b"}')
+    assert player.misses == 1
+
+
+@patch("cli.cassette.time.sleep")
+def test_replay_latency(sleep, tmp_path):
+    path = str(tmp_path / "cassette.ndjson.gz")
+    session, recorder = recorded_session(path)
+    session.get("https://api.example.com/users", params={"offset": 0})
+    recorder.close()
+    replayed = requests.Session()
+    Player(path, latency=0.25).attach(replayed)
+    replayed.get("https://api.example.com/users", params={"offset": 0})
+    sleep.assert_called_once_with(0.25)
+    sleep.reset_mock()
+    Player(path).attach(replayed)
+    replayed.get("https://api.example.com/users", params={"offset": 0})
+    sleep.assert_not_called()
+
+
+def test_replay_gzip_bodies(tmp_path):
+    path = str(tmp_path / "cassette.ndjson.gz")
+    session, recorder = recorded_session(path)
+    url = "https://lir.example.com/api/now/ir/user"
+    payload = b'{"name": "a", "members": [' + b'"abc123", ' * 200 + b"]}"
+    headers = {"Content-Encoding": "gzip"}
+    session.post(url, data=gzip.compress(payload, mtime=1), headers=headers)
+    recorder.close()
+
+    replayed = requests.Session()
+    player = Player(path)
+    player.attach(replayed)
+    # The gzip header of the replayed body holds another compression time
+    body = gzip.compress(payload, mtime=2)
+    response = replayed.post(url, data=body, headers=headers)
+    assert response.json() == {"sysId": "first"}
+    assert player.misses == 0
+
+
+def test_compressed_bodies_are_reproducible():
+    payload = b'{"members": [' + b'"abc123", ' * 200 + b"]}"
+    with patch("gzip.time.time", return_value=1):
+        first, headers = encode_body(payload, compress=True)
+    with patch("gzip.time.time", return_value=2):
+        second, _ = encode_body(payload, compress=True)
+    assert headers == {"Content-Encoding": "gzip"}
+    assert first == second
@@ -1,5 +1,7 @@
 from cli.cli import parse_args, setup_logger, main
+import json
 import logging
+import pytest
 from unittest.mock import patch
 
 
@@ -12,6 +14,10 @@ def test_parse_args():
     assert parsed_args.apiurl == "http://example.com"
     assert parsed_args.noop == False
     assert parsed_args.level == "INFO"
+    assert parsed_args.pd_workers == 8
+    assert parsed_args.serial == False
+    assert parsed_args.cache_dir == None
+    assert parsed_args.offline == False
 
 
 def test_setup_logger():
@@ -60,12 +66,259 @@ def test_main(mapper):
     )
     main(parsed_args)
     mapper.assert_called_with(
-        "xyz987", "http://example.com", "abc123", noop=True, pretty=False
+        "xyz987",
+        "http://example.com",
+        "abc123",
+        noop=True,
+        pretty=False,
+        pd_workers=8,
+        serial=False,
+        cache=None,
+        snapshot=None,
+        pd_rate=16,
+        pd_backend="sync",
+        lir_timeout=60,
+        lir_retries=5,
+        workers=1,
+        lir_batch_size=0,
+        lir_batch_wait=0.05,
+        lir_compress=False,
+        report=None,
+        journal=None,
     )
+    mapper_instance.migrate.assert_called_once()
+    mapper_instance.map_and_create_users.assert_not_called()
+    mapper_instance.noop_output.assert_called_once()
+    mapper_instance.pd.log_stats.assert_called_once()
+    mapper_instance.lir.log_stats.assert_called_once()
+    mapper_instance.lir.load_existing.assert_not_called()
+
+
+@patch("cli.cli.Mapper")
+def test_main_phased(mapper):
+    mapper_instance = mapper.return_value
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--phased",
+        ]
+    )
+    main(parsed_args)
+    mapper_instance.migrate.assert_not_called()
     mapper_instance.map_and_create_users.assert_called_once()
     mapper_instance.map_team_members.assert_called_once()
     mapper_instance.map_teams.assert_called_once()
     mapper_instance.map_services.assert_called_once()
     mapper_instance.map_schedules.assert_called_once()
     mapper_instance.map_escalations.assert_called_once()
-    mapper_instance.noop_output.assert_called_once()
+
+
+def test_parse_args_offline_requires_cache_dir():
+    with pytest.raises(SystemExit):
+        parse_args(
+            [
+                "--pd",
+                "abc123",
+                "--lirtoken",
+                "xyz987",
+                "--apiurl",
+                "http://example.com",
+                "--offline",
+            ]
+        )
+
+
+@patch("cli.cli.Mapper")
+def test_main_with_cache(mapper, tmp_path):
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--cache-dir",
+            str(tmp_path),
+            "--cache-ttl",
+            "60",
+        ]
+    )
+    main(parsed_args)
+    cache = mapper.call_args.kwargs["cache"]
+    assert cache.ttl == 60
+    assert cache.path == str(tmp_path / "pagerduty.sqlite3")
+
+
+@patch("cli.cli.Mapper")
+def test_main_with_snapshot(mapper, tmp_path):
+    mapper_instance = mapper.return_value
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--snapshot",
+            str(tmp_path / "snapshot.json"),
+        ]
+    )
+    with patch("cli.cli.Snapshot") as snapshot:
+        main(parsed_args)
+    mapper_instance.apply_snapshot.assert_called_once()
+    snapshot.return_value.save.assert_called_with(mapper_instance)
+
+
+@patch("cli.cli.Mapper")
+def test_main_skip_existing(mapper):
+    mapper_instance = mapper.return_value
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--skip-existing",
+        ]
+    )
+    main(parsed_args)
+    mapper_instance.lir.load_existing.assert_called_once_with(mapper_instance.workers)
+
+
+@patch("cli.cli.Recorder")
+@patch("cli.cli.Mapper")
+def test_main_record(mapper, recorder):
+    mapper_instance = mapper.return_value
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--record",
+            "cassette.ndjson.gz",
+        ]
+    )
+    main(parsed_args)
+    recorder.assert_called_with("cassette.ndjson.gz")
+    recorder.return_value.attach.assert_any_call(mapper_instance.pd.session)
+    recorder.return_value.attach.assert_any_call(mapper_instance.lir.session)
+    recorder.return_value.close.assert_called_once()
+
+
+def test_parse_args_replay():
+    args = ["--pd", "abc123", "--lirtoken", "xyz987", "--apiurl", "http://x.com"]
+    parsed = parse_args(args + ["--replay", "c.gz", "--replay-latency", "0.1"])
+    assert parsed.replay_latency == 0.1
+    parsed = parse_args(args + ["--replay", "c.gz", "--replay-latency", "recorded"])
+    assert parsed.replay_latency == "recorded"
+    with pytest.raises(SystemExit):
+        parse_args(args + ["--replay", "c.gz", "--replay-latency", "slow"])
+    with pytest.raises(SystemExit):
+        parse_args(args + ["--replay", "c.gz", "--record", "c.gz"])
+
+
+@patch("cli.cli.Mapper")
+def test_main_report(mapper, tmp_path):
+    mapper_instance = mapper.return_value
+    path = tmp_path / "report.ndjson"
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--noop",
+            "--report",
+            str(path),
+            "--summary-only",
+        ]
+    )
+    main(parsed_args)
+    report = mapper.call_args.kwargs["report"]
+    assert report.path == str(path)
+    assert report.summary_only == True
+    mapper_instance.noop_output.assert_not_called()
+    assert json.loads(path.read_text())["type"] == "summary"
+
+
+def test_parse_args_report_requires_noop():
+    with pytest.raises(SystemExit):
+        parse_args(
+            [
+                "--pd",
+                "abc123",
+                "--lirtoken",
+                "xyz987",
+                "--apiurl",
+                "http://example.com",
+                "--summary-only",
+            ]
+        )
+
+
+@patch("cli.cli.Journal")
+@patch("cli.cli.Mapper")
+def test_main_resume(mapper, journal, tmp_path):
+    mapper_instance = mapper.return_value
+    mapper_instance.migrate.side_effect = KeyboardInterrupt
+    journal.replay.return_value = [{"k": "user", "id": "abc123", "s": "sys1"}]
+    parsed_args = parse_args(
+        [
+            "--pd",
+            "abc123",
+            "--lirtoken",
+            "xyz987",
+            "--apiurl",
+            "http://example.com",
+            "--journal",
+            "journal.ndjson",
+            "--resume",
+        ]
+    )
+    with pytest.raises(KeyboardInterrupt):
+        main(parsed_args)
+    journal.replay.assert_called_once_with("journal.ndjson")
+    journal.assert_called_once_with("journal.ndjson")
+    assert mapper.call_args.kwargs["journal"] == journal.return_value
+    mapper_instance.resume.assert_called_once_with(journal.replay.return_value)
+    journal.return_value.close.assert_called_once()
+
+
+def test_parse_args_resume_requires_journal():
+    with pytest.raises(SystemExit):
+        parse_args(
+            [
+                "--pd",
+                "abc123",
+                "--lirtoken",
+                "xyz987",
+                "--apiurl",
+                "http://example.com",
+                "--resume",
+            ]
+        )
+
+
+def test_parse_args_batch_size_requires_workers(capsys):
+    required = ["--pd", "abc123", "--lirtoken", "xyz987", "--apiurl", "http://x"]
+    with pytest.raises(SystemExit):
+        parse_args(required + ["--lir-batch-size", "20"])
+    assert "needs at least as many --workers" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        parse_args(required + ["--lir-batch-size", "4", "--workers", "4", "--serial"])
+    args = parse_args(required + ["--lir-batch-size", "4", "--workers", "8"])
+    assert args.lir_batch_size == 4
@@ -0,0 +1,94 @@
+from cli.dag import Graph
+import pytest
+import threading
+import time
+
+
+def test_order():
+    graph = Graph()
+    graph.add("team:a", None, ["user:a", "user:b"])
+    graph.add("user:a", None)
+    graph.add("user:b", None, ["user:missing"])
+    graph.add("escalation:a", None, ["team:a", "escalation:a"])
+    assert graph.order() == ["user:a", "user:b", "team:a", "escalation:a"]
+
+
+def test_cycle():
+    graph = Graph()
+    graph.add("a", None, ["b"])
+    graph.add("b", None, ["a"])
+    graph.add("c", None)
+    with pytest.raises(ValueError, match="Dependency cycle between a, b"):
+        graph.run()
+
+
+def test_duplicate_key():
+    graph = Graph()
+    graph.add("a", None)
+    with pytest.raises(ValueError):
+        graph.add("a", None)
+
+
+def test_run_serial():
+    ran = []
+    graph = Graph()
+    graph.add("team", lambda: ran.append("team"), ["user"])
+    graph.add("user", lambda: ran.append("user"))
+    graph.run(1)
+    assert ran == ["user", "team"]
+    assert set(graph.durations) == {"user", "team"}
+
+
+def test_run_concurrent_does_not_wait_for_unrelated_nodes():
+    slow_done = threading.Event()
+    fast_done = threading.Event()
+    finished = []
+    graph = Graph()
+    graph.add("slow", lambda: (slow_done.wait(5), finished.append("slow")))
+    graph.add("fast", lambda: finished.append("fast"))
+    graph.add(
+        "after fast", lambda: (finished.append("after fast"), fast_done.set()), ["fast"]
+    )
+    graph.add("after slow", lambda: finished.append("after slow"), ["slow"])
+    threading.Thread(target=lambda: (fast_done.wait(5), slow_done.set())).start()
+    graph.run(4)
+    assert finished.index("after fast") < finished.index("slow")
+    assert finished[-1] == "after slow"
+
+
+def test_failed_node_releases_dependents(caplog):
+    ran = []
+
+    def fail():
+        raise KeyError("sysId")
+
+    graph = Graph()
+    graph.add("user", fail)
+    graph.add("team", lambda: ran.append("team"), ["user"])
+    graph.run(2)
+    assert ran == ["team"]
+    assert "[DAG] Failed to migrate user" in caplog.messages
+
+
+def test_critical_path(caplog):
+    caplog.set_level("INFO")
+    graph = Graph()
+    graph.add("user:a", lambda: time.sleep(0.05))
+    graph.add("user:b", lambda: None)
+    graph.add("team:a", lambda: time.sleep(0.05), ["user:a", "user:b"])
+    graph.add("service:a", lambda: None, ["team:a"])
+    graph.add("schedule:a", lambda: None, ["user:b"])
+    graph.run(2)
+    path, seconds = graph.critical_path()
+    assert path == ["user:a", "team:a", "service:a"]
+    assert 0.1 <= seconds <= graph.elapsed
+    graph.log_stats()
+    assert any(
+        "[DAG] Migrated 5 objects in" in message
+        and "critical path of 3 objects" in message
+        for message in caplog.messages
+    )
+
+
+def test_critical_path_empty():
+    assert Graph().critical_path() == ([], 0.0)
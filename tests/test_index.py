@@ -0,0 +1,65 @@
+from cli.index import MigrationIndex
+from . import fixture_data as fd
+import copy
+
+
+def make_index():
+    services = copy.deepcopy(fd.services + fd.services_no_teams)
+    escalations = [
+        {
+            "id": "PABC123",
+            "name": "policy",
+            "rules": [
+                {
+                    "targets": [
+                        {"id": "sched1", "type": "schedule_reference"},
+                        {"id": "abc123", "type": "user_reference"},
+                    ]
+                },
+                {
+                    "targets": [
+                        {"id": "sched2", "type": "schedule_reference"},
+                        {"id": "sched1", "type": "schedule_reference"},
+                    ]
+                },
+            ],
+            "teams": [],
+        }
+    ]
+    return MigrationIndex(services, escalations)
+
+
+def test_lookups():
+    index = make_index()
+    assert index.policy("PABC123")["name"] == "policy"
+    assert index.policy("missing") is None
+    assert [s["id"] for s in index.services_for_policy("PABC123")] == [
+        "abc123",
+        "xyz789",
+    ]
+    assert index.services_for_policy("missing") == []
+    assert index.schedules_for_policy("PABC123") == ["sched1", "sched2"]
+
+
+def test_bind_policy():
+    index = make_index()
+    service = {"id": "teamless", "teams": []}
+    index.bind_policy(service, {"id": "PABC123"})
+    index.bind_policy(service, {"id": "PABC123"})
+    index.bind_policy({"id": "nopolicy"}, {})
+    assert [s["id"] for s in index.services_for_policy("PABC123")] == [
+        "abc123",
+        "xyz789",
+        "teamless",
+    ]
+
+
+def test_team_members():
+    index = make_index()
+    team = {"members": ["sys1", "sys2"]}
+    members = index.team_members("t1", team)
+    assert members == {"sys1", "sys2"}
+    assert index.team_members("t1", team) is members
+    replaced = index.team_members("t1", {"members": ["sys3"]})
+    assert replaced == {"sys3"}
+    assert index.team_members("t2", {}) == set()
@@ -0,0 +1,104 @@
+from cli.journal import Journal
+from unittest.mock import patch
+import json
+import pytest
+import time
+
+
+@patch("cli.journal.os.fsync")
+def test_append_and_replay(fsync, tmp_path):
+    path = str(tmp_path / "journal.ndjson")
+    journal = Journal(path, sync_every=2, sync_interval=60)
+    journal.append("user", "abc123", "sys1")
+    assert fsync.call_count == 0
+    journal.append("team", "tabc123", "sys2")
+    assert fsync.call_count == 1
+    journal.append("shift", "0123abcd", "sys3")
+    journal.close()
+    assert fsync.call_count == 2
+    journal.close()
+    assert Journal.replay(path) == [
+        {"k": "user", "id": "abc123", "s": "sys1"},
+        {"k": "team", "id": "tabc123", "s": "sys2"},
+        {"k": "shift", "id": "0123abcd", "s": "sys3"},
+    ]
+    # Appends to the journal of an earlier run
+    journal = Journal(path)
+    journal.append("service", "abc123", "sys4")
+    journal.close()
+    assert len(Journal.replay(path)) == 4
+
+
+@patch("cli.journal.os.fsync")
+def test_sync_interval(fsync, tmp_path):
+    journal = Journal(str(tmp_path / "journal.ndjson"), sync_interval=0)
+    journal.append("user", "abc123", "sys1")
+    assert fsync.call_count == 1
+    journal.close()
+
+
+def test_replay_missing(tmp_path):
+    assert Journal.replay(str(tmp_path / "missing.ndjson")) == []
+
+
+def test_replay_incomplete_last_entry(tmp_path, caplog):
+    path = tmp_path / "journal.ndjson"
+    path.write_text('{"k":"user","id":"abc123","s":"sys1"}\n{"k":"user","id":"xy')
+    assert Journal.replay(str(path)) == [{"k": "user", "id": "abc123", "s": "sys1"}]
+    assert any("incomplete last entry" in message for message in caplog.messages)
+    path.write_text('{"k":"user","id":"xy\n{"k":"user","id":"abc123","s":"sys1"}\n')
+    with pytest.raises(ValueError):
+        Journal.replay(str(path))
+
+
+def test_resume_after_repeated_crashes(tmp_path, caplog):
+    path = tmp_path / "journal.ndjson"
+
+    def crash(journal, torn):
+        journal.close()
+        with open(path, "ab") as f:
+            f.write(torn)
+
+    journal = Journal(str(path))
+    journal.append("user", "A", "sys1")
+    journal.append("user", "B", "sys2")
+    crash(journal, b'{"k":"user","id":"C","s"')
+    assert [entry["id"] for entry in Journal.replay(str(path))] == ["A", "B"]
+
+    journal = Journal(str(path))
+    assert any("Dropping incomplete last entry" in m for m in caplog.messages)
+    journal.append("user", "C", "sys3")
+    journal.append("user", "D", "sys4")
+    crash(journal, b'{"k":"us')
+    assert [entry["id"] for entry in Journal.replay(str(path))] == [
+        "A",
+        "B",
+        "C",
+        "D",
+    ]
+
+    journal = Journal(str(path))
+    journal.append("user", "E", "sys5")
+    journal.close()
+    assert [entry["id"] for entry in Journal.replay(str(path))] == [
+        "A",
+        "B",
+        "C",
+        "D",
+        "E",
+    ]
+    assert path.read_bytes().count(b"\n") == 5
+
+
+def test_replay_100k_entries(tmp_path):
+    path = tmp_path / "journal.ndjson"
+    path.write_text(
+        "".join(
+            json.dumps({"k": "user", "id": f"PU{i:06d}", "s": f"{i:032x}"}) + "\n"
+            for i in range(100000)
+        )
+    )
+    start = time.perf_counter()
+    entries = Journal.replay(str(path))
+    assert time.perf_counter() - start < 1
+    assert len(entries) == 100000
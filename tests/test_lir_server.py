@@ -0,0 +1,82 @@
+from benchmarks.lir_server import Behavior, LIRServer
+from cli.lir import LIR
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import threading
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = LIRServer(("127.0.0.1", 0), **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_creates_and_lists(start_server):
+    server = start_server(behavior=Behavior(latency=0.01), max_concurrency=2)
+    lir = LIR("testtoken", server.url, workers=8, compress=True)
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(
+            pool.map(
+                lambda i: lir.create_user(
+                    {"emailAddress": f"user{i}@example.com", "bio": "x" * 2000}
+                ),
+                range(16),
+            )
+        )
+    assert all(status == 200 for status, _ in responses)
+    assert len({response["sysId"] for _, response in responses}) == 16
+    assert len(server.objects["user"]) == 16
+    assert server.max_in_flight == 2
+    lir.load_existing(page_size=5)
+    assert len(lir.existing["user"]) == 16
+
+
+def test_batch(start_server):
+    server = start_server()
+    lir = LIR("testtoken", server.url, workers=4, batch_size=4, batch_wait=1)
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(
+            pool.map(lambda i: lir.create_team({"name": f"team{i}"}), range(4))
+        )
+    assert sorted(response["sysId"] for _, response in responses) == [
+        f"team{i:08d}" for i in range(4)
+    ]
+    assert server.statuses[200] == 1
+
+
+def test_error_injection(start_server):
+    server = start_server(behavior=Behavior(rate_limited=1.0, retry_after=0))
+    lir = LIR("testtoken", server.url, retries=2, backoff=0)
+    status, response = lir.create_service({"name": "service"})
+    assert status == 429
+    assert response["error"] == True
+    assert server.statuses[429] == 3
+    assert lir.retry.counters[429] == 2
+    server.behavior = Behavior(server_errors=1.0)
+    assert lir.create_service({"name": "service"})[0] == 503
+    server.behavior = Behavior(server_errors=1.0, server_error_statuses=(500, 502))
+    assert lir.create_service({"name": "service"})[0] in (500, 502)
+    assert server.objects["service"] == []
+
+
+def test_server_error_statuses():
+    behavior = Behavior(server_errors=1.0, server_error_statuses=(500, 502), seed=1)
+    assert {behavior.failure() for _ in range(100)} == {500, 502}
+    assert Behavior(server_errors=1.0).failure() == 503
+
+
+def test_latency_distributions():
+    for distribution in ("fixed", "uniform", "exponential", "lognormal"):
+        behavior = Behavior(latency=0.1, distribution=distribution, seed=1)
+        delays = [behavior.delay() for _ in range(5000)]
+        assert sum(delays) / len(delays) == pytest.approx(0.1, rel=0.1)
@@ -1,7 +1,10 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from cli.mapper import Mapper
+from cli.report import Report
+from cli.snapshot import Snapshot
 from . import fixture_data as fd
 import copy
+import json
 
 
 @patch("cli.mapper.LIR")
@@ -17,8 +20,48 @@ def test_mapper_init(pd, lir):
     assert mapper.rotation == {604800: "weekly", 86400: "daily"}
     assert hasattr(mapper, "lir")
     assert hasattr(mapper, "pd")
-    pd.assert_called_with("pdtoken")
-    lir.assert_called_with("lirtoken", "http://example.com")
+    pd.assert_called_with("pdtoken", workers=8, serial=False, cache=None, rate=16)
+    lir.assert_called_with(
+        "lirtoken",
+        "http://example.com",
+        workers=1,
+        timeout=(5, 60),
+        retries=5,
+        batch_size=0,
+        batch_wait=0.05,
+        compress=False,
+    )
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_apply_snapshot(pd, lir):
+    snapshot = MagicMock()
+    snapshot.diff.side_effect = lambda category, objects, force=(): [
+        obj for obj in objects if obj["id"] in ("xyz789", "txyz789")
+    ]
+    snapshot.mapped.side_effect = lambda name: {"users": {"abc123": "sysIdabc123"}}.get(
+        name, {}
+    )
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken", snapshot=snapshot)
+    mapper.pd.users = copy.deepcopy(fd.pd_user_list)
+    mapper.pd.teams = copy.deepcopy(fd.pd_teams)
+    mapper.pd.services = copy.deepcopy(fd.services)
+    mapper.pd.schedules = copy.deepcopy(fd.schedules)
+    mapper.pd.escalations = copy.deepcopy(fd.rendered_escalation)
+    mapper.apply_snapshot()
+    forced = {
+        call.args[0]: call.kwargs.get("force") for call in snapshot.diff.call_args_list
+    }
+    # Team tabc123 has changed user xyz789 as a member
+    assert forced["teams"] == {"tabc123"}
+    # Schedule xyz789 belongs to changed team txyz789
+    assert forced["schedules"] == {"xyz789"}
+    # Escalations target the changed schedule xyz789
+    assert forced["escalations"] == {"abc123", "xyz789"}
+    assert [user["id"] for user in mapper.pd.users] == ["xyz789"]
+    assert [team["id"] for team in mapper.pd.teams] == ["txyz789"]
+    assert mapper.users == {"abc123": "sysIdabc123"}
 
 
 @patch("cli.mapper.LIR")
@@ -54,6 +97,70 @@ def test_map_and_create_users(pd, lir, caplog):
         '[USER] Attempted to create user "jane@example.com"; received response code 599 and error "this is an error"'
         in caplog.messages
     )
+    assert mapper.failed["users"] == {"xyz789"}
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_snapshot_retries_failed_create(pd, lir, tmp_path):
+    path = str(tmp_path / "snapshot.json")
+
+    def run(responses):
+        mapper = Mapper(
+            "lirtoken", "http://example.com", "pdtoken", snapshot=Snapshot(path)
+        )
+        mapper.pd.users = copy.deepcopy(fd.pd_user_list)
+        mapper.pd.teams = []
+        mapper.pd.services = []
+        mapper.pd.schedules = []
+        mapper.pd.escalations = []
+        mapper.lir.reset_mock()
+        mapper.lir.create_user.side_effect = responses
+        mapper.apply_snapshot()
+        mapper.map_and_create_users()
+        mapper.snapshot.save(mapper)
+        return mapper
+
+    run(
+        [
+            (200, {"sysId": "sysidabc123"}),
+            (500, {"error": True, "message": "this is an error"}),
+        ]
+    )
+    mapper = run([(200, {"sysId": "sysidxyz789"})])
+    mapper.lir.create_user.assert_called_once_with(fd.lir_user_jane)
+    assert mapper.users == {"abc123": "sysidabc123", "xyz789": "sysidxyz789"}
+    mapper = run([])
+    mapper.lir.create_user.assert_not_called()
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_map_and_create_users_concurrent(pd, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken", workers=8)
+    mapper.pd.teams = []
+    mapper.pd.users = [
+        {
+            "id": f"u{i}",
+            "firstName": "user",
+            "lastName": str(i),
+            "emailAddress": f"user{i}@example.com",
+        }
+        for i in range(50)
+    ]
+    mapper.lir.create_user.side_effect = lambda user: (
+        200,
+        {"sysId": f"sys-{user['emailAddress']}"},
+    )
+    mapper.map_and_create_users()
+    assert mapper.users == {f"u{i}": f"sys-user{i}@example.com" for i in range(50)}
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_map_and_create_users_serial_overrides_workers(pd, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken", workers=8, serial=True)
+    assert mapper.workers == 1
 
 
 @patch("cli.mapper.LIR")
@@ -184,6 +291,27 @@ def test_create_team_from_escal_policy_error(pd, lir, caplog):
     )
 
 
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_migrate_service_inferred_team_error(pd, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken")
+    mapper.pd.services = []
+    mapper.pd.escalations = []
+    mapper.users = {"abc123": "sysIdabc123"}
+    mapper.lir.create_team.return_value = (
+        599,
+        {"error": True, "message": "this is an error"},
+    )
+    mapper.lir.create_service.return_value = (200, {"sysId": "sysIdservice"})
+    policy = dict(fd.team_from_escalation, id="P123")
+    mapper.migrate_service(copy.deepcopy(fd.services_no_teams[0]), policy)
+    # The service is created without its team, so a snapshot run retries it
+    mapper.lir.create_service.assert_called_once_with(
+        {"name": "important service", "description": "foobar"}
+    )
+    assert mapper.failed["services"] == {"abc123"}
+
+
 @patch("cli.mapper.LIR")
 @patch("cli.mapper.PagerDuty")
 def test_create_team_from_escal_policy_noop(pd, lir):
@@ -246,7 +374,13 @@ def test_map_services(pd, lir, caplog):
 def test_map_services_no_team(pd, lir, escal, caplog):
     mapper = Mapper("lirtoken", "http://example.com", "pdtoken")
     mapper.pd.services = copy.deepcopy(fd.services_no_teams)
-    mapper.pd.get_details.side_effect = [{"escalation_policy": {"id": "abc123"}}, {}]
+    policy = {"id": "abc123", "name": "test policy", "escalation_rules": []}
+    details = {
+        "services/abc123": {"escalation_policy": {"id": "abc123"}},
+        "services/xyz789": {},
+        "escalation_policies/abc123": policy,
+    }
+    mapper.pd.get_details.side_effect = lambda endpoint: details[endpoint]
     escal.return_value = {"sysId": "sysIdabc123"}
     mapper.lir.create_service.side_effect = [
         (200, {"sysId": "sysIdabc123"}),
@@ -255,7 +389,8 @@ def test_map_services_no_team(pd, lir, escal, caplog):
     mapper.map_services()
     mapper.pd.get_details.assert_any_call("services/abc123")
     mapper.pd.get_details.assert_any_call("services/xyz789")
-    escal.assert_called_with("abc123", "important service")
+    mapper.pd.get_details.assert_any_call("escalation_policies/abc123")
+    escal.assert_called_with("abc123", "important service", policy, "abc123")
     mapper.lir.create_service.assert_any_call(
         {"name": "important service", "description": "foobar", "team": "sysIdabc123"}
     )
@@ -290,6 +425,70 @@ def test_map_services_no_team(pd, lir, escal, caplog):
     )
 
 
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_prefetch_service_policies(pd, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken", pd_workers=4)
+    services = [
+        {"id": f"s{i}", "teams": [{"id": "t"}] if i % 2 else []} for i in range(20)
+    ]
+    mapper.pd.get_details.side_effect = lambda endpoint: {
+        "escalation_policy": {"id": endpoint.split("/")[1], "escalation_rules": []}
+    }
+    policies = mapper.prefetch_service_policies(services)
+    assert list(policies) == [f"s{i}" for i in range(0, 20, 2)]
+    assert all(policy["id"] == service for service, policy in policies.items())
+    assert mapper.pd.get_details.call_count == 10
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.pagerduty.APISession")
+def test_prefetch_service_policies_from_extraction(session, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken")
+    service = {
+        "id": "s1",
+        "name": "service",
+        "description": "teamless",
+        "teams": [],
+        "escalation_policy": {"id": "P1", "type": "escalation_policy_reference"},
+    }
+    rules = copy.deepcopy(fd.sideloaded_policy["escalation_rules"])
+    mapper.pd.session.iter_all.side_effect = lambda category, params=None: iter(
+        {
+            "services": [service],
+            "escalation_policies": [
+                {"id": "P1", "name": "policy", "escalation_rules": rules, "teams": []}
+            ],
+        }[category]
+    )
+    policies = mapper.prefetch_service_policies(mapper.pd.services)
+    assert policies == {"s1": {"id": "P1", "name": "policy", "escalation_rules": rules}}
+    mapper.pd.session.rget.assert_not_called()
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_map_services_sideloaded_policy(pd, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken")
+    mapper.pd.services = copy.deepcopy(fd.services_no_teams_sideloaded)
+    mapper.pd.escalations = [{"id": "PABC123", "teams": []}]
+    mapper.users = {"abc123": "sysIdabc123"}
+    mapper.lir.create_team.side_effect = [(200, {"sysId": "sysIdteam"})]
+    mapper.lir.create_service.side_effect = [(200, {"sysId": "sysIdservice"})]
+    mapper.map_services()
+    mapper.pd.get_details.assert_not_called()
+    assert mapper.pd.escalations[0]["teams"] == [
+        {"id": "sysIdteam", "name": "important service (service based team)"}
+    ]
+    assert mapper.services == {
+        "abc123": {
+            "name": "important service",
+            "description": "foobar",
+            "team": "sysIdteam",
+        }
+    }
+
+
 @patch("cli.mapper.LIR")
 @patch("cli.mapper.PagerDuty")
 def test_create_team_from_schedule(pd, lir, caplog):
@@ -327,6 +526,7 @@ def test_create_team_from_schedule(pd, lir, caplog):
         '[TEAM] Attempted to create team from schedule "test schedule 1"; received response code 599 and error message "this is an error"'
         in caplog.messages
     )
+    assert mapper.failed["shifts"] == {fd.schedules[1]["id"]}
 
 
 @patch("cli.mapper.LIR")
@@ -359,7 +559,7 @@ def test_create_team_from_schedule_noop(pd, lir, caplog):
 @patch("cli.mapper.PagerDuty")
 def test_map_schedules(pd, lir, caplog):
     mapper = Mapper("lirtoken", "http://example.com", "pdtoken")
-    mapper.pd.schedules = fd.schedules
+    mapper.pd.schedules = copy.deepcopy(fd.schedules)
     mapper.users = {"abc123": "abc123"}
     mapper.teams = {
         "txyz789": {
@@ -442,6 +642,30 @@ def test_map_schedules(pd, lir, caplog):
     )
 
 
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_map_schedules_concurrent(pd, lir):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken", workers=4)
+    mapper.pd.schedules = copy.deepcopy(fd.schedules)
+    mapper.users = {"abc123": "abc123"}
+    mapper.teams = {
+        "txyz789": {
+            "name": "test team 2",
+            "description": "a decent team",
+            "members": ["abc123"],
+            "manager": "abc123",
+            "sysId": "sysIdtxyz789",
+        }
+    }
+    mapper.lir.create_shift.return_value = (200, {"sysId": "sysIdshift"})
+    mapper.lir.create_team.return_value = (200, {"sysId": "sysIdabc123"})
+    mapper.map_schedules()
+    assert mapper.shifts == fd.rendered_shifts
+    for shifts in fd.rendered_shifts.values():
+        for shift in shifts:
+            mapper.lir.create_shift.assert_any_call(shift)
+
+
 @patch("cli.mapper.LIR")
 @patch("cli.mapper.PagerDuty")
 def test_map_escalations(pd, lir, caplog):
@@ -506,6 +730,209 @@ def test_map_escalations(pd, lir, caplog):
     )
 
 
+def graph_mapper(**kwargs):
+    mapper = Mapper("lirtoken", "http://example.com", "pdtoken", **kwargs)
+    mapper.pd.users = copy.deepcopy(fd.pd_user_list)
+    mapper.pd.teams = copy.deepcopy(fd.pd_teams)
+    mapper.pd.services = copy.deepcopy(
+        fd.services[:1] + fd.services_no_teams_sideloaded
+    )
+    mapper.pd.services[1]["id"] = "teamless"
+    mapper.pd.schedules = [
+        {
+            "name": "test schedule",
+            "id": "sched1",
+            "timeZone": "America/New_York",
+            "teams": [{"id": "txyz789"}],
+            "schedule_layers": copy.deepcopy(fd.schedule_details["schedule_layers"]),
+        }
+    ]
+    mapper.pd.escalations = [
+        {
+            "id": "PABC123",
+            "name": "escalation policy test",
+            "rules": [
+                {
+                    "escalation_delay_in_minutes": 30,
+                    "targets": [
+                        {"id": "xyz789", "type": "user_reference"},
+                        {"id": "sched1", "type": "schedule_reference"},
+                    ],
+                }
+            ],
+            "teams": [{"id": "txyz789"}],
+        }
+    ]
+    mapper.lir.create_user.side_effect = lambda user: (
+        200,
+        {"sysId": f"sys-{user['emailAddress']}"},
+    )
+    mapper.lir.create_team.side_effect = lambda team: (
+        200,
+        {"sysId": f"sys-{team['name']}"},
+    )
+    mapper.lir.create_service.return_value = (200, {"sysId": "sys-service"})
+    mapper.lir.create_shift.return_value = (200, {"sysId": "sys-shift"})
+    mapper.lir.create_escalation.return_value = (200, {"sysId": "sys-escalation"})
+    return mapper
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_build_graph(pd, lir):
+    mapper = graph_mapper()
+    graph = mapper.build_graph()
+    assert list(graph.nodes) == [
+        "user:abc123",
+        "user:xyz789",
+        "team:tabc123",
+        "team:txyz789",
+        "service:abc123",
+        "service:teamless",
+        "schedule:sched1",
+        "shifts:sched1",
+        "escalation:PABC123",
+    ]
+    assert graph.deps["team:tabc123"] == ["user:abc123", "user:xyz789", "user:xyz789"]
+    assert graph.deps["service:abc123"] == ["team:abc123"]
+    assert graph.deps["service:teamless"] == ["user:abc123"]
+    assert graph.deps["schedule:sched1"] == ["team:txyz789", "user:abc123"]
+    assert graph.deps["shifts:sched1"] == ["schedule:sched1"]
+    assert graph.deps["escalation:PABC123"] == [
+        "team:txyz789",
+        "service:teamless",
+        "user:xyz789",
+        "schedule:sched1",
+    ]
+    assert graph.order() == list(graph.nodes)
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_migrate_matches_phased_run(pd, lir):
+    phased = graph_mapper()
+    phased.map_and_create_users()
+    phased.map_team_members()
+    phased.map_teams()
+    phased.map_services()
+    phased.map_schedules()
+    phased.map_escalations()
+    # Every Mapper shares the patched PagerDuty and LIR instances
+    escalations = copy.deepcopy(phased.pd.escalations)
+    shift_calls = list(phased.lir.create_shift.call_args_list)
+    for workers in (1, 4):
+        mapper = graph_mapper(workers=workers)
+        mapper.lir.reset_mock()
+        graph = mapper.migrate()
+        assert len(graph.durations) == 9
+        assert mapper.users == phased.users
+        assert mapper.teams == phased.teams
+        assert mapper.services == phased.services
+        assert mapper.shifts == phased.shifts
+        assert mapper.escalations == phased.escalations
+        assert mapper.pd.escalations == escalations
+        assert mapper.lir.create_shift.call_args_list == shift_calls
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_migrate_noop_has_no_shift_nodes(pd, lir):
+    mapper = graph_mapper(noop=True)
+    graph = mapper.migrate()
+    assert "shifts:sched1" not in graph.nodes
+    assert mapper.shifts["sched1"]
+    mapper.lir.create_user.assert_not_called()
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_migrate_noop_report(pd, lir):
+    report = MagicMock()
+    mapper = graph_mapper(noop=True, report=report)
+    mapper.migrate()
+    kinds = [call.args[0] for call in report.write.call_args_list]
+    # The team inferred for the team-less service is planned with the service
+    assert kinds == [
+        "user",
+        "user",
+        "team",
+        "team",
+        "service",
+        "team",
+        "service",
+        "shift",
+        "escalation",
+    ]
+    user = report.write.call_args_list[0].args
+    assert user[1] == "abc123"
+    assert user[2]["emailAddress"] == "john@example.com"
+    assert all("sysId" not in call.args[2] for call in report.write.call_args_list)
+    mapper.lir.create_user.assert_not_called()
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_migrate_noop_report_to_stdout(pd, lir, capsys):
+    report = Report()
+    mapper = graph_mapper(noop=True, report=report)
+    mapper.migrate()
+    report.close()
+    lines = capsys.readouterr().out.splitlines()
+    # Only the report is written to stdout, so it parses as NDJSON
+    entries = [json.loads(line) for line in lines]
+    assert len(entries) == 10
+    assert entries[-1]["type"] == "summary"
+
+
+@patch("cli.mapper.LIR")
+@patch("cli.mapper.PagerDuty")
+def test_migrate_resume(pd, lir):
+    journal = MagicMock()
+    first = graph_mapper(journal=journal)
+    first.migrate()
+    entries = [
+        {"k": call.args[0], "id": call.args[1], "s": call.args[2]}
+        for call in journal.append.call_args_list
+    ]
+    assert [entry["k"] for entry in entries] == [
+        "user",
+        "user",
+        "team",
+        "team",
+        "service",
+        "team",
+        "service",
+        "shift",
+        "escalation",
+    ]
+    assert entries[5]["id"] == "PABC123 important service"
+    # Resuming from the whole journal creates nothing again
+    resumed = graph_mapper()
+    # Every Mapper shares the patched LIR instance
+    resumed.lir.reset_mock()
+    resumed.resume(entries)
+    assert resumed.users == first.users
+    resumed.migrate()
+    for create in ("user", "team", "service", "shift", "escalation"):
+        getattr(resumed.lir, f"create_{create}").assert_not_called()
+    assert resumed.users == first.users
+    assert resumed.teams == first.teams
+    assert resumed.services == first.services
+    assert resumed.shifts == first.shifts
+    assert resumed.escalations == first.escalations
+    # Resuming from the users and teams only creates the rest
+    partial = graph_mapper()
+    partial.lir.reset_mock()
+    partial.resume(entries[:4])
+    partial.migrate()
+    partial.lir.create_user.assert_not_called()
+    assert partial.lir.create_team.call_count == 1
+    assert partial.lir.create_service.call_count == 2
+    assert partial.lir.create_shift.call_count == 1
+    assert partial.lir.create_escalation.call_count == 1
+    assert partial.teams == first.teams
+
+
 @patch("builtins.print")
 @patch("cli.mapper.LIR")
 @patch("cli.mapper.PagerDuty")
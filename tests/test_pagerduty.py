@@ -1,7 +1,20 @@
-from unittest.mock import patch
-from cli.pagerduty import PagerDuty
+from unittest.mock import MagicMock, patch
+from cli.cache import ResponseCache
+from cli.aio import TransportResponse
+from cli.pagerduty import (
+    AsyncPagerDuty,
+    PagerDuty,
+    ThrottledAdapter,
+    TokenBucket,
+    layer_record,
+    policy_record,
+    schedule_details_record,
+    schedule_record,
+)
 from pdpyras import PDClientError
 from . import fixture_data as fd
+import json
+import pytest
 
 
 @patch("cli.pagerduty.APISession")
@@ -15,6 +28,17 @@ def test_init(session):
     assert pd.escalations == []
 
 
+@patch("cli.pagerduty.APISession")
+def test_lazy_categories(session):
+    pd = PagerDuty("abc132")
+    pd.session.iter_all.assert_not_called()
+    pd.session.iter_all.return_value = fd.users
+    assert pd.users_by_id["abc123"] == fd.user_john
+    pd.session.iter_all.assert_called_once_with("users")
+    assert pd.users == [fd.user_john, fd.user_jane]
+    pd.session.iter_all.assert_called_once_with("users")
+
+
 @patch("cli.pagerduty.APISession")
 def test_get_data_for_category(session):
     pd = PagerDuty("abc132")
@@ -57,8 +81,14 @@ def test_get_all_services(session):
     pd = PagerDuty("abc132")
     pd.session.iter_all.return_value = fd.services
     services = pd.get_all_services()
-    assert services == fd.services
-    assert pd.session.iter_all.has_call("services")
+    assert services == fd.rendered_services
+    pd.session.iter_all.assert_called_with(
+        "services", params={"include[]": ["escalation_policies", "teams"]}
+    )
+    assert pd.get_details("escalation_policies/PABC123") == policy_record(
+        fd.sideloaded_policy
+    )
+    pd.session.rget.assert_not_called()
 
 
 @patch("cli.pagerduty.APISession")
@@ -79,6 +109,33 @@ def test_get_details_failure(session):
     assert pd.session.rget.has_call("foo")
 
 
+@patch("cli.pagerduty.APISession")
+def test_get_details_memoized(session, caplog):
+    caplog.set_level("INFO")
+    pd = PagerDuty("abc132")
+    pd.session.rget.side_effect = [{"foo": "bar"}, {"foo": "baz"}]
+    assert pd.get_details("services/abc123") == {"foo": "bar"}
+    assert pd.get_details("/services/abc123") == {"foo": "bar"}
+    assert pd.get_details("services/abc123", memoize=False) == {"foo": "baz"}
+    assert pd.session.rget.call_count == 2
+    pd.log_stats()
+    assert (
+        "[CACHE] services details: 1/2 requests served from memory (50%)"
+        in caplog.messages
+    )
+
+
+@patch("cli.pagerduty.APISession")
+def test_memo_seeded_from_extraction(session):
+    pd = PagerDuty("abc132")
+    pd.session.iter_all.return_value = fd.escalations
+    escalations = pd.get_all_escalations()
+    policy = pd.get_details(f"escalation_policies/{escalations[0]['id']}")
+    assert policy["escalation_rules"] == escalations[0]["rules"]
+    assert policy["name"] == escalations[0]["name"]
+    pd.session.rget.assert_not_called()
+
+
 @patch("cli.pagerduty.APISession")
 def test_get_all_schedules(session):
     pd = PagerDuty("abc132")
@@ -102,16 +159,296 @@ def test_get_all_escalations(session):
 @patch("cli.pagerduty.APISession")
 def test_get_team_members(session):
     pd = PagerDuty("abc132")
+    pd.users = []
     teams = [{"id": "abc123", "name": "test team"}]
-    pd.session.rget.side_effect = [
-        [
-            {"user": {"id": "xyz789"}, "role": "manager"},
-            {"user": {"id": "abc123"}, "role": "manager"},
-        ],
-        fd.users[1],
-        fd.users[0],
+    pd.session.iter_all.return_value = [
+        {"user": {"id": "xyz789"}, "role": "manager"},
+        {"user": {"id": "abc123"}, "role": "manager"},
+    ]
+    pd.session.rget.side_effect = [fd.users[1], fd.users[0]]
+    output = pd.get_team_members(teams)
+    pd.session.iter_all.assert_called_with("teams/abc123/members")
+    assert output == [
+        {
+            "id": "abc123",
+            "name": "test team",
+            "members": ["xyz789", "abc123"],
+            "manager": "xyz789",
+        }
     ]
+
+
+@patch("cli.pagerduty.APISession")
+def test_get_all_schedules_concurrent_order(session):
+    pd = PagerDuty("abc132", workers=4)
+    listed = [dict(fd.schedules[0], id=f"s{i}", name=f"sched {i}") for i in range(20)]
+    pd.session.iter_all.return_value = listed
+    pd.session.rget.side_effect = lambda endpoint: dict(
+        fd.schedule_details, teams=[{"id": endpoint}]
+    )
+    data = pd.get_all_schedules()
+    assert [sched["id"] for sched in data] == [f"s{i}" for i in range(20)]
+    assert [sched["teams"] for sched in data] == [
+        [{"id": f"schedules/s{i}"}] for i in range(20)
+    ]
+
+
+@patch("cli.pagerduty.APISession")
+def test_init_serial(session):
+    pd = PagerDuty("abc132", workers=4, serial=True)
+    assert pd.workers == 1
+
+
+@patch("cli.pagerduty.APISession")
+def test_get_user_email(session):
+    pd = PagerDuty("abc132")
+    pd.users_by_id = {fd.user_john["id"]: fd.user_john}
+    pd.session.rget.return_value = fd.users[1]
+    assert pd.get_user_email("abc123") == "john@example.com"
+    pd.session.rget.assert_not_called()
+    assert pd.get_user_email("xyz789") == "jane@example.com"
+    pd.session.rget.assert_called_once_with("users/xyz789")
+
+
+@patch("cli.pagerduty.APISession")
+def test_get_team_members_concurrent(session):
+    pd = PagerDuty("abc132", workers=4)
+    pd.users_by_id = {fd.user_john["id"]: fd.user_john}
+    teams = [{"id": f"t{i}", "name": f"team {i}"} for i in range(10)]
+    rosters = {
+        f"teams/t{i}/members": [{"user": {"id": "abc123"}, "role": "manager"}] * (i % 3)
+        for i in range(10)
+    }
+    pd.session.iter_all.side_effect = lambda endpoint: iter(rosters[endpoint])
     output = pd.get_team_members(teams)
+    assert [team["id"] for team in output] == [f"t{i}" for i in range(10) if i % 3]
+    assert all(team["manager"] == "abc123" for team in output)
+    assert output[1]["members"] == ["abc123", "abc123"]
+    pd.session.rget.assert_not_called()
+
+
+@patch("cli.pagerduty.APISession")
+def test_get_team_members_roster_error(session, caplog):
+    pd = PagerDuty("abc132")
+    teams = [{"id": "t0", "name": "team 0"}, {"id": "t1", "name": "team 1"}]
+
+    def iter_all(endpoint):
+        if endpoint == "teams/t0/members":
+            raise PDClientError("foo")
+        return iter([{"user": {"id": "abc123"}, "role": "member"}])
+
+    pd.session.iter_all.side_effect = iter_all
+    output = pd.get_team_members(teams)
+    assert [team["id"] for team in output] == ["t1"]
+    assert "[TEAM] Could not retrieve the members of team t0: foo" in caplog.messages
+    assert "[TEAM] Team 'team 0' could not be fetched. Skipping import" in (
+        caplog.messages
+    )
+    assert not any("has no members" in message for message in caplog.messages)
+
+
+@patch("cli.pagerduty.APISession")
+def test_cached_requests(session, tmp_path):
+    pd = PagerDuty("abc132", cache=ResponseCache(str(tmp_path)))
+    pd.session.iter_all.return_value = fd.users
+    pd.session.rget.return_value = {"foo": "bar"}
+    assert pd.get_data_for_category("users") == fd.users
+    assert pd.get_data_for_category("users") == fd.users
+    assert pd.get_details("foo") == {"foo": "bar"}
+    assert pd.get_details("foo", memoize=False) == {"foo": "bar"}
+    pd.session.iter_all.assert_called_once()
+    pd.session.rget.assert_called_once()
+    assert pd.cache.hits == 2
+
+
+@patch("cli.pagerduty.APISession")
+def test_offline_cache_miss(session, tmp_path):
+    pd = PagerDuty("abc132", cache=ResponseCache(str(tmp_path), offline=True))
+    assert pd.get_data_for_category("users") == []
+    assert pd.get_details("foo") == {}
+    pd.session.iter_all.assert_not_called()
+    pd.session.rget.assert_not_called()
+
+
+@patch("cli.pagerduty.APISession")
+def test_get_all_schedules_missing_details(session, caplog):
+    pd = PagerDuty("abc132")
+    pd.session.iter_all.return_value = fd.schedules[:1]
+    pd.session.rget.side_effect = PDClientError("foo")
+    assert pd.get_all_schedules() == []
+    assert (
+        '[SHIFT] Could not retrieve details for schedule "test schedule 0", skipping import'
+        in caplog.messages
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def fake_response(status, headers=None):
+    response = MagicMock()
+    response.status_code = status
+    response.headers = headers or {}
+    return response
+
+
+@patch("cli.pagerduty.time")
+def test_token_bucket_throttles(mock_time, caplog):
+    caplog.set_level("INFO")
+    clock = FakeClock()
+    mock_time.monotonic = clock.monotonic
+    mock_time.sleep = clock.sleep
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.throttled_requests == 1
+    bucket.log_stats()
+    assert (
+        "[THROTTLE] 1 PagerDuty requests throttled for 0.5s in total; 0 rate limit responses"
+        in caplog.messages
+    )
+
+
+@patch("cli.pagerduty.time")
+def test_token_bucket_adapts_to_rate_limits(mock_time):
+    clock = FakeClock()
+    mock_time.monotonic = clock.monotonic
+    mock_time.sleep = clock.sleep
+    bucket = TokenBucket(rate=16)
+    bucket.observe(fake_response(429, {"Retry-After": "3"}))
+    assert bucket.rate == 8
+    assert bucket.rate_limited == 1
+    assert bucket.acquire() == pytest.approx(3)
+    bucket.observe(fake_response(200))
+    assert bucket.rate == pytest.approx(8.16)
+    bucket.observe(
+        fake_response(200, {"ratelimit-remaining": "20", "ratelimit-reset": "10"})
+    )
+    assert bucket.rate == 2
+
+
+def test_throttled_adapter():
+    bucket = MagicMock()
+    adapter = ThrottledAdapter(bucket)
+    with patch("requests.adapters.HTTPAdapter.send") as send:
+        response = adapter.send("request")
+    bucket.acquire.assert_called_once()
+    bucket.observe.assert_called_with(send.return_value)
+    assert response == send.return_value
+
+
+def test_session_is_throttled():
+    pd = PagerDuty("abc132", rate=4)
+    adapter = pd.session.get_adapter("https://api.pagerduty.com/users")
+    assert isinstance(adapter, ThrottledAdapter)
+    assert adapter.bucket is pd.bucket
+    assert pd.bucket.rate == 4
+
+
+class FakeTransport:
+    def __init__(self, routes):
+        """In-memory stand-in for AiohttpTransport.
+
+        Index routes map to a list of items and are paginated like the
+        PagerDuty API; other routes map to the full response body.
+        """
+        self.routes = routes
+        self.requests = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def request(self, method, url, params=None, data=None, headers=None):
+        path = url[len("https://api.pagerduty.com/") :]
+        self.requests.append((path, params))
+        if path not in self.routes:
+            return TransportResponse(404, {}, b'{"error": "not found"}')
+        route = self.routes[path]
+        if isinstance(route, list):
+            offset, limit = params["offset"], params["limit"]
+            body = {
+                path.split("/")[-1]: route[offset : offset + limit],
+                "more": offset + limit < len(route),
+            }
+            if params.get("total"):
+                body["total"] = len(route)
+        else:
+            body = route
+        return TransportResponse(200, {}, json.dumps(body).encode())
+
+
+def async_backend(routes, **kwargs):
+    return AsyncPagerDuty("abc132", transport=FakeTransport(routes), **kwargs)
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_all_users(session):
+    pd = async_backend({"users": fd.users})
+    users = pd.get_all_users()
+    assert fd.user_john in users
+    assert fd.user_jane in users
+    pd.session.iter_all.assert_not_called()
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_all_teams(session):
+    pd = async_backend({"teams": fd.teams})
+    assert pd.get_all_teams() == fd.teams
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_all_services(session):
+    pd = async_backend({"services": fd.services})
+    assert pd.get_all_services() == fd.rendered_services
+    assert pd.transport.requests[0][1]["include[]"] == ["escalation_policies", "teams"]
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_all_schedules(session):
+    pd = async_backend(
+        {
+            "schedules": fd.schedules,
+            "schedules/abc123": {"schedule": fd.schedule_details},
+            "schedules/xyz789": {"schedule": fd.schedule_details},
+            "schedules/qwe456": {"schedule": fd.schedule_details},
+        }
+    )
+    data = pd.get_all_schedules()
+    assert fd.rendered_schedule in data
+    assert len(data) == 4
+    pd.session.rget.assert_not_called()
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_all_escalations(session):
+    pd = async_backend({"escalation_policies": fd.escalations})
+    assert pd.get_all_escalations() == fd.rendered_escalation
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_team_members(session):
+    pd = async_backend(
+        {
+            "teams/abc123/members": [
+                {"user": {"id": "xyz789"}, "role": "manager"},
+                {"user": {"id": "abc123"}, "role": "manager"},
+            ]
+        }
+    )
+    pd.users = [fd.user_john, fd.user_jane]
+    output = pd.get_team_members([{"id": "abc123", "name": "test team"}])
     assert output == [
         {
             "id": "abc123",
@@ -120,3 +457,105 @@ def test_get_team_members(session):
             "manager": "xyz789",
         }
     ]
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_get_team_members_roster_error(session, caplog):
+    pd = async_backend({}, max_attempts=1)
+    pd.session.iter_all.side_effect = PDClientError("foo")
+    assert pd.get_team_members([{"id": "abc123", "name": "test team"}]) == []
+    # The failed prefetch is requested again through the synchronous session
+    pd.session.iter_all.assert_called_once_with("teams/abc123/members")
+    assert (
+        "[TEAM] Team 'test team' could not be fetched. Skipping import"
+        in caplog.messages
+    )
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_pagination(session):
+    users = [dict(fd.users[0], id=f"u{i}") for i in range(250)]
+    pd = async_backend({"users": users}, workers=3)
+    assert [user["id"] for user in pd.get_all_users()] == [f"u{i}" for i in range(250)]
+    assert sorted(params["offset"] for _, params in pd.transport.requests) == [
+        0,
+        100,
+        200,
+    ]
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_errors(session, caplog):
+    pd = async_backend({}, max_attempts=1)
+    assert pd.get_all_users() == []
+    assert pd.get_all_schedules() == []
+    assert any("Error from PagerDuty API" in message for message in caplog.messages)
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_retries_rate_limits(session):
+    pd = async_backend({"users": fd.users})
+    responses = [TransportResponse(429, {}, b"")]
+    original = pd.transport.request
+
+    async def request(*args, **kwargs):
+        if responses:
+            return responses.pop()
+        return await original(*args, **kwargs)
+
+    pd.transport.request = request
+    pd.bucket.observe = MagicMock()
+    assert len(pd.get_all_users()) == 2
+    assert pd.bucket.observe.call_count == 2
+
+
+@patch("cli.pagerduty.APISession")
+def test_async_prefetch_projects_responses(session, tmp_path):
+    routes = {
+        "schedules": fd.schedules,
+        "schedules/abc123": {"schedule": fd.schedule_details},
+    }
+    args = ("schedules", None, schedule_record, "schedules/{id}")
+    pd = async_backend(routes)
+    keys = pd.run(pd.prefetch, *args, schedule_details_record)
+    assert pd.responses[keys[0]] == [schedule_record(s) for s in fd.schedules]
+    assert pd.responses[ResponseCache.make_key("schedules/abc123")] == (
+        schedule_details_record(fd.schedule_details)
+    )
+    # The cache still gets the raw responses
+    pd = async_backend(routes, cache=ResponseCache(str(tmp_path)))
+    keys = pd.run(pd.prefetch, *args, schedule_details_record)
+    assert pd.responses[keys[0]] == [schedule_record(s) for s in fd.schedules]
+    assert pd.cache.get("schedules") == fd.schedules
+    assert pd.cache.get("schedules/abc123") == fd.schedule_details
+
+
+def test_layer_record():
+    layer = fd.schedule_details["schedule_layers"][0]
+    assert layer_record(layer) == fd.rendered_schedule["schedule_layers"][0]
+    assert layer_record(layer_record(layer)) == layer_record(layer)
+
+
+def test_policy_record():
+    assert policy_record(None) is None
+    assert policy_record({"id": "PABC123", "type": "escalation_policy_reference"}) == {
+        "id": "PABC123"
+    }
+    assert policy_record(fd.sideloaded_policy) == {
+        "id": "PABC123",
+        "name": "sideloaded policy",
+        "escalation_rules": fd.sideloaded_policy["escalation_rules"],
+    }
+
+
+@patch("cli.pagerduty.APISession")
+def test_get_data_for_category_projection(session, tmp_path):
+    pd = PagerDuty("abc132")
+    pd.session.iter_all.return_value = fd.teams
+    assert pd.get_data_for_category("teams", project=lambda team: team["id"]) == [
+        "abc123",
+        "xyz789",
+    ]
+    pd.cache = ResponseCache(str(tmp_path))
+    pd.get_data_for_category("teams", project=lambda team: team["id"])
+    assert pd.cache.get("teams") == fd.teams
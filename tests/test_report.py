@@ -0,0 +1,75 @@
+from cli.report import Report
+import gzip
+import json
+import logging
+
+
+def read_lines(path, opener=open):
+    with opener(path, "rt") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_report(tmp_path):
+    path = tmp_path / "report.ndjson"
+    report = Report(str(path))
+    report.write("user", "abc123", {"emailAddress": "john@example.com"})
+    logging.getLogger("cli.mapper").warning('[TEAM] Team "x" has no members')
+    logging.getLogger("cli.mapper").info("[TEAM] Not a warning")
+    report.write("team", "t1", {"name": "team"})
+    report.close()
+    assert read_lines(path) == [
+        {
+            "type": "user",
+            "pd_id": "abc123",
+            "payload": {"emailAddress": "john@example.com"},
+        },
+        {
+            "type": "warning",
+            "level": "WARNING",
+            "category": "team",
+            "message": '[TEAM] Team "x" has no members',
+        },
+        {"type": "team", "pd_id": "t1", "payload": {"name": "team"}},
+        {
+            "type": "summary",
+            "counts": {
+                "user": 1,
+                "team": 1,
+                "service": 0,
+                "shift": 0,
+                "escalation": 0,
+            },
+            "warnings": {"team": 1},
+        },
+    ]
+    # The warning handler is removed when the report is closed
+    logging.getLogger("cli.mapper").warning("[USER] After the report")
+    assert report.warnings == {"team": 1}
+
+
+def test_report_summary_only_gzip(tmp_path):
+    path = tmp_path / "report.ndjson.gz"
+    report = Report(str(path), summary_only=True)
+    for i in range(100):
+        report.write("shift", f"s{i}", {"name": f"shift {i}"})
+    logging.getLogger("cli").error("Something without a tag")
+    report.close()
+    assert read_lines(path, gzip.open) == [
+        {
+            "type": "summary",
+            "counts": {
+                "user": 0,
+                "team": 0,
+                "service": 0,
+                "shift": 100,
+                "escalation": 0,
+            },
+            "warnings": {"other": 1},
+        }
+    ]
+
+
+def test_report_stdout(capsys):
+    report = Report("-", summary_only=True)
+    report.close()
+    assert json.loads(capsys.readouterr().out)["type"] == "summary"
@@ -0,0 +1,125 @@
+from cli.shifts import (
+    bind_team,
+    layer_templates,
+    parse_timestamp,
+    restriction_window,
+    time_of_day,
+)
+from datetime import datetime, timedelta, timezone
+from . import fixture_data as fd
+import copy
+
+ROTATION = {604800: "weekly", 86400: "daily"}
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("2015-11-06T21:00:00-05:00") == datetime(
+        2015, 11, 6, 21, tzinfo=timezone(timedelta(hours=-5))
+    )
+    # Not accepted by fromisoformat before Python 3.11
+    assert parse_timestamp("2015-11-06T21:00:00Z") == datetime(
+        2015, 11, 6, 21, tzinfo=timezone.utc
+    )
+    assert parse_timestamp("Nov 6 2015 9pm") == datetime(2015, 11, 6, 21)
+
+
+def test_time_of_day():
+    assert time_of_day(0) == "00:00"
+    assert time_of_day(9 * 3600 + 30 * 60 + 59) == "09:30"
+    assert time_of_day(86400 + 3600) == "01:00"
+
+
+def test_restriction_window():
+    assert restriction_window("weekly_restriction", "09:00:00", 32400, 1) == {
+        "days": "2",
+        "startTime": "09:00",
+        "endTime": "18:00",
+    }
+    assert restriction_window("weekly_restriction", "18:00:00", 216000, 5) == {
+        "days": "678",
+        "startTime": "18:00",
+        "endTime": "06:00",
+    }
+    assert restriction_window("daily_restriction", "08:30:00", 86400, None) == {
+        "days": "1234567",
+        "startTime": "08:30",
+        "endTime": "08:29",
+    }
+    assert restriction_window("monthly_restriction", "08:30:00", 3600, None) is None
+
+
+def test_restriction_window_memoized():
+    restriction_window.cache_clear()
+    first = restriction_window("daily_restriction", "07:00:00", 3600, None)
+    assert restriction_window("daily_restriction", "07:00:00", 3600, None) is first
+    assert restriction_window.cache_info().hits == 1
+
+
+def test_layer_templates():
+    layer = copy.deepcopy(fd.schedule_details["schedule_layers"][0])
+    assert layer_templates(layer, ROTATION) == [
+        {
+            "startTime": "21:00",
+            "startDate": "2015-11-06",
+            "endTime": "09:00",
+            "repeatUntil": "2020-11-06",
+            "rotationType": "daily",
+        }
+    ]
+    layer["end"] = "2016-01-01T00:00:00-05:00"
+    layer["rotation_turn_length_seconds"] = 3600
+    assert layer_templates(layer, ROTATION) == [
+        {
+            "startTime": "21:00",
+            "startDate": "2015-11-06",
+            "endTime": "21:00",
+            "repeatUntil": "2015-11-06",
+            "rotationType": "weekly",
+        }
+    ]
+
+
+def test_layer_templates_restrictions():
+    layer = copy.deepcopy(fd.schedule_details["schedule_layers"][0])
+    layer["rotation_virtual_start"] = "2016-02-29T09:00:00-05:00"
+    layer["restrictions"] = [
+        {
+            "type": "weekly_restriction",
+            "start_time_of_day": "09:00:00",
+            "duration_seconds": 32400,
+            "start_day_of_week": 1,
+        },
+        {"type": "unknown", "start_time_of_day": "09:00:00", "duration_seconds": 1},
+    ]
+    assert layer_templates(layer, ROTATION) == [
+        {
+            "startTime": "09:00",
+            "startDate": "2016-02-29",
+            "endTime": "18:00",
+            "repeatUntil": "2021-02-28",
+            "rotationType": "daily",
+            "days": "2",
+        }
+    ]
+
+
+def test_bind_team():
+    sched = {"name": "on call", "timeZone": "UTC"}
+    template = {"startTime": "09:00"}
+    layers = [([template, template], ["sys1", "sys2", None]), ([template], ["sys3"])]
+    shifts = bind_team(sched, layers, "team", "systeam", {"sys2", "sys3"})
+    assert [shift["name"] for shift in shifts] == [
+        "on call (team) - layer 0",
+        "on call (team) - layer 1",
+        "on call (team) - layer 0",
+    ]
+    assert shifts[0] == {
+        "name": "on call (team) - layer 0",
+        "team": "systeam",
+        "startTime": "09:00",
+        "timeZone": "UTC",
+        "primaryMembers": ["sys2"],
+        "backupMembers": [],
+    }
+    assert shifts[0]["primaryMembers"] is not shifts[1]["primaryMembers"]
+    assert shifts[2]["primaryMembers"] == ["sys3"]
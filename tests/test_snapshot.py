@@ -0,0 +1,111 @@
+from cli.snapshot import Snapshot, digest
+from types import SimpleNamespace
+import json
+
+
+def test_digest_is_key_order_independent():
+    assert digest({"id": "abc123", "name": "foo"}) == digest(
+        {"name": "foo", "id": "abc123"}
+    )
+    assert digest({"id": "abc123", "name": "foo"}) != digest(
+        {"id": "abc123", "name": "bar"}
+    )
+
+
+def test_first_run(tmp_path):
+    snapshot = Snapshot(str(tmp_path / "snapshot.json"))
+    users = [{"id": "abc123"}, {"id": "xyz789"}]
+    assert snapshot.diff("users", users) == users
+    assert snapshot.stats["users"] == {
+        "unchanged": 0,
+        "changed": 0,
+        "added": 2,
+        "removed": 0,
+    }
+    assert snapshot.mapped("users") == {}
+
+
+def test_diff_and_save(tmp_path, caplog):
+    caplog.set_level("INFO")
+    path = str(tmp_path / "snapshot.json")
+    snapshot = Snapshot(path)
+    snapshot.diff(
+        "users",
+        [{"id": "abc123"}, {"id": "xyz789"}, {"id": "qwe456"}, {"id": "old"}],
+    )
+    users = {pd_id: f"sysId{pd_id}" for pd_id in ("abc123", "xyz789", "qwe456", "old")}
+    mapper = SimpleNamespace(
+        users=users,
+        teams={},
+        services={},
+        shifts={},
+        escalations={},
+        failed={},
+    )
+    snapshot.save(mapper)
+    with open(path) as f:
+        assert json.load(f)["mapped"]["users"] == users
+
+    snapshot = Snapshot(path)
+    pending = snapshot.diff(
+        "users",
+        [
+            {"id": "abc123"},
+            {"id": "xyz789", "name": "renamed"},
+            {"id": "qwe456"},
+            {"id": "new"},
+        ],
+        force={"qwe456"},
+    )
+    assert [user["id"] for user in pending] == ["xyz789", "qwe456", "new"]
+    assert snapshot.stats["users"] == {
+        "unchanged": 1,
+        "changed": 2,
+        "added": 1,
+        "removed": 1,
+    }
+    assert snapshot.mapped("users") == users
+    assert (
+        "[SNAPSHOT] users: 1 unchanged, 2 changed, 1 added, 1 removed"
+        in caplog.messages
+    )
+
+
+def test_save_keeps_failed_objects_pending(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    snapshot = Snapshot(path)
+    snapshot.diff("users", [{"id": "abc123"}, {"id": "xyz789"}])
+    snapshot.save(
+        SimpleNamespace(
+            users={"abc123": "sysIdabc123", "xyz789": "sysIdxyz789"},
+            teams={},
+            services={},
+            shifts={},
+            escalations={},
+            failed={},
+        )
+    )
+
+    snapshot = Snapshot(path)
+    users = [{"id": "abc123", "name": "renamed"}, {"id": "xyz789"}, {"id": "new"}]
+    assert snapshot.diff("users", users) == [users[0], users[2]]
+    # The changed user was restored from the snapshot, but its update failed
+    snapshot.save(
+        SimpleNamespace(
+            users={"abc123": "sysIdabc123", "xyz789": "sysIdxyz789"},
+            teams={},
+            services={},
+            shifts={},
+            escalations={},
+            failed={"users": {"abc123"}},
+        )
+    )
+
+    snapshot = Snapshot(path)
+    assert snapshot.diff("users", users) == [users[0], users[2]]
+    assert snapshot.stats["users"] == {
+        "unchanged": 1,
+        "changed": 1,
+        "added": 1,
+        "removed": 0,
+    }